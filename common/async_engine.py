@@ -0,0 +1,241 @@
+"""
+异步执行引擎
+在一个事件循环中用aiohttp并发发送YAML用例的请求，适合大部分时间都在等待服务端响应的用例集。
+用例顺序仍由变量依赖图约束；模板渲染、校验、提取和Allure描述复用同步执行的实现，
+数据库/Redis等阻塞操作放到线程中执行，避免阻塞事件循环。
+"""
+import asyncio
+import ssl
+import threading
+import time
+import typing as t
+from concurrent.futures import Future
+from datetime import timedelta
+from common import timing
+from common.cache import cache
+from common.report import recording
+from common.response import ParsedResponse
+from common.scheduler import DependencyGraph, DagScheduler
+from common.timing import timing_report
+from utils.logger import logger, log_handler
+
+try:
+    import aiohttp
+except ImportError:  # 异步引擎为可选功能，未安装aiohttp时仍可使用同步执行
+    aiohttp = None
+
+
+def _query_params(params: t.Any) -> t.Any:
+    """按requests的规则编码查询参数：列表等可迭代的值展开为重复的键（k=1&k=2），丢弃None，其余转为字符串"""
+    if isinstance(params, (str, bytes)):
+        return params
+    pairs = []
+    for k, values in (params.items() if isinstance(params, dict) else params):
+        if isinstance(values, (str, bytes)) or not hasattr(values, "__iter__"):
+            values = [values]
+        pairs.extend((str(k), v.decode("utf-8") if isinstance(v, bytes) else str(v))
+                     for v in values if v is not None)
+    return pairs
+
+
+def _request_kwargs(request_data: t.Dict) -> t.Dict:
+    """把requests风格的请求参数转换为aiohttp参数"""
+    kwargs = {}
+    if params := request_data.get("params"):
+        kwargs["params"] = _query_params(params)
+    if headers := request_data.get("headers"):
+        kwargs["headers"] = {k: str(v) for k, v in headers.items() if v is not None}
+    if cookies := request_data.get("cookies"):
+        kwargs["cookies"] = cookies
+    if "json" in request_data:
+        kwargs["json"] = request_data["json"]
+    data = request_data.get("data")
+    if files := request_data.get("files"):
+        form = aiohttp.FormData()
+        for k, v in (data or {}).items():
+            form.add_field(k, str(v))
+        for k, v in files.items():
+            if isinstance(v, (list, tuple)):
+                form.add_field(k, v[1], filename=v[0], content_type=v[2] if len(v) > 2 else None)
+            else:
+                form.add_field(k, v, filename=k)
+        kwargs["data"] = form
+    elif data is not None:
+        kwargs["data"] = data
+    if (timeout := request_data.get("timeout")) is not None:
+        kwargs["timeout"] = aiohttp.ClientTimeout(total=float(timeout))
+    if "allow_redirects" in request_data:
+        kwargs["allow_redirects"] = request_data["allow_redirects"]
+    verify, cert = request_data.get("verify", True), request_data.get("cert")
+    if verify is False:
+        kwargs["ssl"] = False
+    elif isinstance(verify, str) or cert:
+        context = ssl.create_default_context(cafile=verify if isinstance(verify, str) else None)
+        if cert:
+            context.load_cert_chain(*([cert] if isinstance(cert, str) else cert))
+        kwargs["ssl"] = context
+    if auth := request_data.get("auth"):
+        kwargs["auth"] = aiohttp.BasicAuth(*auth)
+    return kwargs
+
+
+class AsyncEngine(DagScheduler):
+    """异步执行引擎
+    在后台线程运行事件循环，每条用例一个协程，依赖完成后在并发上限内执行；
+    与DagScheduler一样为每条用例提供Future，结果为用例记录器，由pytest主循环回放。
+    """
+    def __init__(self, graph: DependencyGraph, concurrency: int = 50):
+        if aiohttp is None:
+            raise RuntimeError("异步引擎需要安装aiohttp：pip install aiohttp")
+        super().__init__(graph, workers=concurrency)
+        self.concurrency = concurrency
+        self._loop: t.Optional[asyncio.AbstractEventLoop] = None
+        self._main_task: t.Optional[asyncio.Task] = None
+        self._thread: t.Optional[threading.Thread] = None
+
+    def start(self, run: t.Optional[t.Callable] = None) -> t.List[Future]:
+        """在后台线程启动事件循环，返回与图中节点一一对应的Future"""
+        self.futures = [Future() for _ in self.graph.nodes]
+        self._started = time.perf_counter()
+        logger.info(f"异步引擎开始：{len(self.graph)} 条用例，并发上限 {self.concurrency}")
+        self._thread = threading.Thread(target=asyncio.run, args=(self._main(),),
+                                        name="async-engine", daemon=True)
+        self._thread.start()
+        return self.futures
+
+    async def _main(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._main_task = asyncio.current_task()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._connector = aiohttp.TCPConnector(limit=self.concurrency)
+        self._sessions: t.Dict[t.Tuple[t.Text, t.Text], aiohttp.ClientSession] = {}
+        self._trace = self._trace_config()
+        try:
+            tasks: t.List[asyncio.Task] = []
+            for node in self.graph.nodes:
+                deps = [tasks[i] for i in node.deps]
+                tasks.append(asyncio.create_task(self._run_node(node, deps)))
+            await asyncio.gather(*tasks)
+        finally:
+            self.elapsed = time.perf_counter() - self._started
+            for session in self._sessions.values():
+                await session.close()
+            await self._connector.close()
+            for future in self.futures:
+                if not future.done():
+                    future.set_exception(RuntimeError("异步引擎已停止，用例未执行"))
+
+    def _session(self, item) -> "aiohttp.ClientSession":
+        """按会话隔离级别获取aiohttp会话，所有会话共享同一个连接器"""
+        if item.session_scope == "case":
+            key = ("case", item.nodeid)
+        else:
+            key = (item.session_scope, str(item.fspath) if item.session_scope == "file" else "")
+        if key not in self._sessions:
+            # 默认的CookieJar会丢弃IP地址的host设置的Cookie，环境的baseurl大多是IP，与requests一样全部接收
+            self._sessions[key] = aiohttp.ClientSession(connector=self._connector, connector_owner=False,
+                                                        cookie_jar=aiohttp.CookieJar(unsafe=True),
+                                                        trace_configs=[self._trace])
+        return self._sessions[key]
+
+    @staticmethod
+    def _trace_config() -> "aiohttp.TraceConfig":
+        """建连耗时记入当前用例的http.connect阶段"""
+        async def on_start(session, ctx, params):
+            ctx.connect_start = time.perf_counter()
+
+        async def on_end(session, ctx, params):
+            timing.add("http.connect", time.perf_counter() - ctx.connect_start)
+
+        trace = aiohttp.TraceConfig()
+        trace.on_connection_create_start.append(on_start)
+        trace.on_connection_create_end.append(on_end)
+        return trace
+
+    async def _run_node(self, node, deps: t.List[asyncio.Task]) -> None:
+        if deps:
+            await asyncio.wait(deps)
+        async with self._semaphore:
+            log_handler.set_test_id(node.item.nodeid)
+            start = time.perf_counter()
+            node.item.timer = timing_report.new_timer()
+            with recording() as recorder, timing.activate(node.item.timer), \
+                    cache.activate(node.item.case_store()):
+                try:
+                    await self._run_case(node.item)
+                except asyncio.CancelledError:
+                    raise
+                except BaseException as e:
+                    # 与DagScheduler一致：pytest.fail/skip等也保存到记录器，回放时抛出，不中断其他用例
+                    if isinstance(e, Exception):
+                        logger.exception(format(e))
+                    recorder.exception = e
+                finally:
+                    if node.item.timer:
+                        node.item.timer.stop()
+            node.duration = time.perf_counter() - start
+        self.futures[node.index].set_result(recorder)
+
+    async def _run_case(self, item) -> None:
+        """异步执行单条用例，流程与YamlTest.execute一致"""
+        with timing.phase("prepare"):
+            await asyncio.to_thread(item.prepare)
+        try:
+            if entry := await asyncio.to_thread(item.restore_auth):
+                self._session(item).cookie_jar.update_cookies(entry["cookies"])
+                return
+            await self._blocking(item, item.exec_setup)
+            method, url, request_data, kwargs = item.request.build_request(item.template, **item.spec)
+            response = await self._send(item, method, url, request_data)
+            # 缓存的凭证被服务端拒绝时重新登录，重发一次
+            cookies = await asyncio.to_thread(item.refresh_auth, response, kwargs.get('Validate'))
+            if cookies is not None:
+                self._session(item).cookie_jar.update_cookies(cookies)
+                method, url, request_data, kwargs = item.request.build_request(item.template, **item.spec)
+                response = await self._send(item, method, url, request_data)
+            item.request.describe(method, url, request_data, response)
+            item.response_handle(response, kwargs.get('Validate'), kwargs.get('Extract'))
+            await asyncio.to_thread(item.save_auth, response, kwargs.get('Extract'))
+            await self._blocking(item, item.exec_teardown)
+        finally:
+            with timing.phase("cleanup"):
+                if item.session_scope == "case":
+                    session = self._sessions.pop(("case", item.nodeid), None)
+                    if session is not None:
+                        await session.close()
+                await self._blocking(item, item.cleanup)
+
+    @staticmethod
+    async def _blocking(item, func: t.Callable) -> None:
+        """用例有数据库/Redis客户端时在线程中执行，否则直接执行"""
+        if item.db_client or item.redis_client:
+            await asyncio.to_thread(func)
+        else:
+            func()
+
+    async def _send(self, item, method: t.Text, url: t.Text, request_data: t.Dict) -> ParsedResponse:
+        """发送请求并读取完整响应，响应体在校验/提取时才解码"""
+        start = time.perf_counter()
+        with timing.http_phase() as http:
+            async with self._session(item).request(method, url, **_request_kwargs(request_data)) as resp:
+                http.ttfb = time.perf_counter() - start
+                content = await resp.read()
+        elapsed = time.perf_counter() - start
+        cookies = {k: morsel.value for k, morsel in resp.cookies.items()}
+        return ParsedResponse(resp.status, resp.headers, cookies, content, timedelta(seconds=elapsed),
+                              url=str(resp.url), reason=resp.reason, encoding=resp.charset)
+
+    def shutdown(self) -> None:
+        """停止事件循环，未执行的用例标记为失败"""
+        if self._loop and self._main_task and not self._loop.is_closed():
+            try:
+                self._loop.call_soon_threadsafe(self._main_task.cancel)
+            except RuntimeError:
+                pass  # 事件循环已结束
+        if self._thread:
+            self._thread.join(timeout=10)
+
+    def summary(self) -> t.List[t.Text]:
+        lines = super().summary()
+        lines[0] = f"用例数: {len(self.graph)}，无依赖用例: {len(self.graph.roots())}，并发上限: {self.concurrency}（异步引擎）"
+        return lines
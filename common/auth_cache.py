@@ -0,0 +1,197 @@
+"""
+登录凭证缓存
+登录用例提取的变量（如data.token、sessionid）和响应设置的Cookie按 环境+账号 保存到本地文件，
+有效期内再次执行（本地重跑、失败重试）时直接恢复，不再请求登录接口。
+有效期取用例配置的ttl和JWT中exp的较早者，到期前skew秒视为过期，避免用例执行中途失效。
+凭证在有效期内被服务端注销时，后续用例收到401/403后删除本次恢复的凭证，重新登录并重发一次请求。
+
+用例中的写法：
+    auth_cache:
+      account: ${account}   # 账号，与环境一起作为缓存键
+      ttl: 1800             # 有效期（秒），未配置且无法从JWT读取时默认1800
+      jwt: data.token       # 可选：该变量为JWT时按其exp过期
+"""
+import base64
+import os
+import threading
+import time
+import typing as t
+from contextlib import contextmanager
+from pathlib import Path
+from common.json import json
+from utils.logger import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows没有fcntl，只保证同一进程内的线程不丢失凭证
+    fcntl = None
+
+# 未配置有效期时的默认值（秒）
+DEFAULT_TTL = 1800
+# 凭证被服务端拒绝的状态码
+REJECTED_STATUS = (401, 403)
+
+
+def jwt_expiry(token: t.Any) -> t.Optional[float]:
+    """读取JWT的exp（不校验签名），不是JWT时返回None"""
+    if not isinstance(token, str):
+        return None
+    parts = token.split(".")
+    if len(parts) != 3:
+        return None
+    try:
+        payload = parts[1] + "=" * (-len(parts[1]) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp is not None else None
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+class AuthCache:
+    """登录凭证缓存
+    凭证保存在一个JSON文件中，写入时在文件锁内重新读取文件、合并后原子替换，
+    多个进程同时执行也不会丢失其他账号的凭证（没有fcntl的平台只保证同一进程内的线程）。
+    """
+    def __init__(self):
+        self.path: t.Optional[Path] = None
+        self.skew = 60.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        # 本次执行中从缓存恢复的凭证：键 -> (环境, 账号, 重新登录)
+        self._restored: t.Dict[t.Text, t.Tuple[t.Text, t.Any, t.Callable[[], t.Dict]]] = {}
+        # 已完成的重新登录次数和最近一次得到的Cookie，等待其他线程重新登录的调用直接使用
+        self._refreshes = 0
+        self._cookies: t.Dict = {}
+        self.stats = {"hits": 0, "misses": 0, "saved": 0, "refreshed": 0}
+
+    def configure(self, path: t.Optional[t.Union[Path, t.Text]], skew: float = 60.0) -> None:
+        """配置缓存文件，path为None时不缓存"""
+        self.path = Path(path) if path else None
+        self.skew = skew
+        self._restored = {}
+        self._refreshes = 0
+        self._cookies = {}
+        self.stats = {"hits": 0, "misses": 0, "saved": 0, "refreshed": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    @staticmethod
+    def key(env: t.Text, account: t.Any) -> t.Text:
+        return f"{env}:{account}"
+
+    def _load(self) -> t.Dict[t.Text, t.Dict]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            logger.warning(f"登录凭证缓存文件损坏，已忽略：{self.path}，{e}")
+            return {}
+
+    @contextmanager
+    def _locked(self):
+        """读取-合并-替换期间持有线程锁和文件锁，其他线程和进程的写入等待"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path.with_name(f"{self.path.name}.lock"), "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _dump(self, data: t.Dict[t.Text, t.Dict]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        # 凭证只允许当前用户读取
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def get(self, env: t.Text, account: t.Any) -> t.Optional[t.Dict]:
+        """有效的凭证：{"values": 提取的变量, "cookies": Cookie, "expires_at": 过期时间戳}，没有或已过期时返回None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._load().get(self.key(env, account))
+        if entry is None or entry["expires_at"] - self.skew <= time.time():
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return entry
+
+    def put(self, env: t.Text, account: t.Any, values: t.Dict, cookies: t.Dict,
+            ttl: t.Optional[float] = None, jwt: t.Any = None) -> float:
+        """保存凭证，返回过期时间戳"""
+        now = time.time()
+        candidates = [now + ttl] if ttl else []
+        if (exp := jwt_expiry(jwt)) is not None:
+            candidates.append(exp)
+        expires_at = min(candidates) if candidates else now + DEFAULT_TTL
+        with self._locked():
+            data = self._load()
+            # 顺便清理已过期的凭证
+            data = {k: v for k, v in data.items() if v["expires_at"] > now}
+            data[self.key(env, account)] = {"values": values, "cookies": cookies,
+                                            "expires_at": expires_at, "saved_at": now}
+            self._dump(data)
+        self.stats["saved"] += 1
+        return expires_at
+
+    def invalidate(self, env: t.Text, account: t.Any) -> None:
+        """删除凭证（如凭证已被服务端注销）"""
+        if not self.enabled:
+            return
+        with self._locked():
+            data = self._load()
+            if data.pop(self.key(env, account), None) is not None:
+                self._dump(data)
+
+    def track(self, env: t.Text, account: t.Any, relogin: t.Callable[[], t.Dict]) -> None:
+        """记录从缓存恢复的凭证和重新登录的方法（返回登录响应的Cookie），凭证被服务端拒绝时使用"""
+        with self._lock:
+            self._restored[self.key(env, account)] = (env, account, relogin)
+
+    def refresh(self) -> t.Optional[t.Dict]:
+        """请求被服务端拒绝（401/403）时调用：删除本次执行中从缓存恢复的凭证并重新登录。
+        每个恢复的凭证只重新登录一次；其他线程正在重新登录时等待其完成。
+        返回重新登录得到的Cookie，没有可重新登录的凭证时返回None（不需要重发请求）。
+        """
+        refreshes = self._refreshes
+        with self._refresh_lock:
+            if self._refreshes != refreshes:
+                return dict(self._cookies)
+            with self._lock:
+                restored, self._restored = list(self._restored.values()), {}
+            if not restored:
+                return None
+            cookies = {}
+            for env, account, relogin in restored:
+                logger.warning(f"缓存的登录凭证 {account}@{env} 已被服务端拒绝，删除缓存并重新登录")
+                self.invalidate(env, account)
+                self.stats["refreshed"] += 1
+                cookies.update(relogin() or {})
+            self._cookies = cookies
+            self._refreshes += 1
+            return dict(cookies)
+
+
+# 全局登录凭证缓存
+auth_cache = AuthCache()
+
+
+if __name__ == '__main__':
+    import tempfile
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": int(time.time()) + 600}).encode()).decode().rstrip("=")
+    token = f"eyJhbGciOiJIUzI1NiJ9.{payload}.sig"
+    with tempfile.TemporaryDirectory() as tmp:
+        auth_cache.configure(Path(tmp) / "credentials.json")
+        expires = auth_cache.put("Qspace", "a@b.com", {"data.token": token}, {"sessionid": "s1"}, ttl=3600, jwt=token)
+        print(round(expires - time.time()), auth_cache.get("Qspace", "a@b.com")["cookies"], auth_cache.get("Qspace", "x"))
@@ -1,41 +1,275 @@
 """
 缓存类
-该模块定义了一个全局变量池，用于存储和管理全局变量。
+该模块定义了分作用域的变量池，用于存储和管理用例之间传递的变量。
+变量池按作用域分层，查找时由内向外逐层查找：
+    case     用例级：用例执行过程中写入的临时变量
+    param    参数组：当前参数组的值，只对当前用例可见
+    file     文件级：YAML文件的variable/config，只对本文件的用例可见
+    session  会话级：环境配置和提取(Extract/extract_db/extract_redis)的变量，所有用例可见
+fork在变量池上叠加新的一层，外层与原变量池共享（之后写入外层的变量双方都可见），每个线程/协程/用例在自己的分支上执行；
+snapshot生成写时复制的快照，之后快照和原变量池的写入互不影响。
+全局的cache代理到当前上下文（ContextVar）中的变量池，未进入用例时为会话级变量池，
+cache.get/cache.set和findalls/sub_var等按原有方式使用即可。
+多进程执行时会话级变量可以通过共享存储（common.shared_store）在进程之间传递，见CachePool.share。
 """
+import threading
 import typing as t
-from collections import UserDict
+from collections import ChainMap
+from collections.abc import Mapping
+from contextlib import contextmanager
+from contextvars import ContextVar
 
-class CachePool(UserDict):
+# 作用域
+SESSION = "session"
+FILE = "file"
+PARAM = "param"
+CASE = "case"
+
+# 写时复制时替换层数据的锁
+_cow_lock = threading.Lock()
+# 未找到变量的标记
+_MISSING = object()
+
+
+class _Sharing:
+    """会话级变量的跨进程共享
+    写入会话级的变量发布到共享存储；本地查找不到、但会由某条用例写入的变量，等待其他进程发布，
+    取到后缓存到本进程的会话级变量池。生产者用例结束时未发布的变量标记为放弃，等待的进程不再等待。
+    """
+    def __init__(self, backend, expected: t.Set[t.Text], timeout: float):
+        self.backend = backend
+        self.expected = expected
+        self.timeout = timeout
+        # 本进程已发布或放弃的变量
+        self.settled: t.Set[t.Text] = set()
+
+    def publish(self, key: t.Text, value: t.Any) -> None:
+        self.backend.publish(key, value)
+        self.settled.add(key)
+
+    def abandon(self, keys: t.Iterable[t.Text]) -> None:
+        for key in set(keys) - self.settled:
+            self.backend.abandon(key)
+            self.settled.add(key)
+            self.expected.discard(key)
+
+    def lookup(self, store: "VariableStore", key: t.Text) -> t.Any:
+        if key not in self.expected:
+            return _MISSING
+        value = self.backend.wait(key, self.timeout, default=_MISSING)
+        if value is _MISSING:
+            # 超时后不再等待该变量，避免每次引用都阻塞
+            self.expected.discard(key)
+        else:
+            store.setdefault(key, value, scope=SESSION)
+        return value
+
+
+# 跨进程共享，未开启时为None
+_sharing: t.Optional[_Sharing] = None
+
+
+class _Layer:
+    """变量池中的一层
+    data被快照共享时shared为True，下次写入前先复制一份，快照持有的仍是原来的数据。
+    """
+    __slots__ = ("scope", "data", "shared")
+
+    def __init__(self, scope: t.Text, data: t.Optional[t.Dict] = None, shared: bool = False):
+        self.scope = scope
+        self.data: t.Dict[t.Text, t.Any] = data if data is not None else {}
+        self.shared = shared
+
+
+class VariableStore(Mapping):
+    """分作用域的变量池"""
+    __slots__ = ("layers",)
+
+    def __init__(self, layers: t.Optional[t.List[_Layer]] = None):
+        # 由内向外排列
+        self.layers: t.List[_Layer] = layers if layers is not None else [_Layer(SESSION)]
+
+    def __getitem__(self, key: t.Text) -> t.Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: t.Text, default=None) -> t.Any:
+        # 获取指定键的值，如果键不存在则返回默认值
+        for layer in self.layers:
+            value = layer.data.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+        if _sharing is not None:
+            value = _sharing.lookup(self, key)
+            if value is not _MISSING:
+                return value
+        return default
+
+    def __contains__(self, key: object) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __iter__(self) -> t.Iterator[t.Text]:
+        return iter(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def data(self) -> ChainMap:
+        """合并各层的只读视图（用于日志和按字典方式读取）"""
+        return ChainMap(*(layer.data for layer in self.layers))
+
+    @property
+    def scopes(self) -> t.List[t.Text]:
+        return [layer.scope for layer in self.layers]
+
+    def _writable(self, scope: t.Optional[t.Text]) -> _Layer:
+        """写入的目标层，未指定作用域时为最内层"""
+        if scope is None:
+            layer = self.layers[0]
+        else:
+            layer = next((layer for layer in self.layers if layer.scope == scope), None)
+            if layer is None:
+                raise KeyError(f"变量池中没有作用域：{scope}，当前作用域：{self.scopes}")
+        if layer.shared:
+            with _cow_lock:
+                if layer.shared:
+                    layer.data = dict(layer.data)
+                    layer.shared = False
+        return layer
+
+    def set(self, key: t.Text, value: t.Any = None, scope: t.Optional[t.Text] = None) -> None:
+        # 设置指定键的值，默认写入最内层；开启跨进程共享时，会话级变量同时发布
+        layer = self._writable(scope)
+        layer.data[key] = value
+        if _sharing is not None and layer.scope == SESSION:
+            _sharing.publish(key, value)
+
+    def setdefault(self, key: t.Text, default: t.Any = None, scope: t.Optional[t.Text] = None) -> t.Any:
+        return self._writable(scope).data.setdefault(key, default)
+
+    def update(self, values: t.Mapping, scope: t.Optional[t.Text] = None) -> None:
+        self._writable(scope).data.update(values)
+
+    def delete(self, key: t.Text, scope: t.Optional[t.Text] = None) -> None:
+        self._writable(scope).data.pop(key, None)
+
+    def has(self, key: t.Text) -> bool:
+        # 检查指定键是否存在
+        return key in self
+
+    def fork(self, scope: t.Text, data: t.Optional[t.Mapping] = None) -> "VariableStore":
+        """叠加新的一层，外层与当前变量池共享"""
+        return VariableStore([_Layer(scope, dict(data) if data else {})] + self.layers)
+
+    def snapshot(self) -> "VariableStore":
+        """写时复制的快照"""
+        layers = []
+        for layer in self.layers:
+            layer.shared = True
+            layers.append(_Layer(layer.scope, layer.data, shared=True))
+        return VariableStore(layers)
+
+    def __repr__(self):
+        return f"VariableStore({', '.join(f'{layer.scope}={layer.data!r}' for layer in self.layers)})"
+
+
+# 当前上下文的变量池，未设置时使用会话级变量池
+_current: ContextVar[t.Optional[VariableStore]] = ContextVar("variable_store", default=None)
+
+
+class CachePool(Mapping):
     """全局变量池
-    继承自UserDict，提供了获取、设置、检查变量的方法。
+    代理到当前上下文的变量池，提供了获取、设置、检查变量的方法。
     """
     _instance = None  # 类属性，存储唯一实例
 
     def __new__(cls, *args, **kwargs):
         # 确保只有一个实例
-        if not cls._instance:
+        if cls._instance is None:
             cls._instance = super().__new__(cls, *args, **kwargs)
+            cls._instance.session = VariableStore()
         return cls._instance
 
+    @property
+    def store(self) -> VariableStore:
+        """当前上下文的变量池"""
+        store = _current.get()
+        return self.session if store is None else store
+
+    @contextmanager
+    def activate(self, store: VariableStore):
+        """在当前上下文（线程/协程）中使用指定的变量池"""
+        token = _current.set(store)
+        try:
+            yield store
+        finally:
+            _current.reset(token)
+
+    @property
+    def data(self) -> ChainMap:
+        return self.store.data
+
+    def __getitem__(self, key: t.Text) -> t.Any:
+        return self.store[key]
+
+    def __iter__(self) -> t.Iterator[t.Text]:
+        return iter(self.store)
+
     def get(self, key: t.Text, default=None) -> t.Any:
-        # 获取指定键的值，如果键不存在则返回默认值
-        return self.data.get(key, default)
+        return self.store.get(key, default)
 
-    def set(self, key: t.Text, value: t.Any = None) -> None:
-        # 设置指定键的值，如果键不存在则创建
-        self.data[key] = value
+    def set(self, key: t.Text, value: t.Any = None, scope: t.Optional[t.Text] = None) -> None:
+        self.store.set(key, value, scope)
 
     def has(self, key: t.Text) -> bool:
-        # 检查指定键是否存在
-        return key in self.data
+        return key in self.store
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.store
+
+    def fork(self, scope: t.Text, data: t.Optional[t.Mapping] = None) -> VariableStore:
+        return self.store.fork(scope, data)
+
+    @staticmethod
+    def share(backend, expected: t.Iterable[t.Text], timeout: float = 60.0) -> None:
+        """开启会话级变量的跨进程共享
+        :param backend: 共享存储（common.shared_store.SharedStore）
+        :param expected: 会由用例写入的变量，本地不存在时等待其他进程发布
+        :param timeout: 等待发布的超时时间（秒）
+        """
+        global _sharing
+        _sharing = _Sharing(backend, set(expected), timeout)
+
+    @property
+    def sharing(self) -> bool:
+        """是否开启了跨进程共享"""
+        return _sharing is not None
+
+    @staticmethod
+    def abandon(keys: t.Iterable[t.Text]) -> None:
+        """生产者用例结束：其中未发布的变量标记为放弃，其他进程不再等待"""
+        if _sharing is not None:
+            _sharing.abandon(keys)
+
+    @staticmethod
+    def unshare() -> None:
+        global _sharing
+        _sharing = None
+
+    def snapshot(self) -> VariableStore:
+        return self.store.snapshot()
 
     def __len__(self) -> int:
         # 返回变量池的长度
-        return len(self.data)
+        return len(self.store)
 
     def __bool__(self) -> bool:
         # 判断变量池是否为空
-        return bool(self.data)
+        return any(layer.data for layer in self.store.layers)
+
 
 # 创建全局变量池实例
 cache = CachePool()
@@ -43,5 +277,13 @@ cache = CachePool()
 if __name__ == '__main__':
     # 测试全局变量池的功能
     cache.set('name', 'long')
-    print(len(cache))
-    print(cache.get('name'))
\ No newline at end of file
+    file_store = cache.fork(FILE, {'name': 'file', 'page': 1})
+    case_store = file_store.fork(PARAM, {'page': 2}).fork(CASE)
+    with cache.activate(case_store):
+        cache.set('token', 'abc', scope=SESSION)
+        cache.set('tmp', 1)
+        print(cache.get('name'), cache.get('page'), cache.get('tmp'))
+    print(len(cache), cache.get('token'), cache.get('tmp'))
+    snap = cache.snapshot()
+    cache.set('name', 'changed')
+    print(snap.get('name'), cache.get('name'))
@@ -1,57 +1,379 @@
-import mysql.connector
-from  mysql.connector import Error
+import itertools
+import sys
+import threading
+import time
+import typing as t
+import weakref
+from collections import OrderedDict
+from utils.lazy_import import lazy_import
 from utils.logger import logger
 
+# 第一次连接数据库时才导入，不使用数据库的执行不需要加载
+mysql = lazy_import("mysql.connector", "使用数据库需要安装：pip install mysql-connector-python")
+
+# 事务隔离模式下，连接已在事务中时使用的保存点名称
+ISOLATION_SAVEPOINT = "apitest_case"
+# 每个连接缓存的预处理语句数量上限，超出时关闭最久未使用的语句
+MAX_PREPARED_STATEMENTS = 64
+# 批量插入每批的行数
+BULK_CHUNK_SIZE = 1000
+# 数据文件中表示NULL的值，与LOAD DATA一致
+NULL_MARK = "\\N"
+# 连接 -> {语句: 预处理游标}，随连接一起在用例之间复用
+_prepared: "weakref.WeakKeyDictionary[t.Any, OrderedDict]" = weakref.WeakKeyDictionary()
+
+
+def prepared_cursor(conn, sql: t.Text):
+    """获取连接上某条语句的预处理游标，同一连接上相同的语句只在服务端预处理一次"""
+    statements = _prepared.setdefault(conn, OrderedDict())
+    cursor = statements.get(sql)
+    if cursor is not None:
+        statements.move_to_end(sql)
+        return cursor
+    cursor = conn.cursor(prepared=True, dictionary=True)
+    statements[sql] = cursor
+    if len(statements) > MAX_PREPARED_STATEMENTS:
+        _, oldest = statements.popitem(last=False)
+        try:
+            oldest.close()
+        except mysql.Error:
+            pass
+    return cursor
+
+
+def quote_name(name: t.Text) -> t.Text:
+    """给表名/列名加反引号，支持 库.表 的写法"""
+    return ".".join(f"`{part.replace('`', '``')}`" for part in name.split("."))
+
+
+def _connect(db_config: t.Dict):
+    """建立一个新的数据库连接"""
+    return mysql.connect(
+        host=db_config['host'],
+        port=db_config['port'],
+        user=db_config['user'],
+        password=db_config['password'],
+        database=db_config['database'],
+        charset=db_config['charset'],
+        # 使用LOAD DATA LOCAL INFILE批量导入时需要在db配置中开启
+        allow_local_infile=db_config.get('allow_local_infile', False),
+    )
+
+
+class ConnectionPool:
+    """数据库连接池
+    连接归还后保留在池中供后续用例复用；空闲超过health_check_interval秒的连接在取出时先做健康检查。
+    """
+    def __init__(self, db_config: t.Dict, max_size: int = 10, health_check_interval: float = 30.0):
+        self.db_config = db_config
+        self.max_size = max_size
+        self.health_check_interval = health_check_interval
+        # 空闲连接：(连接, 归还时间)
+        self._idle: t.List[t.Tuple[t.Any, float]] = []
+        self._size = 0
+        self._cond = threading.Condition()
+        self.stats = {"created": 0, "reused": 0, "checkouts": 0, "health_failures": 0, "waits": 0}
+
+    def acquire(self, timeout: t.Optional[float] = None):
+        """取出连接，池满时等待其他用例归还"""
+        with self._cond:
+            self.stats["checkouts"] += 1
+            while True:
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                    if time.monotonic() - released_at < self.health_check_interval or self._healthy(conn):
+                        self.stats["reused"] += 1
+                        return conn
+                    self.stats["health_failures"] += 1
+                    self._discard(conn)
+                    continue
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                self.stats["waits"] += 1
+                if not self._cond.wait(timeout):
+                    raise TimeoutError(f"等待数据库连接超时，连接池大小：{self.max_size}")
+        try:
+            conn = _connect(self.db_config)
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        self.stats["created"] += 1
+        logger.info(f"成功连接到数据：{self.db_config['database']}")
+        return conn
+
+    def release(self, conn) -> None:
+        """归还连接，未结束的事务会被回滚，避免后续用例读到旧快照"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            healthy = True
+        except mysql.Error:
+            healthy = False
+        with self._cond:
+            if healthy:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._discard(conn)
+            self._cond.notify()
+
+    @staticmethod
+    def _healthy(conn) -> bool:
+        try:
+            return conn.is_connected()
+        except mysql.Error:
+            return False
+
+    def _discard(self, conn) -> None:
+        self._size -= 1
+        _prepared.pop(conn, None)
+        try:
+            conn.close()
+        except mysql.Error:
+            pass
+
+    def close(self) -> None:
+        """关闭所有空闲连接"""
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.pop()[0])
+
+
+class DatabasePoolManager:
+    """数据库连接池管理
+    按环境的db配置共享连接池，整个测试会话内复用。
+    """
+    def __init__(self):
+        self._pools: t.Dict[t.Tuple, ConnectionPool] = {}
+        self._lock = threading.Lock()
+        self.max_size = 10
+        self.health_check_interval = 30.0
+
+    def configure(self, max_size: int = 10, health_check_interval: float = 30.0) -> None:
+        """配置连接池大小和健康检查间隔（秒）"""
+        self.max_size = max_size
+        self.health_check_interval = health_check_interval
+
+    def get(self, db_config: t.Dict) -> ConnectionPool:
+        """获取db配置对应的连接池"""
+        key = tuple(sorted(db_config.items()))
+        with self._lock:
+            if key not in self._pools:
+                self._pools[key] = ConnectionPool(db_config, self.max_size, self.health_check_interval)
+            return self._pools[key]
+
+    def stats(self) -> t.Dict[t.Text, t.Dict]:
+        """各连接池的复用统计"""
+        return {f"{p.db_config['host']}:{p.db_config['port']}/{p.db_config['database']}": dict(p.stats)
+                for p in self._pools.values() if p.stats["checkouts"]}
+
+    def close(self) -> None:
+        with self._lock:
+            for pool in self._pools.values():
+                pool.close()
+            self._pools.clear()
+
+
 class DatabaseClient:
-    def __init__(self, env_config):
-        """初始化数据库"""
+    def __init__(self, env_config, pool: t.Optional[ConnectionPool] = None):
+        """初始化数据库
+        :param pool: 连接池，提供时首次执行SQL才取出连接，关闭时归还
+        """
         self.env_config = env_config()
+        self.pool = pool
         self.connection = None
         self.cursor = None
-        self.connect()
+        # 事务隔离模式：写操作不提交，用例结束时回滚
+        self.isolated = False
+        # 隔离事务的开启方式：None未开启，False为事务，True为保存点
+        self._savepoint: t.Optional[bool] = None
+        if pool is None:
+            self.connect()
 
     def connect(self):
         """建立连接"""
         try:
-            self.connection = mysql.connector.connect(
-                host=self.env_config['host'],
-                port=self.env_config['port'],
-                user=self.env_config['user'],
-                password=self.env_config['password'],
-                database=self.env_config['database'],
-                charset=self.env_config['charset'],
-            )
+            if self.pool is not None:
+                # 连接池取出时已做健康检查，无需再ping
+                self.connection = self.pool.acquire()
+                self.cursor = self.connection.cursor(dictionary=True)
+                return
+            self.connection = _connect(self.env_config)
             if self.connection.is_connected():
                 self.cursor = self.connection.cursor(dictionary=True)
                 logger.info(f"成功连接到数据：{self.env_config['database']}")
-        except Error as e:
+        except mysql.Error as e:
             logger.error(f"数据库连接失败：{str(e)}")
             raise
 
     def execute(self, sql, params=None):
-        """执行sql"""
+        """执行sql
+        :param params: 绑定参数，为元组/列表时使用连接上缓存的预处理语句执行
+        """
         try:
-            if not self.connection or not self.connection.is_connected():
-                self.connect()
+            self._ensure_connection()
             # logger.debug(f"执行sql:{sql}, 参数:{params}")
-            self.cursor.execute(sql, params or {})
+            if isinstance(params, (tuple, list)):
+                # 预处理游标按对象标识判断语句是否变化，驻留字符串保证相同语句复用同一个预处理语句
+                sql = sys.intern(sql)
+                cursor = prepared_cursor(self.connection, sql)
+                cursor.execute(sql, tuple(params))
+            else:
+                cursor = self.cursor
+                cursor.execute(sql, params or {})
             # 根据sql的类型,判断是否需要提交事务
             if sql.strip().upper().startswith(('INSERT', 'UPDATE', 'DELETE', 'ALTER', 'DROP')):
+                if self.isolated:
+                    # 隔离模式下不提交，DDL会隐式提交，无法回滚
+                    if sql.strip().upper().startswith(('ALTER', 'DROP')):
+                        logger.warning(f"事务隔离模式下执行DDL会隐式提交，无法回滚：{sql}")
+                    return cursor.rowcount
                 self.connection.commit()
-                return self.cursor.rowcount
+                return cursor.rowcount
             else:
-                return self.cursor.fetchall()
-        except Error as e:
+                return cursor.fetchall()
+        except mysql.Error as e:
+            logger.error(f"sql执行失败{str(e)}, sql:{sql}, params:{params}")
+            raise
+
+    def _ensure_connection(self):
+        """按需取出/重建连接，隔离模式下首次执行时开启事务"""
+        if self.connection is None:
+            self.connect()
+        elif self.pool is None and not self.connection.is_connected():
+            self.connect()
+        if self.isolated and self._savepoint is None:
+            self._begin()
+
+    def stream(self, sql, params=None, chunk_size: int = 500) -> t.Iterator[t.Dict]:
+        """流式查询
+        使用无缓冲游标分批读取，逐行返回；调用方提前停止迭代时丢弃剩余的结果，不在内存中保存整个结果集。
+        """
+        try:
+            self._ensure_connection()
+            cursor = self.connection.cursor(dictionary=True, buffered=False)
+            cursor.execute(sql, tuple(params) if params else ())
+        except mysql.Error as e:
             logger.error(f"sql执行失败{str(e)}, sql:{sql}, params:{params}")
             raise
+        try:
+            while rows := cursor.fetchmany(chunk_size):
+                yield from rows
+        finally:
+            try:
+                # 读完剩余结果才能在连接上执行下一条语句
+                while cursor.fetchmany(chunk_size):
+                    pass
+                cursor.close()
+            except mysql.Error as e:
+                logger.warning(f"丢弃剩余查询结果失败：{e}")
+
+    def bulk_insert(self, table: t.Text, columns: t.Sequence[t.Text], rows: t.Iterable[t.Sequence],
+                    chunk_size: int = BULK_CHUNK_SIZE) -> int:
+        """批量插入
+        按chunk_size分批executemany（驱动改写为多行INSERT），全部批次在一个事务中提交，任一批失败时整体回滚；
+        隔离模式下不提交，由用例结束时的回滚撤销。
+        :return: 插入的行数
+        """
+        sql = (f"INSERT INTO {quote_name(table)} ({', '.join(quote_name(c) for c in columns)}) "
+               f"VALUES ({', '.join(['%s'] * len(columns))})")
+        self._ensure_connection()
+        rows = iter(rows)
+        count = 0
+        try:
+            if not self.isolated and not self.connection.in_transaction:
+                self.connection.start_transaction()
+            while chunk := list(itertools.islice(rows, chunk_size)):
+                self.cursor.executemany(sql, chunk)
+                count += len(chunk)
+            if not self.isolated:
+                self.connection.commit()
+        except mysql.Error as e:
+            logger.error(f"批量插入失败{str(e)}, 表:{table}, 已执行{count}行")
+            if not self.isolated:
+                self.connection.rollback()
+            raise
+        return count
+
+    def load_infile(self, table: t.Text, path: t.Text, columns: t.Optional[t.Sequence[t.Text]] = None,
+                    delimiter: t.Text = ",", enclosure: t.Text = '"', line_terminator: t.Text = "\n",
+                    skip_header: bool = True, charset: t.Text = "utf8mb4") -> int:
+        """使用LOAD DATA LOCAL INFILE导入CSV文件
+        需要服务端开启local_infile，并在db配置中设置allow_local_infile: True；\\N表示NULL。
+        :param columns: 文件各列对应的表字段，默认与表字段顺序一致
+        :return: 导入的行数
+        """
+        sql = (f"LOAD DATA LOCAL INFILE %s INTO TABLE {quote_name(table)} CHARACTER SET {charset} "
+               f"FIELDS TERMINATED BY %s OPTIONALLY ENCLOSED BY %s LINES TERMINATED BY %s"
+               f"{' IGNORE 1 LINES' if skip_header else ''}")
+        if columns:
+            sql += f" ({', '.join(quote_name(c) for c in columns)})"
+        self._ensure_connection()
+        try:
+            self.cursor.execute(sql, (path, delimiter, enclosure, line_terminator))
+            if not self.isolated:
+                self.connection.commit()
+        except mysql.Error as e:
+            logger.error(f"导入文件失败{str(e)}, 表:{table}, 文件:{path}")
+            if not self.isolated:
+                self.connection.rollback()
+            raise
+        return self.cursor.rowcount
+
+    def begin(self):
+        """开启事务隔离
+        之后执行的写操作都不提交，由rollback统一撤销，代替执行teardown_db。
+        首次执行SQL时才取出连接并开启事务，用例没有执行SQL时不占用连接。
+        """
+        self.isolated = True
+
+    def _begin(self):
+        if self.connection.in_transaction:
+            # 连接已在事务中（如前面的查询开启了隐式事务），使用保存点
+            self.cursor.execute(f"SAVEPOINT {ISOLATION_SAVEPOINT}")
+            self._savepoint = True
+        else:
+            self.connection.start_transaction()
+            self._savepoint = False
+
+    def rollback(self):
+        """回滚隔离事务中的全部写操作"""
+        if not self.isolated:
+            return
+        savepoint, self._savepoint, self.isolated = self._savepoint, None, False
+        if savepoint is None or self.connection is None:
+            return
+        try:
+            if savepoint:
+                # 只撤销保存点之后的操作，外层事务保持不变
+                self.cursor.execute(f"ROLLBACK TO SAVEPOINT {ISOLATION_SAVEPOINT}")
+                self.cursor.execute(f"RELEASE SAVEPOINT {ISOLATION_SAVEPOINT}")
+            else:
+                self.connection.rollback()
+        except mysql.Error as e:
+            logger.error(f"事务回滚失败：{str(e)}")
+            raise
 
     def close(self):
-        """关闭数据库连接"""
+        """关闭数据库连接，使用连接池时归还连接"""
         if self.cursor:
             self.cursor.close()
-        if self.connection and self.connection.is_connected():
+            self.cursor = None
+        if self.connection is None:
+            return
+        if self.pool is not None:
+            self.pool.release(self.connection)
+        elif self.connection.is_connected():
+            _prepared.pop(self.connection, None)
             self.connection.close()
             # logger.info("数据库连接已关闭")
+        self.connection = None
+
+
+# 创建全局数据库连接池管理实例
+db_pool = DatabasePoolManager()
 
 
 if __name__ == '__main__':
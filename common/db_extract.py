@@ -0,0 +1,203 @@
+"""
+数据库结果提取
+extract_db从setup_db最后一条查询的结果中提取变量。查询通过无缓冲游标分批读取，边读边提取，
+只保存用例引用的数据；规则中的列和行数限制在能安全改写时下推到SQL中，数据库只返回需要的数据。
+
+规则写法（变量名: 规则）：
+    usernames: ""                                  全部结果（字典列表）
+    usernames: username                            username列的全部非空值
+    user: {first: true}                            第一行（字典）
+    username: {column: username, first: true}      第一行的username
+    users: {columns: [id, username], limit: 10}    前10行，只保留id/username
+    ids: {column: id, sample: 5, seed: 1}          随机抽取5行的id（相同种子结果相同）
+"""
+import random
+import re
+import typing as t
+from common.sql import TOKEN_PATTERN
+
+# 可以安全下推到SQL中的列名
+_IDENTIFIER = re.compile(r"^\w+$")
+# 最内层的括号
+_PARENS = re.compile(r"\([^()]*\)")
+# 单表、显式列的简单查询：SELECT a, `b` FROM t [别名] [WHERE ...] [ORDER BY ...] [LIMIT ...]
+_SIMPLE_SELECT = re.compile(
+    r"\s*SELECT\s+(?P<cols>`?\w+`?(?:\s*,\s*`?\w+`?)*)\s+FROM\s+`?[\w.]+`?"
+    r"(?P<rest>(?:\s+(?:AS\s+)?(?!(?:WHERE|ORDER|LIMIT)\b)\w+)?(?:\s+(?:WHERE|ORDER\s+BY|LIMIT)\b.*)?)$",
+    re.I | re.S)
+# 不是简单单表查询的关键字
+_NOT_SIMPLE = re.compile(r"\b(?:JOIN|UNION|GROUP\s+BY|HAVING|DISTINCT|WINDOW)\b", re.I)
+# 不能在末尾追加LIMIT的子句
+_NO_LIMIT = re.compile(r"\b(?:INTO|FOR\s+UPDATE|FOR\s+SHARE|LOCK\s+IN\s+SHARE\s+MODE|PROCEDURE)\b", re.I)
+# 语句末尾的LIMIT：LIMIT n / LIMIT m, n / LIMIT n OFFSET m
+_TRAILING_LIMIT = re.compile(
+    r"\bLIMIT\s+(?P<first>\d+)(?:\s*,\s*(?P<count>\d+)|\s+OFFSET\s+\d+)?\s*$", re.I)
+# 返回结果集的语句
+QUERY_PREFIXES = ("SELECT", "SHOW", "WITH", "DESC", "EXPLAIN")
+
+
+def is_query(sql: t.Text) -> bool:
+    return sql.lstrip().upper().startswith(QUERY_PREFIXES)
+
+
+class DbExtractRule:
+    """一条提取规则"""
+    def __init__(self, key: t.Text, rule: t.Any):
+        self.key = key
+        # 兼容原有写法：""取全部结果，列名取该列全部非空值
+        self.legacy = not isinstance(rule, dict)
+        rule = {"column": rule} if self.legacy and rule else ({} if self.legacy else rule)
+        self.columns: t.Optional[t.List[t.Text]] = rule.get("columns")
+        self.column: t.Optional[t.Text] = rule.get("column")
+        self.first: bool = bool(rule.get("first"))
+        self.limit: t.Optional[int] = 1 if self.first else rule.get("limit")
+        self.sample: t.Optional[int] = rule.get("sample")
+        self._rng = random.Random(rule.get("seed"))
+        self._seen = 0
+        self.values: t.List[t.Any] = []
+
+    @property
+    def fields(self) -> t.Optional[t.List[t.Text]]:
+        """规则用到的列，None表示需要整行"""
+        if self.column:
+            return [self.column]
+        return self.columns
+
+    @property
+    def done(self) -> bool:
+        return self.limit is not None and self.sample is None and len(self.values) >= self.limit
+
+    def _pick(self, row: t.Dict) -> t.Any:
+        if self.column:
+            return row.get(self.column)
+        if self.columns:
+            return {c: row.get(c) for c in self.columns}
+        return row
+
+    def add(self, row: t.Dict) -> None:
+        value = self._pick(row)
+        if self.legacy and self.column and not value:
+            return
+        if self.sample is None:
+            self.values.append(value)
+            return
+        # 蓄水池抽样，只保留sample行
+        self._seen += 1
+        if len(self.values) < self.sample:
+            self.values.append(value)
+        elif (i := self._rng.randrange(self._seen)) < self.sample:
+            self.values[i] = value
+
+    def result(self) -> t.Any:
+        if self.first:
+            return self.values[0] if self.values else None
+        if self.limit is not None:
+            return self.values[:self.limit]
+        return self.values
+
+
+def parse_rules(extract_config: t.List[t.Dict]) -> t.List[DbExtractRule]:
+    """解析extract_db配置"""
+    return [DbExtractRule(key, rule) for item in extract_config for key, rule in item.items()]
+
+
+def _mask(sql: t.Text) -> t.Text:
+    """把字符串字面量和注释替换为等长的占位，只保留SQL代码结构"""
+    def mask(m):
+        token = m.group()
+        if token[0] in "'\"":
+            return f"{token[0]}{' ' * (len(token) - 2)}{token[0]}"
+        return f"{token[0]}{' ' * (len(token) - 1)}"
+    return TOKEN_PATTERN.sub(mask, sql)
+
+
+def _top_level(code: t.Text) -> t.Text:
+    """去掉括号内的内容（子查询、函数参数），只保留最外层语句"""
+    while (stripped := _PARENS.sub("()", code)) != code:
+        code = stripped
+    return code
+
+
+def _project(statement: t.Text, code: t.Text, fields: t.List[t.Text]) -> t.Text:
+    """单表、显式列的简单查询只保留规则用到的列，其他查询不改写列"""
+    m = _SIMPLE_SELECT.match(code)
+    if not m or _NOT_SIMPLE.search(_top_level(code)):
+        return statement
+    order = re.search(r"\bORDER\s+BY\s+(.*?)(?:\bLIMIT\b|$)", m.group("rest"), re.I | re.S)
+    if order and re.search(r"(?:^|,)\s*\d+\s*(?:ASC|DESC)?\s*(?:,|$)", order.group(1), re.I):
+        # ORDER BY按列序号排序时列不能减少
+        return statement
+    columns = [c.strip() for c in statement[m.start("cols"):m.end("cols")].split(",")]
+    selected = [c for c in columns if c.strip("`") in fields]
+    if not all(f in (c.strip("`") for c in columns) for f in fields) or len(selected) == len(columns):
+        return statement
+    return f"{statement[:m.start('cols')]}{', '.join(selected)}{statement[m.end('cols'):]}"
+
+
+def _limit(statement: t.Text, code: t.Text, limit: int) -> t.Text:
+    """在原语句上追加LIMIT，已有更小的LIMIT时不变；无法安全追加时不下推，由extract_rows读够行数后停止"""
+    top = _top_level(code)
+    if _NO_LIMIT.search(top):
+        return statement
+    if m := _TRAILING_LIMIT.search(code):
+        group = "count" if m.group("count") else "first"
+        if int(m.group(group)) <= limit:
+            return statement
+        return f"{statement[:m.start(group)]}{limit}{statement[m.end(group):]}"
+    if re.search(r"\bLIMIT\b", top, re.I):
+        # LIMIT使用了绑定参数等无法比较的写法
+        return statement
+    statement = statement.rstrip()
+    # 语句以注释结尾时换行，避免LIMIT被注释掉
+    separator = "\n" if len(code.rstrip()) != len(statement) else " "
+    return f"{statement}{separator}LIMIT {int(limit)}"
+
+
+def pushdown(sql: t.Text, rules: t.List[DbExtractRule]) -> t.Text:
+    """把规则需要的列和行数下推到查询中
+    所有规则都只用到部分列、且查询是单表的显式列查询时只查询这些列；
+    所有规则都有行数限制（且不抽样）时在原语句上追加或收紧LIMIT。
+    不改写为子查询，多表JOIN的SELECT *中同名列不会冲突；无法下推时由extract_rows读够行数后停止读取。
+    """
+    statement = sql.strip().rstrip(";")
+    code = _mask(statement)
+    if not rules or not code.lstrip().upper().startswith(("SELECT", "WITH")):
+        return sql
+    fields: t.Optional[t.List[t.Text]] = []
+    for rule in rules:
+        if rule.fields is None or not all(_IDENTIFIER.match(f) for f in rule.fields):
+            fields = None
+            break
+        fields.extend(f for f in rule.fields if f not in fields)
+    limits = [rule.limit for rule in rules]
+    limit = None if None in limits or any(rule.sample for rule in rules) else max(limits)
+    if fields is None and limit is None:
+        return sql
+    result = statement
+    if fields:
+        result = _project(result, code, fields)
+        code = _mask(result)
+    if limit is not None:
+        result = _limit(result, code, limit)
+    return sql if result == statement else result
+
+
+def extract_rows(rows: t.Iterable[t.Dict], rules: t.List[DbExtractRule]) -> t.Dict[t.Text, t.Any]:
+    """单次遍历结果完成全部规则的提取，所有规则都满足后停止读取"""
+    for row in rows:
+        pending = [rule for rule in rules if not rule.done]
+        if not pending:
+            break
+        for rule in pending:
+            rule.add(row)
+    return {rule.key: rule.result() for rule in rules}
+
+
+if __name__ == '__main__':
+    rows = ({"id": i, "username": f"user{i}", "status": i % 3} for i in range(100000))
+    rules = parse_rules([{"usernames": "username"}, {"first_id": {"column": "id", "first": True}},
+                         {"some": {"columns": ["id"], "sample": 3, "seed": 1}}])
+    print(pushdown("SELECT id, username, status FROM ti_user", rules))
+    print(pushdown("SELECT * FROM ti_user;", parse_rules([{"u": {"column": "username", "limit": 10}}])))
+    result = extract_rows(rows, rules)
+    print(len(result["usernames"]), result["first_id"], result["some"])
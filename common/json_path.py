@@ -0,0 +1,416 @@
+"""
+JSONPath/点分路径提取
+Extract、jsonpath_check和${a.0.b}变量取值共用的路径引擎：路径在第一次使用时编译为步骤函数并按路径字符串缓存，
+之后每次提取直接按步骤遍历响应，不再重复解析表达式。只有子节点和下标的路径走无需创建中间列表的快速路径。
+
+支持的写法：
+    data.token / data.list.0.id                       点分路径（Extract原有写法），数字在列表上表示下标
+    $.data.token / $['data']['token']                 子节点
+    $.data.list[0] / [-1] / [0,2]                     下标、负下标、多个下标
+    $.data.list[1:3] / [::2] / [-2:]                  切片
+    $.data.* / $.data.list[*].id                      通配
+    $..id                                             递归查找
+    $.data.list[?(@.price > 10 && @.tag == 'a')].id   过滤：== != < <= > >= =~(正则) in nin，&& || ! 和括号
+    $.data.list[?(@.coupon)]                          过滤：字段存在且值为真
+"""
+import operator
+import re
+import typing as t
+from functools import lru_cache
+
+# 未找到的标记，区别于值为None
+MISSING = object()
+
+# 步骤类型
+_CHILD = "child"  # 键；在列表上为数字时表示下标
+_INDEX = "index"
+_SLICE = "slice"
+_WILDCARD = "wildcard"
+_UNION = "union"
+_RECURSIVE = "recursive"
+_FILTER = "filter"
+
+# 点号后的名称
+_NAME = re.compile(r"[^.\[\]]+")
+
+
+def _get(node: t.Any, key: t.Union[t.Text, int]) -> t.Any:
+    """取子节点，不存在时返回MISSING"""
+    if isinstance(node, dict):
+        return node.get(key, MISSING) if isinstance(key, str) else MISSING
+    if isinstance(node, (list, tuple)):
+        if isinstance(key, str):
+            if not key.isdigit():
+                return MISSING
+            key = int(key)
+        if -len(node) <= key < len(node):
+            return node[key]
+    return MISSING
+
+
+def _children(node: t.Any) -> t.Iterable:
+    if isinstance(node, dict):
+        return node.values()
+    if isinstance(node, (list, tuple)):
+        return node
+    return ()
+
+
+def _descendants(node: t.Any, out: t.List) -> None:
+    """节点本身及其全部后代（先序）"""
+    out.append(node)
+    for child in _children(node):
+        if isinstance(child, (dict, list, tuple)):
+            _descendants(child, out)
+
+
+def _step_func(kind: t.Text, arg: t.Any) -> t.Callable[[t.List], t.List]:
+    """把一个步骤编译为 节点列表 -> 节点列表 的函数"""
+    if kind in (_CHILD, _INDEX):
+        def step(nodes):
+            return [v for v in (_get(node, arg) for node in nodes) if v is not MISSING]
+    elif kind == _UNION:
+        def step(nodes):
+            return [v for node in nodes for v in (_get(node, key) for key in arg) if v is not MISSING]
+    elif kind == _SLICE:
+        def step(nodes):
+            return [v for node in nodes if isinstance(node, (list, tuple)) for v in node[arg]]
+    elif kind == _WILDCARD:
+        def step(nodes):
+            return [v for node in nodes for v in _children(node)]
+    elif kind == _RECURSIVE:
+        def step(nodes):
+            out = []
+            for node in nodes:
+                _descendants(node, out)
+            return out
+    elif kind == _FILTER:
+        def step(nodes):
+            return [v for node in nodes for v in _children(node) if arg(v)]
+    else:
+        raise ValueError(f"未知的路径步骤：{kind}")
+    return step
+
+
+class JsonPath:
+    """编译后的路径"""
+    __slots__ = ("path", "steps", "definite", "_funcs")
+
+    def __init__(self, path: t.Text, steps: t.List[t.Tuple[t.Text, t.Any]]):
+        self.path = path
+        self.steps = steps
+        # 只有子节点和下标时最多匹配一个值
+        self.definite = all(kind in (_CHILD, _INDEX) for kind, _ in steps)
+        self._funcs = [_step_func(kind, arg) for kind, arg in steps]
+
+    def find(self, obj: t.Any) -> t.List[t.Any]:
+        """全部匹配的值"""
+        if self.definite:
+            value = self.first(obj, MISSING)
+            return [] if value is MISSING else [value]
+        nodes = [obj]
+        for func in self._funcs:
+            nodes = func(nodes)
+            if not nodes:
+                break
+        return nodes
+
+    def first(self, obj: t.Any, default: t.Any = None) -> t.Any:
+        """第一个匹配的值"""
+        if not self.definite:
+            nodes = self.find(obj)
+            return nodes[0] if nodes else default
+        for _, key in self.steps:
+            obj = _get(obj, key)
+            if obj is MISSING:
+                return default
+        return obj
+
+    def value(self, obj: t.Any, default: t.Any = None) -> t.Any:
+        """提取的值：确定路径为匹配的值，含通配/切片/过滤/递归的路径为匹配值的列表，没有匹配时返回default"""
+        if self.definite:
+            return self.first(obj, default)
+        return self.find(obj) or default
+
+    def __repr__(self):
+        return f"<JsonPath {self.path!r}>"
+
+
+def _bracket_end(path: t.Text, start: int) -> int:
+    """与path[start]处的[匹配的]的位置，跳过引号和括号中的内容"""
+    depth = 0
+    quote = None
+    i = start + 1
+    while i < len(path):
+        c = path[i]
+        if quote:
+            if c == "\\":
+                i += 1
+            elif c == quote:
+                quote = None
+        elif c in "'\"":
+            quote = c
+        elif c in "([":
+            depth += 1
+        elif c in ")]":
+            if c == "]" and depth == 0:
+                return i
+            depth -= 1
+        i += 1
+    raise ValueError(f"无效的JSONPath：{path}，缺少]")
+
+
+def _split_args(content: t.Text) -> t.List[t.Text]:
+    """按逗号拆分，忽略引号中的逗号"""
+    return [part.strip() for part in re.findall(r"""(?:'[^']*'|"[^"]*"|[^,])+""", content)]
+
+
+def _literal_key(part: t.Text) -> t.Union[t.Text, int]:
+    if len(part) >= 2 and part[0] == part[-1] and part[0] in "'\"":
+        return part[1:-1]
+    try:
+        return int(part)
+    except ValueError:
+        return part
+
+
+def _parse_bracket(content: t.Text, path: t.Text) -> t.Tuple[t.Text, t.Any]:
+    if content == "*":
+        return _WILDCARD, None
+    if content.startswith("?"):
+        expr = content[1:].strip()
+        if expr.startswith("(") and expr.endswith(")"):
+            expr = expr[1:-1]
+        return _FILTER, _FilterParser(expr, path).parse()
+    if ":" in content and content[0] not in "'\"":
+        try:
+            parts = [int(p) if p.strip() else None for p in content.split(":")]
+        except ValueError:
+            raise ValueError(f"无效的JSONPath切片：[{content}]（{path}）")
+        return _SLICE, slice(*parts)
+    keys = [_literal_key(part) for part in _split_args(content)]
+    if not keys:
+        raise ValueError(f"无效的JSONPath：{path}，[]中没有内容")
+    if len(keys) > 1:
+        return _UNION, keys
+    return (_INDEX if isinstance(keys[0], int) else _CHILD), keys[0]
+
+
+def _parse(path: t.Text) -> t.List[t.Tuple[t.Text, t.Any]]:
+    """解析路径为步骤列表"""
+    if not path.startswith("$"):
+        # 点分路径：每一段都是键（列表上为下标）
+        return [(_CHILD, part) for part in path.split(".")] if path else []
+    steps = []
+    i = 1
+    while i < len(path):
+        if path.startswith("..", i):
+            steps.append((_RECURSIVE, None))
+            i += 2
+            if i < len(path) and path[i] == "[":
+                continue
+        elif path[i] == ".":
+            i += 1
+        elif path[i] == "[":
+            end = _bracket_end(path, i)
+            steps.append(_parse_bracket(path[i + 1:end].strip(), path))
+            i = end + 1
+            continue
+        else:
+            raise ValueError(f"无效的JSONPath：{path}，位置{i}")
+        m = _NAME.match(path, i)
+        if not m:
+            raise ValueError(f"无效的JSONPath：{path}，位置{i}缺少名称")
+        name = m.group().strip()
+        steps.append((_WILDCARD, None) if name == "*" else (_CHILD, name))
+        i = m.end()
+    return steps
+
+
+# 过滤表达式的词法
+_TOKEN = re.compile(r"""\s*(?:
+    (?P<path>@(?:\.[^\s.\[\]()=!<>&|~,]+|\[(?:'[^']*'|"[^"]*"|-?\d+|\*)\])*)
+   |(?P<str>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+   |(?P<regex>/(?:[^/\\]|\\.)*/[imsx]*)
+   |(?P<num>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+   |(?P<word>true|false|null|nin|in)\b
+   |(?P<op>==|!=|<=|>=|=~|<|>|&&|\|\||!|\(|\)|\[|\]|,)
+)""", re.X)
+
+_COMPARE = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda a, b: a in b,
+    "nin": lambda a, b: a not in b,
+    "=~": lambda a, b: isinstance(a, str) and b.search(a) is not None,
+}
+_WORDS = {"true": True, "false": False, "null": None}
+_REGEX_FLAGS = {"i": re.I, "m": re.M, "s": re.S, "x": re.X}
+
+
+class _FilterParser:
+    """过滤表达式解析，生成 节点 -> bool 的函数"""
+    def __init__(self, expr: t.Text, path: t.Text):
+        self.path = path
+        self.tokens: t.List[t.Tuple[t.Text, t.Text]] = []
+        pos = 0
+        expr = expr.strip()
+        while pos < len(expr):
+            m = _TOKEN.match(expr, pos)
+            if not m or m.end() == pos:
+                raise ValueError(f"无效的JSONPath过滤表达式：{expr}，位置{pos}（{path}）")
+            self.tokens.append((m.lastgroup, m.group(m.lastgroup)))
+            pos = m.end()
+        self.pos = 0
+
+    def _peek(self) -> t.Optional[t.Text]:
+        return self.tokens[self.pos][1] if self.pos < len(self.tokens) else None
+
+    def _next(self) -> t.Tuple[t.Text, t.Text]:
+        if self.pos >= len(self.tokens):
+            raise ValueError(f"JSONPath过滤表达式不完整（{self.path}）")
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def _expect(self, text: t.Text) -> None:
+        if self._next()[1] != text:
+            raise ValueError(f"JSONPath过滤表达式缺少{text}（{self.path}）")
+
+    def parse(self) -> t.Callable[[t.Any], bool]:
+        pred = self._or()
+        if self.pos != len(self.tokens):
+            raise ValueError(f"JSONPath过滤表达式中有多余的内容：{self._peek()}（{self.path}）")
+        return pred
+
+    def _or(self):
+        preds = [self._and()]
+        while self._peek() == "||":
+            self._next()
+            preds.append(self._and())
+        return preds[0] if len(preds) == 1 else (lambda v: any(p(v) for p in preds))
+
+    def _and(self):
+        preds = [self._unary()]
+        while self._peek() == "&&":
+            self._next()
+            preds.append(self._unary())
+        return preds[0] if len(preds) == 1 else (lambda v: all(p(v) for p in preds))
+
+    def _unary(self):
+        if self._peek() == "!":
+            self._next()
+            pred = self._unary()
+            return lambda v: not pred(v)
+        if self._peek() == "(":
+            self._next()
+            pred = self._or()
+            self._expect(")")
+            return pred
+        return self._comparison()
+
+    def _comparison(self):
+        left = self._operand()
+        op = self._peek()
+        if op not in _COMPARE:
+            # 只有一个操作数：值存在且为真
+            def exists(v):
+                value = left(v)
+                return value is not MISSING and bool(value)
+            return exists
+        self._next()
+        right = self._operand(regex=op == "=~")
+        compare = _COMPARE[op]
+
+        def pred(v):
+            a, b = left(v), right(v)
+            if a is MISSING or b is MISSING:
+                return False
+            try:
+                return bool(compare(a, b))
+            except TypeError:
+                # 类型不可比较（如字符串和数字比大小）时不匹配
+                return False
+        return pred
+
+    def _operand(self, regex: bool = False) -> t.Callable[[t.Any], t.Any]:
+        kind, text = self._next()
+        if kind == "path":
+            relative = compile_path("$" + text[1:])
+            return lambda v: relative.first(v, MISSING)
+        if kind == "op" and text == "[":
+            values = []
+            while self._peek() != "]":
+                values.append(self._literal(*self._next()))
+                if self._peek() == ",":
+                    self._next()
+            self._next()
+            return lambda v: values
+        value = self._literal(kind, text)
+        if regex and isinstance(value, str):
+            value = re.compile(value)
+        return lambda v: value
+
+    def _literal(self, kind: t.Text, text: t.Text) -> t.Any:
+        if kind == "str":
+            return re.sub(r"\\(.)", r"\1", text[1:-1])
+        if kind == "num":
+            return float(text) if any(c in text for c in ".eE") else int(text)
+        if kind == "word" and text in _WORDS:
+            return _WORDS[text]
+        if kind == "regex":
+            body, flags = text[1:].rsplit("/", 1)
+            value = 0
+            for flag in flags:
+                value |= _REGEX_FLAGS[flag]
+            return re.compile(body, value)
+        raise ValueError(f"JSONPath过滤表达式中无效的值：{text}（{self.path}）")
+
+
+@lru_cache(maxsize=4096)
+def compile_path(path: t.Text) -> JsonPath:
+    """编译JSONPath（以$开头）或点分路径，相同的路径只编译一次"""
+    return JsonPath(path, _parse(path.strip()))
+
+
+if __name__ == '__main__':
+    import random
+    import time
+    import jsonpath
+
+    rng = random.Random(1)
+    response = {"code": 0, "data": {"total": 20000, "items": [
+        {"id": i, "name": f"item{i}", "price": rng.randint(1, 1000), "tags": ["a", "b"][: i % 3],
+         "detail": {"sku": f"S{i}", "stock": i % 7}} for i in range(20000)]}}
+
+    def bench(func, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = func()
+        return (time.perf_counter() - start) / repeat * 1000, result
+
+    def old_dotted(obj, key):
+        # 原extract_value中的逐级取值
+        for k in key.split('.'):
+            if isinstance(obj, dict) and k in obj:
+                obj = obj[k]
+            else:
+                return None
+        return obj
+
+    print(f"{'path':<45}{'jsonpath(ms)':>14}{'compiled(ms)':>14}{'speedup':>9}")
+    cases = [("$.data.total", 2000), ("$.data.items[5].detail.sku", 2000), ("$.data.items[-1:]", 20),
+             ("$.data.items[*].id", 5), ("$.data.items[0,2,4].name", 20),
+             ("$.data.items[?(@.price > 990)].id", 3), ("$..sku", 3)]
+    for path, repeat in cases:
+        old_ms, old = bench(lambda: jsonpath.jsonpath(response, path), repeat)
+        new_ms, new = bench(lambda: compile_path(path).find(response), repeat)
+        assert old == new, (path, old[:5], new[:5])
+        print(f"{path:<45}{old_ms:>14.3f}{new_ms:>14.3f}{old_ms / new_ms:>8.1f}x")
+    old_ms, _ = bench(lambda: old_dotted(response, "data.total"), 20000)
+    new_ms, _ = bench(lambda: compile_path("data.total").first(response), 20000)
+    print(f"{'data.total (Extract)':<45}{old_ms:>14.4f}{new_ms:>14.4f}{old_ms / new_ms:>8.1f}x")
@@ -0,0 +1,381 @@
+"""
+压测模式
+复用现有YAML用例（method/route/RequestData/Validate/Extract）作为压测场景：
+N个虚拟用户各自持有独立的变量上下文，按场景中的用例顺序循环发送请求，
+支持目标RPS限速、分阶段爬坡和固定时长，按路由统计延迟分布（p50/p95/p99/max）、吞吐量和错误率。
+请求异常、Validate断言失败，以及没有用expectcode指定预期状态码时的4xx/5xx响应计为错误。
+压测只发送HTTP请求，不执行setup_db/setup_redis等前后置操作。
+
+用法：
+    python -m common.load tests/xxx/test_login.yaml --env Qspace --users 20 --duration 60
+    python -m common.load tests/xxx/test_login.yaml --case test_login --baseurl http://127.0.0.1:8080 --rps 100
+    python -m common.load tests/xxx/test_login.yaml --stages 30s:10,2m:50,30s:0 --json load-report.json
+"""
+import argparse
+import logging
+import math
+import re
+import threading
+import time
+import typing as t
+from collections import Counter
+from pathlib import Path
+from common.cache import CASE, FILE, VariableStore, cache
+from common.json import dumps
+from common.loader import PARAM_KEYS, load_yaml, apply_file_config
+from common.params import iter_parameters
+from common.request import http_pool
+from common.response import ParsedResponse
+from common.result import extract_rules, extract_value
+from common.template import Template, compile_template
+from common.validator import Validator, compile_validate
+from utils.faker_utils import faker_pool
+from utils.logger import logger
+
+
+class LatencyHistogram:
+    """延迟直方图
+    按对数分桶记录，相对误差约为precision，内存占用与请求数无关。
+    """
+    def __init__(self, precision: float = 0.01):
+        self._base = math.log1p(precision)
+        self.buckets: Counter = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        micros = max(seconds * 1e6, 1.0)
+        self.buckets[int(math.log(micros) / self._base)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        self.buckets.update(other.buckets)
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p: float) -> float:
+        """百分位延迟（秒）"""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(math.exp((bucket + 0.5) * self._base) / 1e6, self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class RouteStats:
+    """单个路由的统计"""
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.errors: Counter = Counter()
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float, error: t.Optional[t.Text] = None) -> None:
+        with self.lock:
+            self.latency.record(seconds)
+            if error:
+                self.errors[error] += 1
+
+    def to_dict(self, elapsed: float) -> t.Dict:
+        errors = sum(self.errors.values())
+        count = self.latency.count
+        return {
+            "requests": count,
+            "errors": errors,
+            "error_rate": round(errors / count, 4) if count else 0.0,
+            "throughput": round(count / elapsed, 2) if elapsed else 0.0,
+            "mean_ms": round(self.latency.mean * 1000, 2),
+            "p50_ms": round(self.latency.percentile(50) * 1000, 2),
+            "p95_ms": round(self.latency.percentile(95) * 1000, 2),
+            "p99_ms": round(self.latency.percentile(99) * 1000, 2),
+            "max_ms": round(self.latency.max * 1000, 2),
+            "error_kinds": dict(self.errors.most_common(10)),
+        }
+
+
+class LoadProfile:
+    """负载曲线
+    未指定阶段时为恒定用户数；阶段为[(时长秒, 目标用户数)]，每个阶段内从上一阶段的用户数线性过渡到目标值。
+    """
+    def __init__(self, users: int = 1, duration: float = 60.0,
+                 stages: t.Optional[t.List[t.Tuple[float, int]]] = None):
+        self.stages = stages or [(duration, users)]
+        self.constant = not stages
+        self.duration = sum(d for d, _ in self.stages)
+        self.max_users = max(u for _, u in self.stages)
+
+    @staticmethod
+    def parse_stages(text: t.Text) -> t.List[t.Tuple[float, int]]:
+        """解析阶段配置，如 30s:10,2m:50,30s:0"""
+        stages = []
+        for part in text.split(","):
+            duration, users = part.strip().split(":")
+            m = re.fullmatch(r"([\d.]+)\s*(ms|s|m|h)?", duration.strip())
+            if not m:
+                raise ValueError(f"无效的阶段时长：{duration}")
+            unit = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[m.group(2) or "s"]
+            stages.append((float(m.group(1)) * unit, int(users)))
+        return stages
+
+    def users_at(self, elapsed: float) -> int:
+        """当前时刻应处于活跃状态的用户数"""
+        if self.constant:
+            return self.max_users if elapsed < self.duration else 0
+        start_users, start = 0, 0.0
+        for duration, target in self.stages:
+            if elapsed < start + duration:
+                progress = (elapsed - start) / duration if duration else 1.0
+                return round(start_users + (target - start_users) * progress)
+            start_users, start = target, start + duration
+        return 0
+
+
+class RatePacer:
+    """全局限速器
+    所有虚拟用户共享，按固定间隔发放请求许可；rate为空时不限速。
+    """
+    def __init__(self, rate: t.Optional[float] = None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline: float) -> bool:
+        """等待许可，超过截止时间返回False"""
+        if not self.interval:
+            return True
+        with self._lock:
+            now = time.perf_counter()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot >= deadline:
+            return False
+        if slot > now:
+            time.sleep(slot - now)
+        return True
+
+
+class ScenarioCase:
+    """场景中的一个步骤（一条YAML用例）"""
+    def __init__(self, name: t.Text, spec: t.Dict, base_dir="."):
+        self.name = name
+        self.spec = spec
+        # 虚拟用户循环使用参数组，parameters_from的数据需要全部读入
+        self.params: t.List[t.Dict] = list(iter_parameters(spec, base_dir) or [])
+        self.template: Template = compile_template({k: v for k, v in spec.items() if k not in PARAM_KEYS})
+        self.validator: t.Optional[Validator] = compile_validate(spec.get('Validate'))
+        self.label = f"{str(spec.get('method', 'GET')).upper()} {spec.get('route')}"
+
+
+class Scenario:
+    """压测场景：一个YAML文件中的全部或指定用例，虚拟用户按顺序循环执行"""
+    def __init__(self, cases: t.List[ScenarioCase], variables: t.Optional[VariableStore] = None):
+        if not cases:
+            raise ValueError("压测场景中没有可执行的用例")
+        self.cases = cases
+        # 文件级变量池
+        self.variables = variables if variables is not None else cache.fork(FILE)
+
+    @classmethod
+    def from_file(cls, path, case_names: t.Optional[t.Iterable[t.Text]] = None) -> "Scenario":
+        raw = load_yaml(path)
+        variables = cache.fork(FILE)
+        apply_file_config(raw, variables)
+        tests = raw.get('tests') or {}
+        names = list(case_names) if case_names else list(tests)
+        missing = [name for name in names if name not in tests]
+        if missing:
+            raise ValueError(f"用例不存在：{missing}，可选用例：{list(tests)}")
+        return cls([ScenarioCase(name, tests[name], Path(path).parent) for name in names], variables)
+
+
+class VirtualUser(threading.Thread):
+    """虚拟用户
+    拥有独立的变量上下文（提取的变量只写入自身）和独立Cookie的会话，连接来自全局连接池。
+    """
+    def __init__(self, index: int, runner: "LoadRunner"):
+        super().__init__(name=f"vu-{index}", daemon=True)
+        self.index = index
+        self.runner = runner
+        # 变量查找顺序：用户变量 -> 压测覆盖的配置 -> 文件级变量 -> 会话级变量
+        self.store = runner.variables.fork(CASE)
+        self.session = http_pool.get("case")
+        self.iterations = 0
+
+    def run(self) -> None:
+        runner = self.runner
+        while not runner.stopped:
+            elapsed = time.perf_counter() - runner.started
+            if elapsed >= runner.profile.duration:
+                break
+            if self.index >= runner.profile.users_at(elapsed):
+                time.sleep(0.05)
+                continue
+            for case in runner.scenario.cases:
+                if runner.stopped or not runner.pacer.acquire(runner.deadline):
+                    return
+                self.step(case)
+            self.iterations += 1
+
+    def step(self, case: ScenarioCase) -> None:
+        """执行一个步骤并记录延迟/错误"""
+        if case.params:
+            self.store.update(case.params[(self.index + self.iterations) % len(case.params)])
+        error = None
+        start = time.perf_counter()
+        try:
+            method, url, request_data, kwargs = self.session.build_request(case.template, store=self.store)
+            response = ParsedResponse.from_requests(self.session.dispatch(method, url, **request_data))
+            elapsed = time.perf_counter() - start
+            error = self.validate(response, case.validator, kwargs.get('Validate'))
+            if extract := kwargs.get('Extract'):
+                self.extract(response, extract)
+        except Exception as e:
+            elapsed = time.perf_counter() - start
+            error = type(e).__name__
+        self.runner.stats(case.label).record(elapsed, error)
+
+    @staticmethod
+    def validate(response, validator: t.Optional[Validator], validate: t.Optional[t.Dict]) -> t.Optional[t.Text]:
+        """轻量校验，遇到第一个失败的断言即停止且不写报告，返回错误类型
+        用例没有通过expectcode指定预期状态码时，4xx/5xx响应记为错误。
+        """
+        results = validator.run(response, validate, fail_fast=True) if validator is not None else []
+        for result in results:
+            if not result.passed:
+                return f"status {result.actual}" if result.check == "expectcode" else result.check
+        if response.status_code >= 400 and not any(result.check == "expectcode" for result in results):
+            return f"status {response.status_code}"
+        return None
+
+    def extract(self, response, extract: t.List) -> None:
+        """提取变量到用户自己的上下文"""
+        try:
+            resp_json = response.json()
+        except ValueError:
+            return
+        for key, path in extract_rules(extract):
+            value = extract_value(response, resp_json, key, path)
+            if value is not None:
+                self.store.set(key, value)
+
+
+class LoadRunner:
+    """压测执行器"""
+    def __init__(self, scenario: Scenario, profile: LoadProfile,
+                 rps: t.Optional[float] = None, baseurl: t.Optional[t.Text] = None):
+        self.scenario = scenario
+        self.profile = profile
+        self.pacer = RatePacer(rps)
+        self.rps = rps
+        self.overrides = {"baseurl": baseurl} if baseurl else {}
+        # 虚拟用户共享的变量池快照，压测期间其他地方写入的变量不影响压测
+        self.variables = scenario.variables.snapshot().fork("override", self.overrides)
+        self.routes: t.Dict[t.Text, RouteStats] = {}
+        self._lock = threading.Lock()
+        self.stopped = False
+        self.started = 0.0
+        self.deadline = 0.0
+        self.elapsed = 0.0
+
+    def stats(self, label: t.Text) -> RouteStats:
+        if label not in self.routes:
+            with self._lock:
+                self.routes.setdefault(label, RouteStats())
+        return self.routes[label]
+
+    def run(self) -> t.Dict:
+        """执行压测并返回报告"""
+        # 压测期间只保留警告以上的日志，避免逐请求写日志影响结果
+        level = logger.level
+        logger.setLevel(logging.WARNING)
+        http_pool.configure(pool_maxsize=max(self.profile.max_users, 1))
+        users = [VirtualUser(i, self) for i in range(self.profile.max_users)]
+        self.started = time.perf_counter()
+        self.deadline = self.started + self.profile.duration
+        try:
+            for user in users:
+                user.start()
+            for user in users:
+                user.join(max(self.deadline - time.perf_counter(), 0) + 30)
+        except KeyboardInterrupt:
+            self.stopped = True
+        finally:
+            self.stopped = True
+            self.elapsed = time.perf_counter() - self.started
+            logger.setLevel(level)
+            http_pool.close()
+        return self.report()
+
+    def report(self) -> t.Dict:
+        total = RouteStats()
+        for stats in self.routes.values():
+            total.latency.merge(stats.latency)
+            total.errors.update(stats.errors)
+        return {
+            "duration": round(self.elapsed, 3),
+            "users": self.profile.max_users,
+            "target_rps": self.rps,
+            "total": total.to_dict(self.elapsed),
+            "routes": {label: stats.to_dict(self.elapsed) for label, stats in self.routes.items()},
+        }
+
+
+def format_report(report: t.Dict) -> t.Text:
+    """格式化压测报告"""
+    header = f"{'route':<40}{'reqs':>8}{'err%':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+    lines = [f"时长 {report['duration']}s，用户数 {report['users']}，目标RPS {report['target_rps'] or '-'}", header]
+    rows = list(report["routes"].items()) + [("TOTAL", report["total"])]
+    for label, r in rows:
+        lines.append(f"{label[:39]:<40}{r['requests']:>8}{r['error_rate'] * 100:>7.2f}%{r['throughput']:>9}"
+                     f"{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}{r['max_ms']:>9}")
+        for kind, count in r["error_kinds"].items():
+            lines.append(f"    {kind}: {count}")
+    return "\n".join(lines)
+
+
+def main(argv: t.Optional[t.List[t.Text]] = None) -> t.Dict:
+    parser = argparse.ArgumentParser(description="复用YAML用例的压测模式")
+    parser.add_argument("path", help="YAML用例文件")
+    parser.add_argument("--case", action="append", help="场景包含的用例名，可重复指定，默认文件中全部用例")
+    parser.add_argument("--env", default="dev", help="测试环境，使用其baseurl")
+    parser.add_argument("--baseurl", help="覆盖环境的baseurl，如本地桩服务地址")
+    parser.add_argument("--users", type=int, default=10, help="虚拟用户数")
+    parser.add_argument("--duration", type=float, default=60, help="压测时长（秒）")
+    parser.add_argument("--stages", help="分阶段爬坡，如 30s:10,2m:50,30s:0（指定后忽略--users/--duration）")
+    parser.add_argument("--rps", type=float, help="目标RPS（全部用户合计）")
+    parser.add_argument("--json", help="报告输出的JSON文件路径")
+    parser.add_argument("--faker-seed", help="faker数据的随机种子，相同种子生成相同的数据")
+    args = parser.parse_args(argv)
+
+    baseurl = args.baseurl
+    if not baseurl:
+        from config.environments import ENVIRONMENTS
+        if args.env not in ENVIRONMENTS:
+            parser.error(f"无效环境：{args.env}，可选环境：{list(ENVIRONMENTS.keys())}")
+        baseurl = ENVIRONMENTS[args.env]["baseurl"]
+    faker_pool.configure(seed=args.faker_seed)
+    logger.info(f"faker随机种子：{faker_pool.seed}")
+    stages = LoadProfile.parse_stages(args.stages) if args.stages else None
+    profile = LoadProfile(args.users, args.duration, stages)
+    scenario = Scenario.from_file(args.path, args.case)
+    report = LoadRunner(scenario, profile, rps=args.rps, baseurl=baseurl).run()
+    print(format_report(report))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(dumps(report, ensure_ascii=False))
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+YAML用例加载
+该模块负责读取YAML用例文件，并将文件级的variable/config写入文件级变量池，
+pytest收集与压测模式共用。
+解析和编译后的用例按文件内容哈希缓存到磁盘，文件未修改时直接加载，跳过YAML解析和模板编译。
+"""
+import hashlib
+import os
+import pickle
+import typing as t
+from pathlib import Path
+import yaml
+from common.cache import SESSION, VariableStore, cache
+from common.exceptions import YamlException
+from common.regular import resolve_var
+from common.template import Template, compile_template
+from utils.logger import logger
+
+# YAML解析器，优先使用libyaml的C实现
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+# 缓存格式版本，编译结构变化时递增以淘汰旧缓存
+CACHE_VERSION = 2
+# 参数组相关的键，执行时单独注入缓存，不参与模板渲染
+PARAM_KEYS = ('parameters', 'parameters_from')
+
+
+def parse_yaml(content: t.Union[t.Text, bytes], path="") -> t.Dict:
+    """解析YAML用例内容，必须包含以test开头的键"""
+    raw = yaml.load(content, Loader=YamlLoader)
+    # 检查是否包含以test开头的键
+    if not raw or not any(k.startswith('test') for k in raw.keys()):
+        # 如果不包含，则抛出YamlException异常
+        raise YamlException(f"{path}yaml non test found")
+    return raw
+
+
+def load_yaml(path) -> t.Dict:
+    """加载YAML用例文件，文件中必须包含以test开头的键"""
+    with open(path, encoding='utf-8') as f:
+        return parse_yaml(f.read(), path)
+
+
+def compile_tests(raw: t.Dict) -> t.Dict[t.Text, Template]:
+    """编译文件中每条用例的请求模板（参数组单独注入缓存，不参与渲染），同一用例的参数组共享"""
+    return {name: compile_template({k: v for k, v in spec.items() if k not in PARAM_KEYS})
+            for name, spec in (raw.get('tests') or {}).items()}
+
+
+class SuiteCache:
+    """已编译用例缓存
+    每个YAML文件对应一个缓存文件，保存(格式版本, 内容哈希, (原始用例, 编译后的模板))，
+    文件内容变化时哈希不一致，自动重新解析并覆盖缓存。未指定缓存目录时不缓存。
+    """
+    def __init__(self, cache_dir: t.Optional[Path] = None):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, cache_dir: t.Optional[Path] = None) -> None:
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.hits = self.misses = 0
+
+    def _cache_file(self, path) -> Path:
+        name = hashlib.sha1(str(Path(path).absolute()).encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{name}.pickle"
+
+    def load(self, path) -> t.Tuple[t.Dict, t.Dict[t.Text, Template]]:
+        """加载用例文件，返回(原始用例, 用例名 -> 请求模板)"""
+        content = Path(path).read_bytes()
+        digest = hashlib.sha1(content).hexdigest()
+        cache_file = self._cache_file(path) if self.cache_dir else None
+        if cache_file and cache_file.exists():
+            try:
+                with open(cache_file, "rb") as f:
+                    version, cached_digest, suite = pickle.load(f)
+                if version == CACHE_VERSION and cached_digest == digest:
+                    self.hits += 1
+                    return suite
+            except Exception as e:
+                logger.warning(f"用例缓存{cache_file}读取失败，重新解析：{e}")
+        self.misses += 1
+        raw = parse_yaml(content.decode("utf-8"), path)
+        suite = (raw, compile_tests(raw))
+        if cache_file:
+            # 先写临时文件再替换，避免并发收集时读到写了一半的缓存
+            tmp = cache_file.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp, "wb") as f:
+                pickle.dump((CACHE_VERSION, digest, suite), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cache_file)
+        return suite
+
+
+# 全局用例缓存实例
+suite_cache = SuiteCache()
+
+
+def apply_file_config(raw: t.Dict, store: t.Optional[VariableStore] = None) -> t.Optional[t.Text]:
+    """将文件级变量和配置写入变量池
+    同时作为会话级变量的默认值，其他文件仍可以引用；同名变量各文件使用自己的值。
+    :param store: 文件级变量池，默认写入当前上下文的变量池
+    :return: 文件级会话隔离级别（config.session），不写入变量池
+    """
+    if store is None:
+        store = cache.store
+
+    def put(key, value):
+        store.set(key, value)
+        if store is not cache.session:
+            cache.session.setdefault(key, value, scope=SESSION)
+
+    # 获取变量配置
+    if variable := raw.get('variable'):
+        # 将变量添加到变量池
+        for k, v in variable.items():
+            put(k, v)
+    session_scope = (raw.get('config') or {}).pop('session', None)
+    # 获取配置信息
+    if config := raw.get('config'):
+        # 替换变量，可以引用本文件的variable
+        config = compile_template(config).render(lambda key: resolve_var(key, store))
+        if 'headers' in config:
+            # 合并已有的headers，不修改外层变量池中的字典
+            config['headers'] = {**(store.get('headers') or {}), **config['headers']}
+        # 将配置信息添加到变量池
+        for k, v in config.items():
+            put(k, v)
+    return session_scope
@@ -0,0 +1,162 @@
+"""
+参数组数据源
+该模块从外部数据文件（CSV/JSONL/XLSX）逐行读取用例参数组，支持列映射、类型转换、过滤和抽样，
+收集时边读边生成用例，不需要把全部数据写在YAML中或一次性读入内存。
+
+用例中的写法：
+    parameters_from:
+      file: data/users.csv        # 相对于YAML文件所在目录
+      format: csv                 # 可选，默认按扩展名识别：csv/jsonl/xlsx
+      sheet: Sheet1               # xlsx工作表，默认第一个
+      columns:                    # 列映射 参数名: 列名，指定后只保留映射的列
+        username: user_name
+        expectcode: code
+      types:                      # 类型转换：int/float/bool/json/str
+        expectcode: int
+      filter:                     # 过滤：列值等于给定值（或在给定列表中）的行
+        status: [active, frozen]
+      sample: 0.01                # 抽样比例（0~1）或 "1%"
+      seed: 42                    # 抽样随机种子，相同种子抽中的行相同
+      limit: 1000                 # 最多生成的参数组数量
+      null: "\\N"                 # 表示None的值，默认不转换
+"""
+import csv
+import itertools
+import random
+import typing as t
+from pathlib import Path
+from common.exceptions import YamlException
+from common.json import json, loads
+
+# 类型转换
+CONVERTERS: t.Dict[t.Text, t.Callable[[t.Any], t.Any]] = {
+    "str": str,
+    "int": lambda v: int(float(v)) if isinstance(v, str) and "." in v else int(v),
+    "float": float,
+    "bool": lambda v: v if isinstance(v, bool) else str(v).strip().lower() in ("1", "true", "yes", "y"),
+    "json": lambda v: loads(v) if isinstance(v, str) else v,
+}
+
+
+def _read_csv(path: Path, options: t.Dict) -> t.Iterator[t.Dict]:
+    with open(path, newline="", encoding=options.get("encoding", "utf-8-sig")) as f:
+        yield from csv.DictReader(f, delimiter=options.get("delimiter", ","))
+
+
+def _read_jsonl(path: Path, options: t.Dict) -> t.Iterator[t.Dict]:
+    with open(path, encoding=options.get("encoding", "utf-8")) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _read_xlsx(path: Path, options: t.Dict) -> t.Iterator[t.Dict]:
+    try:
+        import openpyxl  # 读取xlsx为可选功能，用到时才导入
+    except ImportError:
+        raise YamlException("读取xlsx参数文件需要安装openpyxl：pip install openpyxl")
+    # 只读模式按行流式读取
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[options["sheet"]] if options.get("sheet") else workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = [str(h) if h is not None else "" for h in next(rows, ())]
+        for row in rows:
+            if any(v is not None for v in row):
+                yield dict(zip(header, row))
+    finally:
+        workbook.close()
+
+
+READERS = {"csv": _read_csv, "jsonl": _read_jsonl, "xlsx": _read_xlsx}
+
+
+def _sample_rate(value: t.Any) -> t.Optional[float]:
+    """抽样比例，支持0.01和"1%"两种写法"""
+    if value is None:
+        return None
+    if isinstance(value, str) and value.strip().endswith("%"):
+        return float(value.strip()[:-1]) / 100
+    return float(value)
+
+
+class ParameterSource:
+    """参数组数据源"""
+    def __init__(self, file: t.Text, base_dir: t.Union[Path, t.Text] = ".", format: t.Optional[t.Text] = None,
+                 columns: t.Optional[t.Dict[t.Text, t.Text]] = None, types: t.Optional[t.Dict[t.Text, t.Text]] = None,
+                 filter: t.Optional[t.Dict[t.Text, t.Any]] = None, sample: t.Any = None,
+                 seed: t.Any = 0, limit: t.Optional[int] = None, null: t.Optional[t.Text] = None, **options):
+        self.path = Path(base_dir) / file
+        self.format = (format or self.path.suffix.lstrip(".")).lower()
+        if self.format not in READERS:
+            raise YamlException(f"不支持的参数文件格式：{self.format}，可选格式：{list(READERS)}")
+        self.columns = columns
+        self.types = {k: CONVERTERS[v] for k, v in (types or {}).items()}
+        # 过滤条件统一转为字符串集合比较，CSV中的值都是字符串
+        self.filter = {k: {str(x) for x in (v if isinstance(v, list) else [v])} for k, v in (filter or {}).items()}
+        self.sample = _sample_rate(sample)
+        self.seed = seed
+        self.limit = limit
+        self.null = null
+        self.options = options
+
+    @classmethod
+    def from_spec(cls, spec: t.Union[t.Text, t.Dict], base_dir: t.Union[Path, t.Text] = ".") -> "ParameterSource":
+        """由用例中的parameters_from创建，可以只写文件路径"""
+        if isinstance(spec, str):
+            spec = {"file": spec}
+        return cls(base_dir=base_dir, **spec)
+
+    def _convert(self, row: t.Dict) -> t.Dict:
+        if self.columns:
+            row = {name: row.get(column) for name, column in self.columns.items()}
+        if self.null is not None:
+            row = {k: None if v == self.null else v for k, v in row.items()}
+        for key, convert in self.types.items():
+            if row.get(key) not in (None, ""):
+                row[key] = convert(row[key])
+        return row
+
+    def rows(self, sample: t.Any = None) -> t.Iterator[t.Dict]:
+        """逐行生成参数组
+        :param sample: 覆盖数据源中配置的抽样比例（如冒烟模式只跑1%的数据）
+        """
+        rate = _sample_rate(sample) if sample is not None else self.sample
+        rng = random.Random(self.seed)
+        rows = READERS[self.format](self.path, self.options)
+        if self.filter:
+            rows = (row for row in rows
+                    if all(str(row.get(k)) in values for k, values in self.filter.items()))
+        if rate is not None and rate < 1:
+            # 每行独立抽样，随机数序列由种子决定，相同数据每次抽中的行相同
+            rows = (row for row in rows if rng.random() < rate)
+        rows = (self._convert(row) for row in rows)
+        if self.limit is not None:
+            rows = itertools.islice(rows, self.limit)
+        return rows
+
+
+def iter_parameters(spec: t.Dict, base_dir: t.Union[Path, t.Text] = ".",
+                    sample: t.Any = None) -> t.Optional[t.Iterator[t.Dict]]:
+    """用例的全部参数组：先是YAML中的parameters，再是parameters_from读取的数据，没有参数组时返回None"""
+    parameters = spec.get('parameters')
+    source = spec.get('parameters_from')
+    if not parameters and not source:
+        return None
+    sources = [source] if isinstance(source, (str, dict)) else (source or [])
+    return itertools.chain(parameters or [],
+                           *(ParameterSource.from_spec(s, base_dir).rows(sample) for s in sources))
+
+
+if __name__ == '__main__':
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(Path(tmp) / "users.csv", "w", encoding="utf-8") as f:
+            f.write("user_name,code,status\n")
+            for i in range(1000):
+                f.write(f"user{i},200,{'active' if i % 2 else 'frozen'}\n")
+        source = ParameterSource.from_spec({"file": "users.csv", "columns": {"username": "user_name", "expectcode": "code"},
+                                            "types": {"expectcode": "int"}, "filter": {"status": "active"},
+                                            "sample": "10%", "seed": 1}, tmp)
+        rows = list(source.rows())
+        print(len(rows), rows[:2])
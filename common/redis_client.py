@@ -1,15 +1,90 @@
-import redis
+import re
+import threading
+import typing as t
+from utils.lazy_import import lazy_import
 from utils.logger import logger
 
+# 第一次使用Redis时才导入
+redis = lazy_import("redis", "使用Redis需要安装：pip install redis")
+
+
+# 整个参数被引号包裹时作为一个参数，其余按空白拆分
+_ARG = re.compile(r'"((?:[^"\\]|\\.)*)"(?=\s|$)|\'([^\']*)\'(?=\s|$)|(\S+)')
+_ESCAPE = re.compile(r'\\(["\\])')
+
+
+def parse_command(cmd: t.Text) -> t.List[t.Text]:
+    """拆分Redis命令
+    与原来一样按空白拆分；只有整个参数被引号包裹时才作为含空格的一个参数并去掉引号，如 SET greeting "hello world"。
+    参数中间的引号原样保留，如 SET k {"a":"b"}；双引号内可用\\"和\\\\转义。
+    """
+    if '"' not in cmd and "'" not in cmd:
+        return cmd.split()
+    args = []
+    for double, single, bare in _ARG.findall(cmd):
+        if bare:
+            args.append(bare)
+        elif single or not double:
+            # 单引号内不转义；空引号为空字符串参数
+            args.append(single)
+        else:
+            args.append(_ESCAPE.sub(r"\1", double))
+    return args
+
+
+class RedisPoolManager:
+    """Redis连接池管理
+    按环境的redis配置共享连接池，整个测试会话内复用；空闲连接按health_check_interval做健康检查。
+    """
+    def __init__(self):
+        self._pools: t.Dict[t.Tuple, "redis.ConnectionPool"] = {}
+        self._lock = threading.Lock()
+        self.max_connections = 10
+        self.health_check_interval = 30
+
+    def configure(self, max_connections: int = 10, health_check_interval: int = 30) -> None:
+        """配置每个连接池的最大连接数和健康检查间隔（秒）"""
+        self.max_connections = max_connections
+        self.health_check_interval = health_check_interval
+
+    def get(self, redis_config: t.Dict) -> "redis.ConnectionPool":
+        """获取redis配置对应的连接池"""
+        key = tuple(sorted(redis_config.items()))
+        with self._lock:
+            if key not in self._pools:
+                self._pools[key] = redis.BlockingConnectionPool(
+                    host=redis_config["host"],
+                    port=redis_config["port"],
+                    password=redis_config.get("password", ""),
+                    db=redis_config["db"],
+                    decode_responses=True,  # 自动解码为字符串
+                    max_connections=self.max_connections,
+                    health_check_interval=self.health_check_interval,
+                )
+            return self._pools[key]
+
+    def close(self) -> None:
+        with self._lock:
+            for pool in self._pools.values():
+                pool.disconnect()
+            self._pools.clear()
+
+
 class RedisClient:
-    def __init__(self, env_config):
-        """初始化Redis连接"""
+    def __init__(self, env_config, pool: t.Optional["redis.ConnectionPool"] = None):
+        """初始化Redis连接
+        :param pool: 连接池，提供时不再逐个用例建连和ping，命令执行时才取出连接
+        """
         self.env_config = env_config
+        self.pool = pool
         self.client = None
         self.connect()
 
     def connect(self):
         """建立Redis连接"""
+        if self.pool is not None:
+            self.client = redis.Redis(connection_pool=self.pool)
+            return
         try:
             self.client = redis.Redis(
                 host=self.env_config["host"],
@@ -33,13 +108,31 @@ class RedisClient:
             logger.error(f"Redis命令执行失败:{str(e)}")
             raise
 
+    def execute_pipeline(self, commands: t.List[t.List[t.Text]], transaction: bool = False) -> t.List[t.Any]:
+        """在一次往返中执行多条命令
+        :param commands: 已拆分的命令列表
+        :param transaction: 是否用MULTI/EXEC包裹为事务
+        """
+        try:
+            with self.client.pipeline(transaction=transaction) as pipe:
+                for args in commands:
+                    pipe.execute_command(*args)
+                return pipe.execute()
+        except Exception as e:
+            logger.error(f"Redis管道执行失败:{str(e)}")
+            raise
+
     def close(self):
-        """关闭redis连接"""
+        """关闭redis连接（使用连接池时只释放客户端，连接保留在池中）"""
         if self.client:
             self.client.close()
             # logger.info("Redis连接关闭")
 
 
+# 创建全局Redis连接池管理实例
+redis_pool = RedisPoolManager()
+
+
 if __name__ == '__main__':
     test_redis_config = {
         "host": "192.168.1.101",
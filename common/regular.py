@@ -2,99 +2,57 @@
 正则相关操作类
 该模块提供了正则表达式的查找、替换和提取功能，支持嵌套结构变量提取。
 """
+import logging
 import re
 import typing as t
 from common.cache import cache
 from common.json import is_json_str, loads, dumps
-from utils.logger import logger
-from utils.faker_utils import *
+from common.json_path import compile_path
+from utils.logger import lazy, logger
+from utils.faker_utils import faker_pool, parse_faker_key
 
-def _get_nested_value(obj: t.Union[dict, list, t.Any], path: str) -> t.Any:
-    """
-    从嵌套对象（字典/列表）中按路径提取值
-    支持格式：dict.key 或 list.0.key（数字表示列表索引）
+# ${key}变量匹配规则，faker变量可以带参数，如${faker.random_str(12)}
+VAR_PATTERN = re.compile(r"\$\{([\w.]+(?:\([\w.\-, ]*\))?)\}")
+# 变量无法解析（如未知的faker函数）时的标记，区别于值为None
+MISSING = object()
+
+
+def resolve_var(key: t.Text, store: t.Optional[t.Mapping] = None) -> t.Any:
+    """解析单个变量的值
+    faker变量从数据池（utils.faker_utils.faker_pool）取值；带点的变量优先取完整键（如data.token），再按嵌套路径取值。
+    无法解析时返回MISSING，调用方应保留原始的${key}。
+    :param store: 变量来源，默认为全局变量池
     """
-    if not path:
-        return obj  # 路径为空时返回原始对象
-    parts = path.split('.')
-    current = obj
-    for part in parts:
+    if store is None:
+        store = cache
+    if key.startswith('faker.'):
+        name, args = parse_faker_key(key[len('faker.'):])
         try:
-            if isinstance(current, list):
-                # 列表按索引访问（转换为整数）
-                index = int(part)
-                if 0 <= index < len(current):
-                    current = current[index]
-                else:
-                    return None
-            elif isinstance(current, dict):
-                # 字典按key访问
-                if part in current:
-                    current = current[part]
-                else:
-                    return None
-            else:
-                return None
-        except (ValueError, TypeError) as e:
-            logger.error(f"提取路径[{path}]失败：{str(e)}")
+            return faker_pool.get(name, args)
+        except KeyError:
+            return MISSING
+
+    # 优先检查缓存中是否存在完整带点的键（如data.token）
+    if '.' in key and store.get(key) is not None:
+        return store.get(key)
+    if '.' in key:
+        # 缓存中无完整键，再按嵌套路径处理（如image_objs.0.image_url）
+        root_key, nested_path = key.split('.', 1)
+        root_value = store.get(root_key)
+        if root_value is None:
             return None
-    return current
+        return compile_path(nested_path).first(root_value)
+    # 普通单键变量（如sessionid、type_id）
+    return store.get(key)
 
 
 def findalls(string: t.Text) -> t.Dict[t.Text, t.Any]:
     """查找所有${key}格式的变量，支持嵌套路径（如${image_objs.0.image_url}）和根键含点的变量（如${data.token}）"""
-    key_pattern = re.compile(r"\$\{([\w.]+)\}")
-    keys = key_pattern.findall(string)
     res = {}
-    for key in keys:
-        if key.startswith('faker.'):
-            func_name = key.split('faker.')[1].split('(')[0]
-            args = re.findall(r"\((.*?)\)", key)[0].split(",") if "(" in key else []
-            args = [arg.strip() for arg in args if arg.strip()]
-            faker_funcs = {
-                "phone": random_phone,
-                "name": random_name,
-                "email": random_email,
-                "random_int": random_int,
-                "random_str": random_str,
-                "address": random_address,
-                "ssn": random_ssn,
-                "username": random_username,
-                "password": random_password,
-                "birthdate": random_birthdate,
-                "sex": random_sex,
-                "ip": random_ipv4,
-                "domain": random_domain,
-                "company": random_company,
-                "price": random_price
-            }
-
-            if func_name in faker_funcs:
-                # 处理带参数的调用
-                if func_name == "random_int" and len(args) == 2:
-                    res[key] = random_int(int(args[0]), int(args[1]))
-                elif func_name == "random_str" and len(args) == 1:
-                    res[key] = random_str(int(args[0]))
-                else:
-                    res[key] = faker_funcs[func_name]()
-            continue
-
-        # 优先检查缓存中是否存在完整带点的键（如data.token）
-        if '.' in key and cache.get(key) is not None:
-            res[key] = cache.get(key)
-        elif '.' in key:
-            # 缓存中无完整键，再按嵌套路径处理（如image_objs.0.image_url）
-            root_key = key.split('.')[0]
-            nested_path = '.'.join(key.split('.')[1:])
-            root_value = cache.get(root_key)
-            if root_value is None:
-                res[key] = None
-                continue
-            nested_value = _get_nested_value(root_value, nested_path)
-            res[key] = nested_value
-        else:
-            # 普通单键变量（如sessionid、type_id）
-            res[key] = cache.get(key)
+    for key in VAR_PATTERN.findall(string):
+        value = resolve_var(key)
+        if value is not MISSING:
+            res[key] = value
     # logger.debug("需要替换的变量：{}".format(res))
     return res
 
@@ -112,7 +70,7 @@ def sub_var(keys: t.Dict, string: t.Text) -> t.Text:
             break  # 无剩余变量，退出循环
 
         if not is_log_printed:
-            logger.debug("需要替换的变量：{}".format(remaining_vars))
+            logger.debug("需要替换的变量：%s", remaining_vars)
             is_log_printed = True
 
         # 替换剩余变量
@@ -141,7 +99,9 @@ def sub_var(keys: t.Dict, string: t.Text) -> t.Text:
 
             res = pattern.sub(replace_func, res)
 
-    # 验证替换结果
+    # 验证替换结果（只用于调试日志，未开启DEBUG时不解析）
+    if not logger.isEnabledFor(logging.DEBUG):
+        return res
     try:
         res_dict = loads(res)
         filtered = {
@@ -149,7 +109,7 @@ def sub_var(keys: t.Dict, string: t.Text) -> t.Text:
             "route": res_dict.get("route"),
             "RequestData": res_dict.get("RequestData")
         }
-        logger.debug("替换结果（核心数据）：{}".format(dumps(filtered, ensure_ascii=False)))
+        logger.debug("替换结果（核心数据）：%s", lazy(dumps, filtered, ensure_ascii=False))
     except Exception as e:
         logger.error(f"替换结果解析失败：{e}，原始替换结果：{res}")
     return res
@@ -195,7 +155,7 @@ def sub_sql_var(keys: t.Dict, sql: t.Text) -> t.Text:
 
             res = pattern.sub(value_str, res)
 
-    logger.debug(f"SQL变量替换完成: {res}")
+    logger.debug("SQL变量替换完成: %s", res)
     return res
 
 def sub_redis_var(keys: t.Dict, cmd: t.Text) -> t.Text:
@@ -210,5 +170,5 @@ def sub_redis_var(keys: t.Dict, cmd: t.Text) -> t.Text:
             # Redis命令参数通常直接拼接，无需单引号（字符串也可直接使用）
             value_str = str(value) if value is not None else ""
             res = pattern.sub(value_str, res)
-    logger.debug(f"Redis命令替换完成: {res}")
+    logger.debug("Redis命令替换完成: %s", res)
     return res
\ No newline at end of file
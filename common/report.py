@@ -0,0 +1,237 @@
+"""
+报告代理
+该模块统一封装软断言(pytest.assume)和Allure调用。
+用例在调度器的工作线程或协程中执行时，断言和Allure操作先记录到当前用例的记录器，
+回到pytest主线程后再回放，保证结果归属到正确的用例；未开启记录时直接调用原接口。
+附件按大小上限截断后由后台线程写入Allure结果目录。
+"""
+import linecache
+import os
+import queue
+import sys
+import threading
+import typing as t
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+import allure
+import allure_commons
+import pytest
+from common import timing
+from utils.logger import logger
+
+# 当前执行上下文的用例记录器
+_recorder: ContextVar[t.Optional["CaseRecorder"]] = ContextVar("case_recorder", default=None)
+
+
+class CaseRecorder:
+    """用例记录器
+    记录断言失败、Allure步骤/附件/描述以及执行异常。
+    """
+    def __init__(self):
+        # 断言失败信息
+        self.failures: t.List[t.Text] = []
+        # Allure操作，步骤为("step", title, 子操作列表)
+        self.actions: t.List[t.Tuple] = []
+        self._stack = [self.actions]
+        # 执行过程中抛出的异常
+        self.exception: t.Optional[BaseException] = None
+
+    def add(self, action: t.Tuple) -> None:
+        self._stack[-1].append(action)
+
+    @contextmanager
+    def step(self, title: t.Text):
+        children: t.List[t.Tuple] = []
+        self.add(("step", title, children))
+        self._stack.append(children)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+
+    def replay(self) -> None:
+        """在pytest主线程中回放记录，若执行时有异常则重新抛出"""
+        # 回放后释放记录的附件内容，避免大量用例的报告数据一直留在内存中
+        actions, self.actions = self.actions, []
+        with timing.phase("allure"):
+            _replay_actions(actions)
+        for msg in self.failures:
+            pytest.assume(False, msg)
+        if self.exception is not None:
+            raise self.exception
+
+
+def _replay_actions(actions: t.List[t.Tuple]) -> None:
+    for action in actions:
+        kind = action[0]
+        if kind == "step":
+            with allure.step(action[1]):
+                _replay_actions(action[2])
+        elif kind == "attach":
+            attachment_writer.attach(**action[1])
+        elif kind == "description_html":
+            allure.dynamic.description_html(action[1])
+
+
+class AttachmentWriter:
+    """Allure附件后台写入
+    附件超过大小上限时只保留头尾内容；开启Allure时，用例线程只在结果中登记附件（写入空占位文件），
+    正文由后台线程写入结果目录，不阻塞用例执行。
+    """
+    def __init__(self):
+        # 单个附件的大小上限，0表示不限制
+        self.max_size = 1024 * 1024
+        # 用例描述中内联内容的上限，超过时完整内容另存为附件
+        self.inline_limit = 4096
+        self.report_dir: t.Optional[Path] = None
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: t.Optional[threading.Thread] = None
+        self._pending = threading.local()
+
+    def configure(self, report_dir: t.Optional[t.Text] = None, max_size: int = 1024 * 1024,
+                  inline_limit: int = 4096) -> None:
+        """设置大小上限，指定Allure结果目录时启动后台写入线程"""
+        self.max_size = max_size
+        self.inline_limit = inline_limit
+        if report_dir and self._thread is None:
+            self.report_dir = Path(report_dir).absolute()
+            allure_commons.plugin_manager.register(self)
+            self._thread = threading.Thread(target=self._run, name="allure-writer", daemon=True)
+            self._thread.start()
+
+    def clip(self, body: t.Any, limit: t.Optional[int] = None) -> t.Any:
+        """超过上限时截断，保留开头3/4和结尾1/4的内容"""
+        limit = self.max_size if limit is None else limit
+        if not isinstance(body, (str, bytes)) or limit <= 0 or len(body) <= limit:
+            return body
+        head = limit * 3 // 4
+        marker = f"\n...... 省略 {len(body) - limit} 字符 ......\n"
+        if isinstance(body, bytes):
+            marker = marker.encode("utf-8")
+        return body[:head] + marker + body[len(body) - (limit - head):]
+
+    def attach(self, body: t.Any, name: t.Optional[t.Text] = None, attachment_type=None, extension=None) -> None:
+        """在当前用例中登记附件，正文交给后台线程写入"""
+        if self._thread is None or not isinstance(body, (str, bytes)):
+            allure.attach(body, name=name, attachment_type=attachment_type, extension=extension)
+            return
+        self._pending.body = body
+        try:
+            allure.attach(b"", name=name, attachment_type=attachment_type, extension=extension)
+        finally:
+            self._pending.body = None
+
+    @allure_commons.hookimpl(trylast=True)
+    def report_attached_data(self, body, file_name):
+        """在Allure写入占位文件之后，把正文加入写入队列"""
+        pending = getattr(self._pending, "body", None)
+        if pending is not None:
+            self._pending.body = None
+            self._queue.put((self.report_dir / file_name, pending))
+
+    def _run(self) -> None:
+        while (task := self._queue.get()) is not None:
+            path, body = task
+            try:
+                path.write_bytes(body.encode("utf-8") if isinstance(body, str) else body)
+            except OSError as e:
+                logger.error(f"写入Allure附件{path.name}失败：{e}")
+
+    def close(self) -> None:
+        """写完队列中的附件后停止后台线程"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        allure_commons.plugin_manager.unregister(self)
+
+
+attachment_writer = AttachmentWriter()
+
+
+@contextmanager
+def recording():
+    """在当前上下文开启记录"""
+    recorder = CaseRecorder()
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorder.reset(token)
+
+
+def run_recorded(func: t.Callable, *args, **kwargs) -> CaseRecorder:
+    """记录模式下执行函数，异常保存在记录器中而不是直接抛出"""
+    with recording() as recorder:
+        try:
+            func(*args, **kwargs)
+        except BaseException as e:
+            recorder.exception = e
+    return recorder
+
+
+def _caller_context(depth: int = 2) -> t.Text:
+    """断言调用处的位置和源码，未提供断言信息时作为失败描述"""
+    frame = sys._getframe(depth)
+    filename = frame.f_code.co_filename
+    line = linecache.getline(filename, frame.f_lineno).strip()
+    return f"{os.path.relpath(filename)}:{frame.f_lineno}: {line}"
+
+
+def assume(expr: t.Any, msg: t.Text = "") -> bool:
+    """软断言，失败不中断用例"""
+    if expr:
+        # 通过的断言不调用pytest.assume，其中的inspect.stack()每次要数十毫秒
+        return True
+    if not msg:
+        msg = _caller_context()
+    recorder = _recorder.get()
+    if recorder is None:
+        return pytest.assume(expr, msg)
+    recorder.failures.append(msg)
+    return False
+
+
+def attach(body: t.Any, name: t.Optional[t.Text] = None, attachment_type=None, extension=None) -> None:
+    """添加Allure附件，超过大小上限的内容会被截断"""
+    kwargs = dict(body=attachment_writer.clip(body), name=name, attachment_type=attachment_type, extension=extension)
+    recorder = _recorder.get()
+    if recorder is None:
+        with timing.phase("allure"):
+            attachment_writer.attach(**kwargs)
+    else:
+        recorder.add(("attach", kwargs))
+
+
+def inline_body(text: t.Text, name: t.Text, attachment_type=None) -> t.Text:
+    """返回内联到用例描述中的内容
+    超过内联上限时完整内容另存为附件，描述中只保留预览。
+    """
+    if attachment_writer.inline_limit <= 0 or len(text) <= attachment_writer.inline_limit:
+        return text
+    attach(text, name=name, attachment_type=attachment_type)
+    return attachment_writer.clip(text, attachment_writer.inline_limit) + f"\n（完整内容见附件：{name}）"
+
+
+@contextmanager
+def step(title: t.Text):
+    """Allure步骤"""
+    recorder = _recorder.get()
+    if recorder is None:
+        with allure.step(title):
+            yield
+    else:
+        with recorder.step(title):
+            yield
+
+
+def description_html(html: t.Text) -> None:
+    """更新Allure用例描述"""
+    recorder = _recorder.get()
+    if recorder is None:
+        with timing.phase("allure"):
+            allure.dynamic.description_html(html)
+    else:
+        recorder.add(("description_html", html))
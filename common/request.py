@@ -2,14 +2,22 @@
 requests二次封装
 该模块对requests库进行了二次封装，提供了更方便的请求发送和处理功能。
 """
+import threading
 import typing as t
 import allure
 import urllib3
 from requests import Session, Response
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 from common.cache import cache
-from common.json import json, loads, dumps
-from common.regular import sub_var, findalls
-from utils.logger import logger
+from common.exceptions import RequestException
+from common import report, timing
+from common.json import json
+from common.regular import resolve_var
+from common.response import ParsedResponse
+from common.template import Template, compile_template
+from utils.logger import lazy, logger
 from typing import Tuple
 
 # 禁用urllib3的警告信息
@@ -25,8 +33,9 @@ class HttpRequest(Session):
         # 获取异常类型，默认为Exception
         self.exception = kwargs.get("exception", Exception)
 
-    def send_request(self, **kwargs: t.Dict[t.Text, t.Any]) -> Tuple[Response, t.Dict]:
+    def send_request(self, template: t.Optional[Template] = None, **kwargs: t.Dict[t.Text, t.Any]) -> Tuple[ParsedResponse, t.Dict]:
         """发送请求
+        :param template: 收集阶段编译好的用例模板，未提供时按kwargs即时编译
         :param method: 发送方法
         :param route: 发送路径
         optional 可选参数
@@ -47,68 +56,83 @@ class HttpRequest(Session):
         :param verify: （可选）一个布尔值，在这种情况下，它控制是否验证服务器的TLS证书或字符串，在这种情况下，它必须是路径到一个CA包使用。默认为“True”。
         :type bool
         :param cert: 如果是字符串，则为ssl客户端证书文件（.pem）的路径
-        :return: request响应
+        :return: 解析后的响应，校验、提取和报告共用
         """
         try:
-            # 获取请求方法，默认为GET并转换为大写
-            method = kwargs.get('method', 'GET').upper()
-            # 拼接请求URL
-            url = cache.get('baseurl') + kwargs.get('route')
-            # 记录请求URL
-            logger.info("Request Url: {}".format(url))
-            # 记录请求方法
-            logger.info("Request Method: {}".format(method))
-            # 将请求参数转换为JSON字符串
-            kwargs_str = dumps(kwargs)
-            # 查找需要替换的变量
-            if is_sub := findalls(kwargs_str):
-                # 替换变量
-                kwargs = loads(sub_var(is_sub, kwargs_str))
-            # logger.info(f"变量替换后 route: {kwargs.get('route')}")
-            filtered_kwargs = {
-                "method": kwargs.get("method"),
-                "route": kwargs.get("route"),
-                "RequestData": kwargs.get("RequestData")  # 实际发送的参数（headers/json/params等）
-            }
-            logger.info("实际请求数据: {}".format(filtered_kwargs))
-            # 合并请求数据
-            request_data = HttpRequest.mergedict(kwargs.get('RequestData'),
-                                                 headers=cache.get('headers'),
-                                                 timeout=cache.get('timeout'))
+            method, url, request_data, kwargs = self.build_request(template, **kwargs)
             # 发送请求
-            response = self.dispatch(method, url, **request_data)
-            # 生成请求和响应的描述信息
-            request_params = request_data.get('json') or request_data.get('params') or request_data.get('data') or {}
-            description_html = f"""
-                    <font color=red>请求方法: </font>{method}<br/>
-                    <font color=red>请求地址: </font>{url}<br/>
-                    <font color=red>请求头: </font>{str(request_data.get('headers', ''))}<br/>
-                    <font color=red>请求参数:</font><br/>
-                    <pre>{json.dumps(request_params, ensure_ascii=False, indent=2)}</pre><br/>
-                    <font color=red>响应状态码: </font>{str(response.status_code)}<br/>
-                    <font color=red>响应时间: </font>{str(response.elapsed.total_seconds())}<br/>
-                    """
-            try:
-                # 解析响应为JSON并处理中文编码
-                response_json = response.json()
-                response_str = json.dumps(response_json, ensure_ascii=False, indent=2)
-            except:
-                # 非JSON响应直接使用文本
-                response_str = response.text
-
-            description_html += f"""
-                    <font color=red>响应内容:</font><br/>
-                    <pre>{response_str}</pre><br/>
-                    """
-            allure.dynamic.description_html(description_html)  # 更新Allure报告描述
-            # 记录请求结果
-            logger.info("请求结果: {}{}".format(response, response.text))
+            with timing.http_phase() as http:
+                raw = self.dispatch(method, url, **request_data)
+                http.ttfb = raw.elapsed.total_seconds()
+            response = ParsedResponse.from_requests(raw)
+            self.describe(method, url, request_data, response)
             return response, kwargs
         except self.exception as e:
             # 记录异常信息
             logger.exception(format(e))
             raise e
 
+    def build_request(self, template: t.Optional[Template] = None, store: t.Optional[t.Mapping] = None,
+                      **kwargs: t.Dict[t.Text, t.Any]) -> Tuple[t.Text, t.Text, t.Dict, t.Dict]:
+        """准备请求
+        渲染模板并合并全局请求头/超时，返回(请求方法, 请求地址, 请求参数, 渲染后的用例数据)。
+        :param store: 变量来源，默认为全局变量池（压测时每个虚拟用户使用自己的变量上下文）
+        """
+        if store is None:
+            store = cache
+        # 渲染模板，替换变量
+        if template is None:
+            template = compile_template(kwargs)
+        with timing.phase("render"):
+            kwargs = template.render(lambda key: resolve_var(key, store))
+        # 获取请求方法，默认为GET并转换为大写
+        method = kwargs.get('method', 'GET').upper()
+        # 拼接请求URL
+        url = store.get('baseurl') + kwargs.get('route')
+        # 记录请求URL
+        logger.info("Request Url: %s", url)
+        # 记录请求方法
+        logger.info("Request Method: %s", method)
+        # logger.info(f"变量替换后 route: {kwargs.get('route')}")
+        filtered_kwargs = {
+            "method": kwargs.get("method"),
+            "route": kwargs.get("route"),
+            "RequestData": kwargs.get("RequestData")  # 实际发送的参数（headers/json/params等）
+        }
+        logger.info("实际请求数据: %s", filtered_kwargs)
+        # 合并请求数据
+        request_data = HttpRequest.mergedict(kwargs.get('RequestData'),
+                                             headers=store.get('headers'),
+                                             timeout=store.get('timeout'))
+        return method, url, request_data, kwargs
+
+    @staticmethod
+    def describe(method: t.Text, url: t.Text, request_data: t.Dict, response: ParsedResponse) -> None:
+        """生成请求和响应的描述信息，写入Allure报告并记录日志
+        请求参数和响应内容超过内联上限时另存为附件，大响应使用紧凑JSON，避免重复格式化。
+        """
+        request_params = request_data.get('json') or request_data.get('params') or request_data.get('data') or {}
+        request_str = report.inline_body(json.dumps(request_params, ensure_ascii=False, indent=2),
+                                         "请求参数", allure.attachment_type.JSON)
+        large = 0 < report.attachment_writer.inline_limit < len(response.content)
+        response_str = report.inline_body(response.json_text if large else response.pretty, "响应内容",
+                                          allure.attachment_type.JSON if response.is_json else allure.attachment_type.TEXT)
+        description_html = f"""
+                <font color=red>请求方法: </font>{method}<br/>
+                <font color=red>请求地址: </font>{url}<br/>
+                <font color=red>请求头: </font>{str(request_data.get('headers', ''))}<br/>
+                <font color=red>请求参数:</font><br/>
+                <pre>{request_str}</pre><br/>
+                <font color=red>响应状态码: </font>{str(response.status_code)}<br/>
+                <font color=red>响应时间: </font>{str(response.elapsed.total_seconds())}<br/>
+                <font color=red>响应内容:</font><br/>
+                <pre>{response_str}</pre><br/>
+                """
+        report.description_html(description_html)  # 更新Allure报告描述
+        # 记录请求结果
+        logger.info("请求结果: %s%s", response, lazy(lambda: report.attachment_writer.clip(
+            response.text, report.attachment_writer.inline_limit)))
+
     def dispatch(self, method: t.Text, *args: t.Union[t.List, t.Tuple], **kwargs: t.Dict) -> Response:
         """请求分发
         根据请求方法调用相应的requests方法。
@@ -132,4 +156,111 @@ class HttpRequest(Session):
                     args[k] = {}
                 kwargs[k] = {**args[k], **kwargs.pop(k)}
         args.update(kwargs)
-        return args
\ No newline at end of file
+        return args
+
+
+class _TimedConnectMixin:
+    """建立连接（含TLS握手）的耗时记入当前用例的http.connect阶段"""
+    def connect(self):
+        with timing.phase("http.connect"):
+            super().connect()
+
+
+class TimedHTTPConnection(_TimedConnectMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """记录建连耗时的连接池适配器"""
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": TimedHTTPConnectionPool,
+                                                   "https": TimedHTTPSConnectionPool}
+
+
+class HttpSessionPool:
+    """HTTP会话池
+    所有用例共享同一个连接池适配器，按host复用TCP/TLS连接（keep-alive）。
+    会话隔离级别：
+        case: 每条用例一个会话，执行完即丢弃（默认），与每条用例新建requests.Session时的Cookie行为一致
+        file: 每个YAML文件一个会话，Cookie/请求头仅在文件内共享
+        session: 全局共享一个会话，Cookie在所有用例之间传递
+    隔离的会话只拥有独立的Cookie和请求头，底层连接仍然来自共享连接池。
+    """
+    SCOPES = ("session", "file", "case")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions: t.Dict[t.Tuple[t.Text, t.Text], HttpRequest] = {}
+        self.adapter = None
+        self.configure()
+
+    def configure(self, pool_connections: int = 10, pool_maxsize: int = 10,
+                  keep_alive: bool = True, max_retries: int = 0) -> None:
+        """配置连接池
+        :param pool_connections: 缓存的host连接池数量
+        :param pool_maxsize: 每个host保留的最大连接数
+        :param keep_alive: 是否保持长连接，关闭时每个请求都会发送Connection: close
+        :param max_retries: 连接失败时的重试次数
+        """
+        self.close()
+        self.keep_alive = keep_alive
+        self.adapter = TimedHTTPAdapter(pool_connections=pool_connections,
+                                        pool_maxsize=pool_maxsize,
+                                        max_retries=max_retries)
+
+    def _new_session(self) -> HttpRequest:
+        """创建挂载共享适配器的会话"""
+        session = HttpRequest(exception=(RequestException, Exception))
+        session.mount("http://", self.adapter)
+        session.mount("https://", self.adapter)
+        if not self.keep_alive:
+            session.headers["Connection"] = "close"
+        return session
+
+    def get(self, scope: t.Text = "case", key: t.Text = "") -> HttpRequest:
+        """获取会话
+        :param scope: 隔离级别 session/file/case
+        :param key: file级别传文件路径，case级别传用例id
+        """
+        if scope not in self.SCOPES:
+            raise ValueError(f"无效的会话隔离级别：{scope}，可选值：{list(self.SCOPES)}")
+        if scope == "case":
+            return self._new_session()
+        name = (scope, key if scope == "file" else "")
+        with self._lock:
+            if name not in self._sessions:
+                self._sessions[name] = self._new_session()
+            return self._sessions[name]
+
+    def release(self, session: HttpRequest) -> None:
+        """归还会话
+        只清理会话自身的Cookie，不关闭共享适配器（Session.close会关闭连接池）。
+        """
+        with self._lock:
+            shared = session in self._sessions.values()
+        if not shared:
+            session.cookies.clear()
+
+    def close(self) -> None:
+        """关闭连接池"""
+        with self._lock:
+            self._sessions.clear()
+            if self.adapter:
+                self.adapter.close()
+
+
+# 创建全局HTTP会话池实例
+http_pool = HttpSessionPool()
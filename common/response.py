@@ -0,0 +1,98 @@
+"""
+响应解析
+每个请求只创建一个ParsedResponse，响应体按需解码，并缓存文本、JSON和序列化后的形式，
+供校验(check_results)、提取(get_result)和Allure报告共用，避免同一响应被反复解析。
+"""
+import typing as t
+from datetime import timedelta
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+from common.json import json, loads
+
+# 未计算的缓存标记
+_UNSET = object()
+
+
+class ParsedResponse:
+    """解析后的响应
+    提供check_results/get_result所需的requests.Response接口（status_code/headers/cookies/text/json()/elapsed），
+    文本和JSON只在第一次访问时计算。
+    """
+    def __init__(self, status_code: int, headers: t.Mapping, cookies: t.Mapping, content: bytes,
+                 elapsed: timedelta, url: t.Text = "", reason: t.Text = "",
+                 encoding: t.Optional[t.Text] = None, response: t.Optional[Response] = None):
+        self.status_code = status_code
+        self.headers = headers if isinstance(headers, CaseInsensitiveDict) else CaseInsensitiveDict(headers)
+        self.cookies = cookies
+        self.content = content
+        self.elapsed = elapsed
+        self.url = url
+        self.reason = reason
+        self.encoding = encoding
+        # 原始requests响应，文本解码和JSON编码探测沿用requests的实现
+        self.response = response
+        self._text = _UNSET
+        self._json = _UNSET
+        self._json_error: t.Optional[Exception] = None
+        self._json_text = _UNSET
+        self._pretty = _UNSET
+
+    @classmethod
+    def from_requests(cls, response: Response) -> "ParsedResponse":
+        """由requests响应创建"""
+        return cls(response.status_code, response.headers, response.cookies, response.content,
+                   response.elapsed, url=response.url, reason=response.reason,
+                   encoding=response.encoding, response=response)
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> t.Text:
+        """响应文本"""
+        if self._text is _UNSET:
+            if self.response is not None:
+                self._text = self.response.text
+            else:
+                self._text = self.content.decode(self.encoding or "utf-8", errors="replace")
+        return self._text
+
+    def json(self) -> t.Any:
+        """响应JSON，解析失败时每次抛出同一个异常"""
+        if self._json is _UNSET and self._json_error is None:
+            try:
+                if self.response is not None:
+                    self._json = self.response.json()
+                else:
+                    self._json = loads(self.text)
+            except ValueError as e:
+                self._json_error = e
+        if self._json_error is not None:
+            raise self._json_error
+        return self._json
+
+    @property
+    def is_json(self) -> bool:
+        try:
+            self.json()
+            return True
+        except ValueError:
+            return False
+
+    @property
+    def json_text(self) -> t.Text:
+        """紧凑的JSON文本（中文不转义），非JSON响应为原始文本"""
+        if self._json_text is _UNSET:
+            self._json_text = json.dumps(self.json(), ensure_ascii=False) if self.is_json else self.text
+        return self._json_text
+
+    @property
+    def pretty(self) -> t.Text:
+        """格式化的JSON文本，用于报告展示，非JSON响应为原始文本"""
+        if self._pretty is _UNSET:
+            self._pretty = json.dumps(self.json(), ensure_ascii=False, indent=2) if self.is_json else self.text
+        return self._pretty
+
+    def __repr__(self):
+        return f"<Response [{self.status_code}]>"
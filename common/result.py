@@ -2,115 +2,83 @@
 response响应处理
 该模块用于处理请求的响应，包括提取结果和校验结果。
 """
-import re
 import typing as t
 
-import jsonpath
-import pytest
-import allure
-from requests import Response
-from common.cache import cache
-from common.regular import re, get_var
+from common.cache import SESSION, cache
+from common.report import assume, attach, step
+from common.response import ParsedResponse
+from common.regular import get_var
+from common.json_path import compile_path
+from common.validator import compile_validate
 from utils.logger import logger
 
-def get_result(r: Response, extract: t.List) -> None:
+def extract_rules(extract: t.List) -> t.List[t.Tuple[t.Text, t.Optional[t.Text]]]:
+    """Extract配置 -> [(变量名, JSONPath)]
+    字符串项按变量名本身作为点分路径提取（如data.token），字典项为 变量名: JSONPath（如 ids: $.data.items[*].id）
+    """
+    rules = []
+    for item in extract:
+        if isinstance(item, dict):
+            rules.extend((name, str(path)) for name, path in item.items())
+        else:
+            rules.append((item, None))
+    return rules
+
+def extract_value(r: ParsedResponse, resp_json: t.Any, key: t.Text, path: t.Optional[t.Text] = None) -> t.Any:
+    """提取单个变量：JSON路径 -> headers -> cookies -> 正则
+    :param path: JSONPath，未指定时按变量名作为点分路径（支持顶级data、嵌套data.token和列表下标data.list.0.id）
+    """
+    value = None
+    if resp_json is not None:
+        # 路径按字符串缓存编译结果，每次提取只遍历
+        value = compile_path(path or key).value(resp_json)
+    if path is not None:
+        return value
+
+    # 2. 如果JSON中未找到，headers -> cookies -> 正则
+    if value is None:
+        if key in r.headers:
+            value = r.headers[key]
+        elif key in r.cookies:
+            value = r.cookies.get(key)
+        else:
+            value = get_var(key, r.text)  # 原正则提取
+    return value
+
+def get_result(r: ParsedResponse, extract: t.List) -> None:
     """获取值：优先从JSON响应提取嵌套字段，再 fallback 到原有逻辑"""
     # 尝试解析响应为JSON（用于提取嵌套字段）
     resp_json = None
     try:
-        resp_json = r.json()  # 解析完整响应
-        logger.debug(f"响应JSON: {resp_json}")  # 确认data位置
+        resp_json = r.json()  # 响应只解析一次，与校验共用
+        logger.debug("响应JSON: %s", resp_json)  # 确认data位置
     except Exception as e:
-        logger.debug(f"响应解析JSON失败: {e}")
+        logger.debug("响应解析JSON失败: %s", e)
         return
 
-    for key in extract:
-        value = None
-        if resp_json is not None:
-            # 分割变量路径（支持顶级data和嵌套data.token）
-            keys = key.split('.')
-            temp = resp_json
-            for k in keys:
-                if isinstance(temp, dict) and k in temp:
-                    temp = temp[k]  # 逐级获取值（如key="data"直接取resp_json["data"]）
-                else:
-                    temp = None
-                    break
-            value = temp
-
-        # 2. 如果JSON中未找到，headers -> cookies -> 正则
-        if value is None:
-            if key in r.headers:
-                value = r.headers[key]
-            elif key in r.cookies:
-                value = r.cookies.get(key)
-            else:
-                value = get_var(key, r.text)  # 原正则提取
+    rules = extract_rules(extract)
+    extracted = {}
+    for key, path in rules:
+        value = extract_value(r, resp_json, key, path)
+        extracted[key] = value
 
         # 记录提取结果并存储到缓存
-        logger.info(f"提取变量 {key} 的值：{value}")
+        logger.info("提取变量 %s 的值：%s", key, value)
         if value is not None:  # 确保提取到值再存入缓存
-            cache.set(key, value)
-            pytest.assume(key in cache, f"变量 {key} 未成功存入缓存")
+            # 提取的变量写入会话级变量池，后续用例可以引用
+            cache.set(key, value, scope=SESSION)
+            assume(key in cache, f"变量 {key} 未成功存入缓存")
         else:
             logger.warning(f"未提取到变量 {key} 的值")
 
-    # 在Allure报告中添加提取步骤
-    with allure.step("提取返回结果中的值"):
-        for key in extract:
-            allure.attach(name="提取%s" % key, body=str(cache.get(key)))
+    # 在Allure报告中添加提取步骤（展示本次提取的值，未提取到的变量不再到变量池和共享存储中查找）
+    with step("提取返回结果中的值"):
+        for key, value in extracted.items():
+            attach(name="提取%s" % key, body=str(value))
 
-def check_results(r: Response, validate: t.Dict) -> None:
+def check_results(r: ParsedResponse, validate: t.Dict) -> None:
     """检查运行结果
-    校验响应的状态码、预期值和正则表达式。
+    按已渲染的Validate块临时编译校验器并执行；用例执行时使用收集阶段编译好的校验器（见common.validator）。
     """
-    # 获取预期状态码
-    expectcode = validate.get('expectcode')
-    # 获取预期结果
-    resultcheck = validate.get('resultcheck')
-    # 获取正则表达式
-    regularcheck = validate.get('regularcheck')
-    # jsonpath断言
-    jsonpath_check = validate.get('jsonpath_check')
-    # 如果有预期状态码，则进行校验
-    if expectcode:
-        with allure.step("校验返回响应码"):
-            allure.attach(name='预期响应码', body=str(expectcode))
-            allure.attach(name='实际响应码', body=str(r.status_code))
-        pytest.assume(int(expectcode) == r.status_code)
-    # 如果有预期结果，则进行校验
-    if resultcheck:
-        with allure.step("校验响应预期值"):
-            allure.attach(name='预期值', body=str(resultcheck))
-            try:
-                # 尝试解析为 JSON 并解码
-                resp_json = r.json()
-                import json
-                actual_body = json.dumps(resp_json, ensure_ascii=False)
-            except:
-                actual_body = r.text
-            allure.attach(name='实际值', body=actual_body)
-        pytest.assume(resultcheck in actual_body)
-    # 如果有正则表达式，则进行校验
-    if regularcheck:
-        with allure.step("正则校验返回结果"):
-            allure.attach(name='预期正则', body=regularcheck)
-            allure.attach(name='响应值', body=str(
-                re.findall(regularcheck, r.text)))
-        pytest.assume(re.findall(regularcheck, r.text))
-    if jsonpath_check:
-        try:
-            resp_json = r.json()  # 解析响应为JSON
-        except:
-            pytest.assume(False, "响应不是JSON格式，无法进行JSONPath断言")
-            return
-
-        with allure.step("JSONPath校验"):
-            for path, expected in jsonpath_check.items():
-                # 执行JSONPath查询
-                actual = jsonpath.jsonpath(resp_json, path)
-                allure.attach(name=f"JSONPath: {path}",
-                              body=f"预期: {expected}, 实际: {actual}")
-                # 断言结果存在且匹配
-                pytest.assume(actual is not False, f"JSONPath {path} 未找到匹配结果")
-                pytest.assume(actual[0] == expected, f"JSONPath {path} 匹配失败")
\ No newline at end of file
+    if validator := compile_validate(validate):
+        validator.check(r)
@@ -0,0 +1,239 @@
+"""
+用例依赖调度
+用例之间通过会话级变量池传递数据（上一条用例Extract，下一条用例${var}引用），
+该模块根据每条用例读写的变量构建依赖图（DAG），在线程池中并行执行互不依赖的用例链，
+并保证生产者先于消费者执行；执行结束后给出决定总耗时下限的关键路径。
+变量之外的共享状态作为资源参与依赖图（资源名以@开头，不会与变量名冲突）：
+    共享Cookie会话（session: file/session）中的用例都可能修改Cookie，按收集顺序串行
+    执行setup_db/teardown_db的用例：写操作按收集顺序串行，只有查询的用例之间可以并行
+    执行setup_redis/teardown_redis的用例按收集顺序串行
+只依赖其他用例在服务端产生的数据、既没有变量引用也不属于以上资源的用例，无法从用例中推断依赖，并行时不保证顺序。
+"""
+import threading
+import time
+import typing as t
+from concurrent.futures import Future, ThreadPoolExecutor
+from common.db_extract import is_query
+from common.template import compile_template
+from utils.logger import logger
+
+
+def _var_scopes(key: t.Text) -> t.Set[t.Text]:
+    """变量引用可能命中的缓存键
+    ${data.token} 可能来自缓存键 data.token，也可能来自 data 的嵌套字段。
+    """
+    parts = key.split('.')
+    return {'.'.join(parts[:i]) for i in range(1, len(parts) + 1)}
+
+
+def case_io(spec: t.Dict, param: t.Optional[t.Dict] = None,
+            keys: t.Optional[t.Iterable[t.Text]] = None) -> t.Tuple[t.Set[t.Text], t.Set[t.Text]]:
+    """计算用例读写的变量
+    :param spec: 用例规格
+    :param param: 参数组（只对当前用例可见，引用参数组的变量不依赖其他用例）
+    :param keys: 已编译模板中的变量，未提供时扫描spec
+    :return: (读取的变量, 写入的变量)
+    """
+    if keys is None:
+        keys = compile_template({k: v for k, v in spec.items() if k not in ('parameters', 'parameters_from')}).keys
+    used = set(keys) | compile_template(param).keys
+    local = set(param or ())
+    reads = set()
+    for key in used:
+        scopes = _var_scopes(key)
+        if not key.startswith('faker.') and not scopes & local:
+            reads |= scopes
+
+    # 提取的变量写入会话级变量池
+    writes = set()
+    for item in spec.get('Extract') or ():
+        writes.update([item] if isinstance(item, str) else item)
+    for item in spec.get('extract_db') or ():
+        writes.update(item)
+    for item in (spec.get('redis') or {}).get('extract_redis') or ():
+        writes.update(item)
+    return reads, writes
+
+
+def case_resources(spec: t.Dict, param: t.Optional[t.Dict] = None,
+                   session: t.Optional[t.Text] = None) -> t.Tuple[t.Set[t.Text], t.Set[t.Text]]:
+    """计算用例读写的共享资源（Cookie会话、数据库、Redis），与变量一起构建依赖图
+    :param spec: 用例规格
+    :param param: 参数组（参数组中的setup_db/teardown_db优先于用例中的）
+    :param session: 共享Cookie会话的标识，每条用例独立会话时为None
+    :return: (读取的资源, 写入的资源)
+    """
+    reads, writes = set(), set()
+    if session is not None:
+        writes.add(f"@cookies:{session}")
+    for operation in ("setup_db", "teardown_db"):
+        sql = param.get(operation) if param else spec.get(operation)
+        for statement in ([sql] if isinstance(sql, str) else sql or ()):
+            if isinstance(statement, str) and is_query(statement):
+                reads.add("@db")
+            else:
+                writes.add("@db")
+    redis_spec = spec.get('redis') or {}
+    if redis_spec.get('setup_redis') or redis_spec.get('teardown_redis'):
+        writes.add("@redis")
+    return reads - writes, writes
+
+
+class CaseNode:
+    """依赖图中的一条用例"""
+    __slots__ = ("index", "item", "reads", "writes", "deps", "dependents", "duration")
+
+    def __init__(self, index: int, item: t.Any, reads: t.Set[t.Text], writes: t.Set[t.Text]):
+        self.index = index
+        self.item = item
+        self.reads = reads
+        self.writes = writes
+        # 必须先执行的用例
+        self.deps: t.Set[int] = set()
+        # 依赖本用例的用例
+        self.dependents: t.Set[int] = set()
+        # 实际执行耗时（秒），未执行时为None
+        self.duration: t.Optional[float] = None
+
+
+class DependencyGraph:
+    """用例依赖图
+    按收集顺序处理，保证与串行执行的结果一致：
+        读后写：读取变量的用例依赖最近一次写入该变量的用例
+        写后写/写后读：写入变量的用例依赖之前的写入者和读取者，避免覆盖尚未被读取的值
+    """
+    def __init__(self, cases: t.Iterable[t.Tuple[t.Any, t.Set[t.Text], t.Set[t.Text]]]):
+        self.nodes: t.List[CaseNode] = []
+        last_writer: t.Dict[t.Text, int] = {}
+        readers: t.Dict[t.Text, t.List[int]] = {}
+        for index, (item, reads, writes) in enumerate(cases):
+            node = CaseNode(index, item, reads, writes)
+            for var in reads:
+                if var in last_writer:
+                    node.deps.add(last_writer[var])
+            for var in writes:
+                if var in last_writer:
+                    node.deps.add(last_writer[var])
+                node.deps.update(readers.get(var, ()))
+            node.deps.discard(index)
+            for var in reads:
+                readers.setdefault(var, []).append(index)
+            for var in writes:
+                last_writer[var] = index
+                readers[var] = []
+            for dep in node.deps:
+                self.nodes[dep].dependents.add(index)
+            self.nodes.append(node)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def roots(self) -> t.List[CaseNode]:
+        """没有依赖的用例"""
+        return [node for node in self.nodes if not node.deps]
+
+    def critical_path(self) -> t.Tuple[t.List[CaseNode], float]:
+        """关键路径
+        节点按收集顺序编号，依赖总是指向更早的节点，因此顺序遍历即为拓扑序。
+        已执行的用例按实际耗时计算，未执行的按1计算（即最长依赖链的用例数）。
+        """
+        if not self.nodes:
+            return [], 0.0
+        cost: t.List[float] = []
+        prev: t.List[t.Optional[int]] = []
+        for node in self.nodes:
+            best = max(node.deps, key=lambda i: cost[i], default=None)
+            weight = node.duration if node.duration is not None else 1.0
+            cost.append(weight + (cost[best] if best is not None else 0.0))
+            prev.append(best)
+        index: t.Optional[int] = max(range(len(cost)), key=cost.__getitem__)
+        total = cost[index]
+        path = []
+        while index is not None:
+            path.append(self.nodes[index])
+            index = prev[index]
+        return path[::-1], total
+
+
+class DagScheduler:
+    """依赖调度器
+    依赖全部完成的用例提交到线程池执行；上游用例失败不会阻止下游执行（与串行执行一致）。
+    """
+    def __init__(self, graph: DependencyGraph, workers: int = 4):
+        self.graph = graph
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._pending: t.List[int] = []
+        self.futures: t.List[Future] = []
+        self._executor: t.Optional[ThreadPoolExecutor] = None
+        # 从开始调度到全部完成的耗时
+        self.elapsed: t.Optional[float] = None
+
+    def start(self, run: t.Callable[[t.Any], t.Any]) -> t.List[Future]:
+        """开始调度，返回与图中节点一一对应的Future
+        :param run: 执行单条用例的函数，参数为用例对象，返回值作为Future结果
+        """
+        self._run = run
+        self._pending = [len(node.deps) for node in self.graph.nodes]
+        self.futures = [Future() for _ in self.graph.nodes]
+        self._remaining = len(self.graph.nodes)
+        self._started = time.perf_counter()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="case")
+        logger.info(f"依赖调度开始：{len(self.graph)} 条用例，{len(self.graph.roots())} 条无依赖，{self.workers} 个工作线程")
+        if not self.graph.nodes:
+            self._finish()
+        for node in self.graph.roots():
+            self._submit(node)
+        return self.futures
+
+    def _submit(self, node: CaseNode) -> None:
+        self._executor.submit(self._execute, node)
+
+    def _execute(self, node: CaseNode) -> None:
+        start = time.perf_counter()
+        result, error = None, None
+        try:
+            result = self._run(node.item)
+        except BaseException as e:
+            error = e
+        node.duration = time.perf_counter() - start
+        ready = []
+        with self._lock:
+            for index in node.dependents:
+                self._pending[index] -= 1
+                if self._pending[index] == 0:
+                    ready.append(self.graph.nodes[index])
+            self._remaining -= 1
+            finished = self._remaining == 0
+        for dependent in sorted(ready, key=lambda n: n.index):
+            self._submit(dependent)
+        if finished:
+            self._finish()
+        # 最后设置结果，等待方拿到结果时调度统计已更新
+        if error is not None:
+            self.futures[node.index].set_exception(error)
+        else:
+            self.futures[node.index].set_result(result)
+
+    def _finish(self) -> None:
+        self.elapsed = time.perf_counter() - self._started
+        self._executor.shutdown(wait=False)
+
+    def shutdown(self) -> None:
+        """停止调度，已提交的用例会执行完毕"""
+        if self._executor:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def summary(self) -> t.List[t.Text]:
+        """调度报告：关键路径决定了并行执行的总耗时下限"""
+        path, cost = self.graph.critical_path()
+        serial = sum(node.duration or 0.0 for node in self.graph.nodes)
+        lines = [
+            f"用例数: {len(self.graph)}，无依赖用例: {len(self.graph.roots())}，工作线程: {self.workers}",
+            f"串行耗时合计: {serial:.3f}s，并行实际耗时: {self.elapsed or 0.0:.3f}s",
+            f"关键路径: {len(path)} 条用例，耗时 {cost:.3f}s（并行执行的耗时下限）",
+        ]
+        for node in path:
+            duration = f"{node.duration:.3f}s" if node.duration is not None else "-"
+            lines.append(f"    {duration:>9}  {getattr(node.item, 'nodeid', node.item)}")
+        return lines
@@ -0,0 +1,182 @@
+"""
+跨进程共享变量
+多个pytest进程分片执行用例时（pytest-xdist或CI中手动分片），会话级变量通过共享存储在进程之间传递：
+写入会话级变量池的变量（Extract/extract_db/extract_redis）同时发布到共享存储，
+其他进程引用本地不存在、但会由某条用例写入的变量（如${data.token}）时，阻塞等待生产者发布后再继续；
+生产者用例失败、跳过或未提取到变量时发布放弃标记，等待的进程不再等到超时。
+
+共享存储地址：
+    sqlite:///tmp/apitest-vars.db     本机SQLite文件（多进程共享，WAL模式）
+    redis://127.0.0.1:6379/15         本机或CI中的Redis
+同一次执行的所有进程使用相同的run_id区分数据，pytest-xdist下自动使用testrunuid，手动分片时用--shared-run-id指定。
+变量值使用pickle序列化，只应使用本机或受信任的存储。
+"""
+import pickle
+import sqlite3
+import threading
+import time
+import typing as t
+import uuid
+from urllib.parse import urlparse
+from utils.logger import logger
+
+# 未发布的标记
+_UNPUBLISHED = object()
+# 生产者放弃发布的标记
+_ABANDONED = object()
+# 共享数据保留时间（秒），过期的数据在下次启动时清理
+RETENTION = 24 * 3600
+
+
+class SharedStore:
+    """共享存储基类：发布(publish)、放弃(abandon)和读取(fetch)，等待(wait)按退避间隔轮询"""
+    def __init__(self, run_id: t.Text):
+        self.run_id = run_id
+        self.stats = {"published": 0, "fetched": 0, "waits": 0, "timeouts": 0, "abandoned": 0}
+
+    def publish(self, key: t.Text, value: t.Any) -> None:
+        raise NotImplementedError
+
+    def abandon(self, key: t.Text) -> None:
+        """生产者未能发布变量，变量尚未发布时写入放弃标记；之后其他用例仍可以发布覆盖"""
+        raise NotImplementedError
+
+    def _read(self, key: t.Text) -> t.Any:
+        """读取发布的值，未发布返回_UNPUBLISHED，已放弃返回_ABANDONED"""
+        raise NotImplementedError
+
+    def fetch(self, key: t.Text, default: t.Any = None) -> t.Any:
+        """读取已发布的值，未发布或已放弃时返回default"""
+        value = self._read(key)
+        return default if value is _UNPUBLISHED or value is _ABANDONED else value
+
+    def wait(self, key: t.Text, timeout: float, default: t.Any = None) -> t.Any:
+        """等待变量发布，超时或生产者放弃时返回default"""
+        value = self._read(key)
+        if value is _UNPUBLISHED:
+            self.stats["waits"] += 1
+            logger.info(f"等待其他进程发布变量：{key}")
+            deadline = time.monotonic() + timeout
+            delay = 0.01
+            while value is _UNPUBLISHED and time.monotonic() < deadline:
+                time.sleep(delay)
+                delay = min(delay * 2, 0.2)
+                value = self._read(key)
+        if value is _ABANDONED:
+            self.stats["abandoned"] += 1
+            logger.warning(f"生产者用例失败、跳过或未提取到变量{key}，不再等待")
+            return default
+        if value is not _UNPUBLISHED:
+            self.stats["fetched"] += 1
+            return value
+        self.stats["timeouts"] += 1
+        logger.warning(f"等待变量{key}超时（{timeout}s），生产者用例可能未执行或失败")
+        return default
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteSharedStore(SharedStore):
+    """SQLite文件共享存储，每个线程使用独立的连接"""
+    def __init__(self, path: t.Text, run_id: t.Text):
+        super().__init__(run_id)
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS shared_vars (run_id TEXT, key TEXT, value BLOB, "
+                         "created REAL, PRIMARY KEY (run_id, key))")
+            conn.execute("DELETE FROM shared_vars WHERE created < ?", (time.time() - RETENTION,))
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def publish(self, key: t.Text, value: t.Any) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO shared_vars VALUES (?, ?, ?, ?)",
+                         (self.run_id, key, pickle.dumps(value), time.time()))
+        self.stats["published"] += 1
+
+    def abandon(self, key: t.Text) -> None:
+        conn = self._conn()
+        with conn:
+            # 放弃标记的value为NULL，已发布的值不覆盖
+            conn.execute("INSERT OR IGNORE INTO shared_vars VALUES (?, ?, NULL, ?)", (self.run_id, key, time.time()))
+
+    def _read(self, key: t.Text) -> t.Any:
+        row = self._conn().execute("SELECT value FROM shared_vars WHERE run_id = ? AND key = ?",
+                                   (self.run_id, key)).fetchone()
+        if row is None:
+            return _UNPUBLISHED
+        return _ABANDONED if row[0] is None else pickle.loads(row[0])
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class RedisSharedStore(SharedStore):
+    """Redis共享存储"""
+    def __init__(self, url: t.Text, run_id: t.Text):
+        super().__init__(run_id)
+        import redis  # 只有使用Redis共享存储时才需要
+        self.client = redis.Redis.from_url(url)
+        self.prefix = f"apitest:vars:{run_id}:"
+
+    def publish(self, key: t.Text, value: t.Any) -> None:
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=RETENTION)
+        self.stats["published"] += 1
+
+    def abandon(self, key: t.Text) -> None:
+        # 放弃标记为空值（pickle序列化的结果不会为空），已发布的值不覆盖
+        self.client.set(self.prefix + key, b"", ex=RETENTION, nx=True)
+
+    def _read(self, key: t.Text) -> t.Any:
+        data = self.client.get(self.prefix + key)
+        if data is None:
+            return _UNPUBLISHED
+        return _ABANDONED if data == b"" else pickle.loads(data)
+
+    def close(self) -> None:
+        self.client.close()
+
+
+def open_shared_store(url: t.Text, run_id: t.Optional[t.Text] = None) -> SharedStore:
+    """按地址创建共享存储
+    :param run_id: 本次执行的标识，未指定时生成随机值（只在当前进程内有效）
+    """
+    run_id = run_id or uuid.uuid4().hex
+    scheme = urlparse(url).scheme
+    if scheme == "sqlite":
+        return SqliteSharedStore(url[len("sqlite://"):], run_id)
+    if scheme in ("redis", "rediss", "unix"):
+        return RedisSharedStore(url, run_id)
+    raise ValueError(f"不支持的共享存储地址：{url}，可选：sqlite:///path/to/file.db、redis://host:port/db")
+
+
+if __name__ == '__main__':
+    import multiprocessing
+    import os
+    import tempfile
+
+    def consumer(path):
+        store = open_shared_store(f"sqlite://{path}", "demo")
+        print("consumer got", store.wait("data.token", timeout=5))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "vars.db")
+        producer = open_shared_store(f"sqlite://{path}", "demo")
+        process = multiprocessing.Process(target=consumer, args=(path,))
+        process.start()
+        time.sleep(0.3)
+        producer.publish("data.token", {"token": "abc"})
+        process.join()
@@ -0,0 +1,161 @@
+"""
+SQL参数绑定
+把SQL中的${key}编译为绑定参数(%s)，执行时按变量值生成(语句, 参数)，代替字符串替换和引号转义：
+    SELECT * FROM ti_user WHERE id = ${user_id}          -> id = %s                   参数 (user_id,)
+    SELECT * FROM ti_user WHERE id IN (${ids})           -> id IN (%s, %s, %s)        列表按元素展开
+    SELECT * FROM ti_user WHERE id NOT IN (${ids})       -> id NOT IN (SELECT NULL FROM DUAL WHERE 1=0)
+                                                                                      空列表为空子查询：IN不成立，NOT IN成立
+    UPDATE ti_user SET name = '${name}'                  -> name = %s                 整个字符串字面量就是变量时去掉引号
+    SELECT * FROM ti_order WHERE no LIKE 'T${date}%'     -> LIKE CONCAT('T', %s, '%') 变量嵌在字面量中时拼接
+注释（-- 、#、/* */）中的${key}原样保留，不绑定参数。
+相同的SQL模板在变量值变化时生成相同的语句文本，数据库端可以复用预处理语句。
+"""
+import re
+import typing as t
+from functools import lru_cache
+from common.json import dumps
+from common.regular import VAR_PATTERN, MISSING, resolve_var
+from utils.logger import logger
+
+# 单引号/双引号字符串字面量（支持''和反斜杠转义）
+LITERAL_PATTERN = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+# 注释：-- 后需有空白，#到行尾，/* */
+COMMENT_PATTERN = re.compile(r"--(?:\s[^\n]*)?(?=\n|$)|#[^\n]*|/\*.*?(?:\*/|$)", re.S)
+TOKEN_PATTERN = re.compile(f"{LITERAL_PATTERN.pattern}|{COMMENT_PATTERN.pattern}", re.S)
+# 变量是IN列表中的唯一元素：IN (${ids})
+IN_OPEN = re.compile(r"\bIN\s*\(\s*$", re.I)
+IN_CLOSE = re.compile(r"\s*\)")
+# 空列表的IN列表：空子查询使IN不成立、NOT IN成立（IN (NULL)会使NOT IN也不成立）
+EMPTY_IN_LIST = "SELECT NULL FROM DUAL WHERE 1=0"
+
+# 片段类型
+_TEXT = 0  # 原样保留的SQL文本
+_PARAM = 1  # 绑定参数
+_CONCAT = 2  # 嵌有变量的字符串字面量：[(是否变量, 文本或变量名), ...]
+_IN_LIST = 3  # IN列表中唯一的绑定参数
+
+
+class SqlTemplate:
+    """编译后的SQL模板"""
+    __slots__ = ("parts", "keys")
+
+    def __init__(self, sql: t.Text):
+        self.parts: t.List[t.Tuple] = []
+        self.keys: t.Set[t.Text] = set()
+        pos = 0
+        for m in TOKEN_PATTERN.finditer(sql):
+            self._compile_code(sql[pos:m.start()])
+            if m.group()[0] in "'\"":
+                self._compile_literal(m.group())
+            else:
+                # 注释原样保留
+                self.parts.append((_TEXT, m.group()))
+            pos = m.end()
+        self._compile_code(sql[pos:])
+
+    def _compile_code(self, code: t.Text) -> None:
+        pos = 0
+        for m in VAR_PATTERN.finditer(code):
+            if m.start() > pos:
+                self.parts.append((_TEXT, code[pos:m.start()]))
+            in_list = IN_OPEN.search(code, 0, m.start()) and IN_CLOSE.match(code, m.end())
+            self.parts.append((_IN_LIST if in_list else _PARAM, m.group(1)))
+            self.keys.add(m.group(1))
+            pos = m.end()
+        if pos < len(code):
+            self.parts.append((_TEXT, code[pos:]))
+
+    def _compile_literal(self, literal: t.Text) -> None:
+        quote, body = literal[0], literal[1:-1]
+        matches = list(VAR_PATTERN.finditer(body))
+        if not matches:
+            self.parts.append((_TEXT, literal))
+            return
+        self.keys.update(m.group(1) for m in matches)
+        if len(matches) == 1 and matches[0].span() == (0, len(body)):
+            self.parts.append((_PARAM, matches[0].group(1)))
+            return
+        pieces = []
+        pos = 0
+        for m in matches:
+            if m.start() > pos:
+                pieces.append((False, f"{quote}{body[pos:m.start()]}{quote}"))
+            pieces.append((True, m.group(1)))
+            pos = m.end()
+        if pos < len(body):
+            pieces.append((False, f"{quote}{body[pos:]}{quote}"))
+        self.parts.append((_CONCAT, pieces))
+
+    @staticmethod
+    def _param(key: t.Text, value: t.Any) -> t.Any:
+        """转换为数据库驱动支持的参数类型"""
+        if value is MISSING:
+            logger.warning(f"SQL变量{key}无法解析，按NULL绑定")
+            return None
+        if isinstance(value, bool):
+            return int(value)
+        if isinstance(value, (dict, list, tuple)):
+            return dumps(value, ensure_ascii=False)
+        return value
+
+    def bind(self, resolver: t.Callable[[t.Text], t.Any] = resolve_var) -> t.Tuple[t.Text, t.Tuple]:
+        """按变量值生成(语句, 参数)
+        列表/元组值展开为多个参数（用于IN (...)）；空列表在IN列表中展开为空子查询，其他位置展开为NULL。
+        """
+        sql: t.List[t.Text] = []
+        params: t.List[t.Any] = []
+        values: t.Dict[t.Text, t.Any] = {}
+
+        def value_of(key):
+            if key not in values:
+                values[key] = resolver(key)
+            return values[key]
+
+        for kind, part in self.parts:
+            if kind == _TEXT:
+                sql.append(part)
+            elif kind != _CONCAT:
+                value = value_of(part)
+                if isinstance(value, (list, tuple, set)):
+                    items = list(value)
+                    if items:
+                        sql.append(", ".join(["%s"] * len(items)))
+                    else:
+                        sql.append(EMPTY_IN_LIST if kind == _IN_LIST else "NULL")
+                    params.extend(self._param(part, v) for v in items)
+                else:
+                    sql.append("%s")
+                    params.append(self._param(part, value))
+            else:
+                args = []
+                for is_var, piece in part:
+                    if is_var:
+                        args.append("%s")
+                        value = value_of(piece)
+                        params.append("" if value in (None, MISSING) else str(value))
+                    else:
+                        args.append(piece)
+                sql.append(f"CONCAT({', '.join(args)})")
+        return "".join(sql), tuple(params)
+
+
+@lru_cache(maxsize=1024)
+def compile_sql(sql: t.Text) -> SqlTemplate:
+    """编译SQL模板，相同的SQL只编译一次"""
+    return SqlTemplate(sql)
+
+
+def bind_sql(sql: t.Text, resolver: t.Callable[[t.Text], t.Any] = resolve_var) -> t.Tuple[t.Text, t.Tuple]:
+    """把SQL中的${key}替换为绑定参数，返回(语句, 参数)"""
+    return compile_sql(sql).bind(resolver)
+
+
+if __name__ == '__main__':
+    store = {"user_id": 7, "ids": [1, 2, 3], "name": "O'Brien", "date": "2024", "empty": []}
+    resolver = lambda key: resolve_var(key, store)
+    for s in ["SELECT * FROM ti_user WHERE id = ${user_id}",
+              "SELECT * FROM ti_user WHERE id IN (${ids}) AND name = '${name}'",
+              "SELECT * FROM ti_order WHERE no LIKE 'T${date}%' AND id NOT IN (${empty})",
+              "SELECT * FROM ti_user -- WHERE id = ${user_id}",
+              "UPDATE ti_user SET note = 'it''s ${name}' WHERE id = ${user_id}"]:
+        print(bind_sql(s, resolver))
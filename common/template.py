@@ -0,0 +1,160 @@
+"""
+用例模板编译
+该模块在收集阶段把用例规格编译为标记了${key}占位符的模板结构，
+执行时直接遍历模板渲染出请求字典，无需 dumps -> 正则替换 -> loads 的往返。
+渲染结果与 sub_var 的替换结果保持一致，但保留变量的原生类型。
+"""
+import typing as t
+from common.regular import VAR_PATTERN, MISSING, resolve_var
+
+# 节点类型
+_CONST = 0  # 不含变量的标量
+_DICT = 1  # 字典
+_LIST = 2  # 列表
+_VAR = 3  # 整个字符串就是一个变量，如 "${n}"
+_TEXT = 4  # 变量嵌在文本中，如 "Bearer ${token}"
+
+# 变量值中再次出现${key}时的最大递归渲染深度
+MAX_DEPTH = 10
+
+
+def _compile_text(string: t.Text) -> t.Tuple:
+    """编译字符串节点
+    文本片段保存为str，变量保存为(key, 左侧单引号, 右侧单引号)。
+    与 sub_var 一致：非字符串的值会去掉紧贴变量的引号。
+    """
+    matches = list(VAR_PATTERN.finditer(string))
+    if not matches:
+        return _CONST, string
+    if len(matches) == 1 and matches[0].span() == (0, len(string)):
+        return _VAR, matches[0].group(1)
+    parts = []
+    pos = 0
+    for m in matches:
+        start, end = m.span()
+        left_quote = start > pos and string[start - 1] == "'"
+        if left_quote:
+            start -= 1
+        if start > pos:
+            parts.append(string[pos:start])
+        right_quote = end < len(string) and string[end] == "'"
+        if right_quote:
+            end += 1
+        parts.append((m.group(1), left_quote, right_quote))
+        pos = end
+    if pos < len(string):
+        parts.append(string[pos:])
+    return _TEXT, parts
+
+
+def _to_text(value: t.Any) -> t.Text:
+    """变量嵌入文本时的字符串形式（None与JSON保持一致为null）"""
+    if value is None:
+        return "null"
+    return str(value)
+
+
+# JSON可以直接表示的标量类型
+_JSON_SCALARS = (str, int, float, bool, type(None))
+
+
+def _to_native(value: t.Any) -> t.Any:
+    """整个字符串就是一个变量时的取值
+    保留JSON可以表示的原生类型，容器逐项转换（并复制，不会修改变量池中的值），
+    日期、Decimal等其他类型与嵌入文本时一致转换为字符串，请求体才能按JSON发送。
+    """
+    if isinstance(value, _JSON_SCALARS):
+        return value
+    if isinstance(value, dict):
+        return {k if isinstance(k, str) else _to_text(k): _to_native(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_native(v) for v in value]
+    return _to_text(value)
+
+
+class Template:
+    """用例模板
+    收集阶段编译一次，每次执行时调用render渲染出新的请求字典。
+    """
+    __slots__ = ("_node", "keys")
+
+    def __init__(self, source: t.Any):
+        # 模板中出现的全部变量名
+        self.keys: t.Set[t.Text] = set()
+        self._node = self._compile(source)
+
+    def _compile(self, obj: t.Any) -> t.Tuple:
+        if isinstance(obj, dict):
+            return _DICT, [(self._compile(k), self._compile(v)) for k, v in obj.items()]
+        if isinstance(obj, (list, tuple)):
+            return _LIST, [self._compile(v) for v in obj]
+        if isinstance(obj, str) and "${" in obj:
+            node = _compile_text(obj)
+            if node[0] == _VAR:
+                self.keys.add(node[1])
+            elif node[0] == _TEXT:
+                self.keys.update(p[0] for p in node[1] if isinstance(p, tuple))
+            return node
+        return _CONST, obj
+
+    def render(self, resolver: t.Callable[[t.Text], t.Any] = resolve_var) -> t.Any:
+        """渲染模板
+        同一次渲染中相同变量只解析一次（faker变量在一次请求内取值一致）。
+        容器总是重新创建，调用方可以放心修改返回值。
+        """
+        values: t.Dict[t.Text, t.Any] = {}
+
+        def lookup(key: t.Text, depth: int) -> t.Any:
+            if key not in values:
+                value = resolver(key)
+                # 变量的值中仍包含${key}，继续渲染
+                if isinstance(value, str) and "${" in value and depth < MAX_DEPTH:
+                    value = walk(_compile_text(value), depth + 1)
+                values[key] = value
+            return values[key]
+
+        def walk(node: t.Tuple, depth: int) -> t.Any:
+            kind, data = node
+            if kind == _CONST:
+                return data
+            if kind == _DICT:
+                return {walk_key(k, depth): walk(v, depth) for k, v in data}
+            if kind == _LIST:
+                return [walk(v, depth) for v in data]
+            if kind == _VAR:
+                value = lookup(data, depth)
+                return "${%s}" % data if value is MISSING else _to_native(value)
+            chunks = []
+            for part in data:
+                if isinstance(part, str):
+                    chunks.append(part)
+                    continue
+                key, left_quote, right_quote = part
+                value = lookup(key, depth)
+                if value is MISSING:
+                    text, keep_quotes = "${%s}" % key, True
+                else:
+                    text, keep_quotes = _to_text(value), isinstance(value, str)
+                if keep_quotes and left_quote:
+                    chunks.append("'")
+                chunks.append(text)
+                if keep_quotes and right_quote:
+                    chunks.append("'")
+            return "".join(chunks)
+
+        def walk_key(node: t.Tuple, depth: int) -> t.Any:
+            # 字典的键始终渲染为字符串
+            if node[0] == _VAR:
+                value = lookup(node[1], depth)
+                return "${%s}" % node[1] if value is MISSING else _to_text(value)
+            return walk(node, depth)
+
+        return walk(self._node, 0)
+
+    def __repr__(self):
+        return f"<Template keys={sorted(self.keys)}>"
+
+
+def compile_template(source: t.Any) -> Template:
+    """编译用例规格为模板"""
+    return Template(source)
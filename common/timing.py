@@ -0,0 +1,192 @@
+"""
+阶段耗时统计
+记录每条用例在各执行阶段（模板渲染、前后置数据库/Redis、HTTP建连/首字节/下载、校验、提取、日志、Allure）的耗时，
+按文件和接口汇总并导出为JSON，用于区分慢在服务端、前置数据还是框架本身。
+阶段可以嵌套，每个阶段只统计自身耗时（不含嵌套的子阶段），各阶段之和加上other等于用例总耗时。
+"""
+import time
+import typing as t
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from common.json import json
+
+# 当前执行上下文的用例计时器
+_timer: ContextVar[t.Optional["CaseTimer"]] = ContextVar("case_timer", default=None)
+
+
+class CaseTimer:
+    """用例计时器"""
+    def __init__(self):
+        self.phases: t.Dict[t.Text, float] = defaultdict(float)
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.stopped = False
+        # 进行中的阶段：[阶段名, 子阶段耗时]
+        self._stack: t.List[t.List] = []
+
+    def _record(self, name: t.Text, seconds: float) -> None:
+        self.phases[name] += seconds
+        if self._stack:
+            self._stack[-1][1] += seconds
+
+    def add(self, name: t.Text, seconds: float) -> None:
+        """记录阶段耗时，并从外层阶段的自身耗时中扣除"""
+        self._record(name, seconds)
+        if self.stopped and not self._stack:
+            self.total += seconds
+
+    @contextmanager
+    def phase(self, name: t.Text):
+        frame = [name, 0.0]
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stack.pop()
+            self._record(name, elapsed - frame[1])
+            if self._stack:
+                # 外层阶段扣除的是子阶段的总耗时
+                self._stack[-1][1] += frame[1]
+            elif self.stopped:
+                # 结束计时后的阶段（如并行模式下回放Allure报告）计入总耗时
+                self.total += elapsed
+
+    def stop(self) -> None:
+        """结束计时，未归入任何阶段的耗时记为other"""
+        self.total = time.perf_counter() - self.started
+        self.stopped = True
+        self.phases["other"] = max(self.total - sum(v for k, v in self.phases.items() if k != "other"), 0.0)
+
+    def to_dict(self) -> t.Dict[t.Text, t.Any]:
+        return {"total": round(self.total, 6), "phases": {k: round(v, 6) for k, v in self.phases.items()}}
+
+
+@contextmanager
+def activate(timer: t.Optional[CaseTimer]):
+    """在当前上下文启用用例计时器，timer为None时不统计"""
+    token = _timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _timer.reset(token)
+
+
+@contextmanager
+def phase(name: t.Text):
+    """统计当前用例某个阶段的耗时，未启用计时器时不做任何事"""
+    timer = _timer.get()
+    if timer is None:
+        yield
+        return
+    with timer.phase(name):
+        yield
+
+
+def add(name: t.Text, seconds: float) -> None:
+    """直接记录当前用例某个阶段的耗时（用于无法用with包裹的回调）"""
+    timer = _timer.get()
+    if timer is not None:
+        timer.add(name, seconds)
+
+
+class HttpTiming:
+    """HTTP请求耗时，由调用方在收到响应头时填入ttfb（从发送开始计）"""
+    __slots__ = ("ttfb",)
+
+    def __init__(self):
+        self.ttfb: t.Optional[float] = None
+
+
+@contextmanager
+def http_phase():
+    """统计HTTP请求耗时
+    建连(http.connect)由连接池在建立连接时记录；首字节(http.ttfb)为收到响应头的耗时减去建连耗时，
+    下载(http.download)为读取响应体的耗时。调用方未填入ttfb时全部记为http。
+    """
+    timer = _timer.get()
+    http = HttpTiming()
+    if timer is None:
+        yield http
+        return
+    connect_before = timer.phases.get("http.connect", 0.0)
+    start = time.perf_counter()
+    try:
+        yield http
+    finally:
+        total = time.perf_counter() - start
+        connect = timer.phases.get("http.connect", 0.0) - connect_before
+        if http.ttfb is None:
+            timer.add("http", total - connect)
+        else:
+            timer.add("http.ttfb", max(http.ttfb - connect, 0.0))
+            timer.add("http.download", max(total - http.ttfb, 0.0))
+
+
+class TimingReport:
+    """阶段耗时报告，汇总所有用例的计时结果"""
+    def __init__(self):
+        self.enabled = False
+        self.cases: t.List[t.Dict[t.Text, t.Any]] = []
+
+    def configure(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.cases = []
+
+    def new_timer(self) -> t.Optional[CaseTimer]:
+        """开启统计时为用例创建计时器"""
+        return CaseTimer() if self.enabled else None
+
+    def record(self, nodeid: t.Text, file: t.Text, route: t.Text, timer: CaseTimer) -> t.Dict[t.Text, t.Any]:
+        """记录一条用例的计时结果"""
+        case = {"nodeid": nodeid, "file": file, "route": route, **timer.to_dict()}
+        self.cases.append(case)
+        return case
+
+    def aggregate(self, key: t.Text) -> t.Dict[t.Text, t.Dict[t.Text, t.Any]]:
+        """按文件(file)或接口(route)汇总"""
+        groups: t.Dict[t.Text, t.Dict[t.Text, t.Any]] = {}
+        for case in self.cases:
+            group = groups.setdefault(case[key], {"count": 0, "total": 0.0, "phases": defaultdict(float)})
+            group["count"] += 1
+            group["total"] += case["total"]
+            for name, seconds in case["phases"].items():
+                group["phases"][name] += seconds
+        for group in groups.values():
+            group["total"] = round(group["total"], 6)
+            group["phases"] = {k: round(v, 6) for k, v in sorted(group["phases"].items(), key=lambda i: -i[1])}
+        return groups
+
+    def to_dict(self) -> t.Dict[t.Text, t.Any]:
+        return {"cases": self.cases, "files": self.aggregate("file"), "routes": self.aggregate("route")}
+
+    def dump(self, path: t.Text) -> None:
+        """导出为JSON文件"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    def summary(self, top: int = 5) -> t.List[t.Text]:
+        """终端报告：全部用例的阶段耗时分布和最慢的接口"""
+        phases: t.Dict[t.Text, float] = defaultdict(float)
+        for case in self.cases:
+            for name, seconds in case["phases"].items():
+                phases[name] += seconds
+        total = sum(case["total"] for case in self.cases) or 1.0
+        lines = [f"用例数: {len(self.cases)}，总耗时: {total:.3f}s"]
+        for name, seconds in sorted(phases.items(), key=lambda i: -i[1]):
+            if seconds < 0.0005:
+                continue  # 未执行的阶段（如没有前置SQL）不展示
+            lines.append(f"  {name:<14} {seconds:8.3f}s  {seconds / total:6.1%}")
+        routes = sorted(self.aggregate("route").items(), key=lambda i: -i[1]["total"])[:top]
+        if routes:
+            lines.append(f"最慢的{len(routes)}个接口:")
+        for route, group in routes:
+            slowest = next(iter(group["phases"]), "")
+            lines.append(f"  {route}  {group['count']}次  {group['total']:.3f}s  主要耗时: {slowest}")
+        return lines
+
+
+# 全局阶段耗时报告
+timing_report = TimingReport()
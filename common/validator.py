@@ -0,0 +1,412 @@
+"""
+响应校验
+Validate块在收集阶段编译为校验器，同一用例的参数组共享：断言按书写顺序编译为检查项，
+不含变量的预期值在编译时就转换好（正则预编译、JSONPath编译、数值解析），
+含${var}的预期值使用与请求同一次渲染的结果（同一请求中faker等变量取值一致），执行时只转换该项。
+每项断言记录结果和耗时，汇总为一个Allure附件，失败的断言以软断言报告。
+
+支持的断言：
+    expectcode: 200                     响应状态码
+    resultcheck: "发送成功"              响应包含文本：JSON响应在解析后的键和值中查找，找不到时再在JSON文本中查找
+    regularcheck: "user_id: (\\d+)"     正则在响应文本中有匹配
+    jsonpath_check: {$.data.id: 3}      路径的值等于预期值，含通配/过滤的路径预期值为列表时比较全部匹配值
+    contains: {$.data.tags: vip}        路径的值包含预期值：列表包含元素（预期为列表时包含全部元素）、字典包含子字典、字符串包含子串
+    range: {$.data.price: [1, 100]}     数值在闭区间内，也可以写{min: 1, max: 100}，省略或为null的一侧不限制；多个匹配值时全部在范围内
+    length: {$.data.list: 10}           字符串/列表/字典的长度，也可以写{min: 1, max: 20}；含通配的路径为匹配值的个数
+    max_response_time: 500              响应时间上限（毫秒）
+"""
+import re
+import time
+import typing as t
+from functools import lru_cache
+from common.json_path import JsonPath, compile_path
+from common.report import assume, attach, attachment_writer, step
+from common.response import ParsedResponse
+from common.template import compile_template
+from utils.logger import logger
+
+# 校验结果附件中预期值/实际值的展示长度
+_SHOW_LIMIT = 200
+
+
+class CheckResult:
+    """单项断言的结果"""
+    __slots__ = ("check", "target", "passed", "expected", "actual", "message", "cost")
+
+    def __init__(self, check: t.Text, target: t.Text, passed: bool, expected: t.Any, actual: t.Any,
+                 message: t.Text = ""):
+        # 断言类型，如expectcode/jsonpath_check
+        self.check = check
+        # 断言目标，如JSONPath，没有时为空
+        self.target = target
+        self.passed = passed
+        self.expected = expected
+        self.actual = actual
+        self.message = message
+        # 耗时（秒）
+        self.cost = 0.0
+
+    def __repr__(self):
+        return f"<CheckResult {self.check} {self.target} {'passed' if self.passed else 'failed'}>"
+
+
+@lru_cache(maxsize=1024)
+def _regex(pattern: t.Text) -> t.Pattern:
+    """编译正则，含变量的正则按渲染后的文本缓存"""
+    return re.compile(pattern)
+
+
+def _number(value: t.Any) -> t.Optional[float]:
+    """数值或数值字符串转换为数值，其他返回None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def _bounds(value: t.Any, name: t.Text) -> t.Tuple[t.Optional[float], t.Optional[float]]:
+    """范围写法 [min, max] / {min: , max: } -> (下限, 上限)"""
+    if isinstance(value, dict):
+        low, high = value.get('min'), value.get('max')
+    elif isinstance(value, (list, tuple)) and len(value) == 2:
+        low, high = value
+    else:
+        raise ValueError(f"{name}的范围应为[min, max]或{{min: , max: }}：{value!r}")
+    bounds = []
+    for bound in (low, high):
+        if bound is not None and _number(bound) is None:
+            raise ValueError(f"{name}的范围不是数值：{value!r}")
+        bounds.append(None if bound is None else _number(bound))
+    if bounds == [None, None]:
+        raise ValueError(f"{name}的范围至少需要指定min或max：{value!r}")
+    return bounds[0], bounds[1]
+
+
+def _in_bounds(value: float, low: t.Optional[float], high: t.Optional[float]) -> bool:
+    return (low is None or value >= low) and (high is None or value <= high)
+
+
+def _show_bounds(low: t.Optional[float], high: t.Optional[float]) -> t.Text:
+    if low is not None and low == high:
+        return str(low)
+    return f"[{'-∞' if low is None else low}, {'+∞' if high is None else high}]"
+
+
+def _scalar_text(value: t.Any) -> t.Text:
+    """标量在JSON文本中的写法"""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _search(node: t.Any, text: t.Text, path: t.List) -> t.Optional[t.List]:
+    """在解析后的JSON的键和值中查找文本，返回所在位置的路径"""
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if text in key:
+                return path + [key]
+            found = _search(value, text, path + [key])
+            if found is not None:
+                return found
+        return None
+    if isinstance(node, list):
+        for i, value in enumerate(node):
+            found = _search(value, text, path + [i])
+            if found is not None:
+                return found
+        return None
+    return path if text in _scalar_text(node) else None
+
+
+def _subset(actual: t.Any, expected: t.Any) -> bool:
+    """预期为字典时实际值包含其全部键且对应值匹配，否则相等"""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        return all(key in actual and _subset(actual[key], value) for key, value in expected.items())
+    return actual == expected
+
+
+def _contains(actual: t.Any, expected: t.Any) -> bool:
+    """JSON值的包含判断"""
+    if isinstance(actual, str):
+        return _scalar_text(expected) in actual
+    if isinstance(actual, dict):
+        return isinstance(expected, dict) and _subset(actual, expected)
+    if isinstance(actual, list):
+        items = expected if isinstance(expected, list) else [expected]
+        return all(any(_subset(value, item) for value in actual) for item in items)
+    return actual == expected
+
+
+class Check:
+    """断言类型
+    prepare把预期值转换为比较用的形式，常量预期值在编译时执行一次，预期值无效时抛出ValueError；
+    evaluate对响应执行断言，每个断言目标（如每条JSONPath）产生一个结果。
+    """
+    name = ""
+    # 结果中的展示名称
+    title = ""
+
+    def prepare(self, expected: t.Any) -> t.Any:
+        return expected
+
+    def evaluate(self, r: ParsedResponse, prepared: t.Any) -> t.Iterator[CheckResult]:
+        raise NotImplementedError
+
+
+class ExpectCode(Check):
+    name = "expectcode"
+    title = "响应码"
+
+    def prepare(self, expected):
+        try:
+            return int(expected)
+        except (TypeError, ValueError):
+            raise ValueError(f"预期响应码无效：{expected!r}") from None
+
+    def evaluate(self, r, code):
+        yield CheckResult(self.name, "", r.status_code == code, code, r.status_code,
+                          f"响应码校验失败：预期{code}，实际{r.status_code}")
+
+
+class ResultCheck(Check):
+    name = "resultcheck"
+    title = "响应预期值"
+
+    def prepare(self, expected):
+        return str(expected)
+
+    def evaluate(self, r, text):
+        try:
+            data = r.json()  # 复用已解析的JSON
+        except ValueError:
+            passed = text in r.text
+            yield CheckResult(self.name, "", passed, text, "响应文本" if passed else r.text,
+                              f"响应中未找到预期值 {text!r}")
+            return
+        found = _search(data, text, [])
+        if found is not None:
+            yield CheckResult(self.name, "", True, text, "$" + "".join(f"[{k!r}]" for k in found))
+        elif text in r.json_text:
+            # 预期值跨越多个键值（如 "code": 0），只有这时才需要序列化后的JSON文本
+            yield CheckResult(self.name, "", True, text, "JSON文本")
+        else:
+            yield CheckResult(self.name, "", False, text, r.text, f"响应中未找到预期值 {text!r}")
+
+
+class RegularCheck(Check):
+    name = "regularcheck"
+    title = "正则"
+
+    def prepare(self, expected):
+        try:
+            return _regex(str(expected))
+        except re.error as e:
+            raise ValueError(f"正则表达式无效：{expected!r}，{e}") from None
+
+    def evaluate(self, r, pattern):
+        match = pattern.search(r.text)
+        yield CheckResult(self.name, "", match is not None, pattern.pattern, match and match.group(0),
+                          f"正则 {pattern.pattern!r} 在响应中没有匹配")
+
+
+class PathCheck(Check):
+    """预期值为 JSONPath: 预期值 的断言"""
+
+    def prepare(self, expected):
+        if not isinstance(expected, dict):
+            raise ValueError(f"{self.name}应写为 JSONPath: 预期值：{expected!r}")
+        return [(str(path), compile_path(str(path)), self.prepare_value(value)) for path, value in expected.items()]
+
+    def prepare_value(self, value: t.Any) -> t.Any:
+        return value
+
+    def evaluate(self, r, rules):
+        try:
+            data = r.json()
+        except ValueError:
+            for path, _, value in rules:
+                yield CheckResult(self.name, path, False, value, None, f"响应不是JSON格式，无法进行{self.title}校验")
+            return
+        for path, compiled, value in rules:
+            matches = compiled.find(data)
+            if not matches:
+                yield CheckResult(self.name, path, False, value, None, f"JSONPath {path} 未找到匹配结果")
+                continue
+            yield self.compare(path, compiled, matches, value)
+
+    def compare(self, path: t.Text, compiled: JsonPath, matches: t.List, expected: t.Any) -> CheckResult:
+        raise NotImplementedError
+
+
+class JsonPathCheck(PathCheck):
+    name = "jsonpath_check"
+    title = "JSONPath"
+
+    def compare(self, path, compiled, matches, expected):
+        # 含通配/过滤等的路径预期为列表时比较全部匹配值，否则比较第一个匹配值
+        actual = matches if not compiled.definite and isinstance(expected, list) else matches[0]
+        return CheckResult(self.name, path, actual == expected, expected, actual,
+                           f"JSONPath {path} 匹配失败：预期{expected!r}，实际{actual!r}")
+
+
+class ContainsCheck(PathCheck):
+    name = "contains"
+    title = "包含"
+
+    def compare(self, path, compiled, matches, expected):
+        actual = matches[0] if compiled.definite else matches
+        return CheckResult(self.name, path, _contains(actual, expected), expected, actual,
+                           f"{path} 的值 {actual!r} 不包含 {expected!r}")
+
+
+class RangeCheck(PathCheck):
+    name = "range"
+    title = "数值范围"
+
+    def prepare_value(self, value):
+        return _bounds(value, self.name)
+
+    def compare(self, path, compiled, matches, bounds):
+        numbers = [_number(value) for value in matches]
+        passed = all(n is not None and _in_bounds(n, *bounds) for n in numbers)
+        actual = matches[0] if compiled.definite else matches
+        return CheckResult(self.name, path, passed, _show_bounds(*bounds), actual,
+                           f"{path} 的值 {actual!r} 不在范围 {_show_bounds(*bounds)} 内")
+
+
+class LengthCheck(PathCheck):
+    name = "length"
+    title = "长度"
+
+    def prepare_value(self, value):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value, value
+        return _bounds(value, self.name)
+
+    def compare(self, path, compiled, matches, bounds):
+        # 含通配/过滤的路径为匹配值的个数
+        value = matches[0] if compiled.definite else matches
+        if not isinstance(value, (str, list, dict)):
+            return CheckResult(self.name, path, False, _show_bounds(*bounds), value,
+                               f"{path} 的值 {value!r} 没有长度")
+        size = len(value)
+        return CheckResult(self.name, path, _in_bounds(size, *bounds), _show_bounds(*bounds), size,
+                           f"{path} 的长度 {size} 不符合预期 {_show_bounds(*bounds)}")
+
+
+class MaxResponseTime(Check):
+    name = "max_response_time"
+    title = "响应时间(ms)"
+
+    def prepare(self, expected):
+        limit = _number(expected)
+        if limit is None:
+            raise ValueError(f"响应时间上限无效：{expected!r}")
+        return limit
+
+    def evaluate(self, r, limit):
+        actual = round(r.elapsed.total_seconds() * 1000, 3)
+        yield CheckResult(self.name, "", actual <= limit, limit, actual,
+                          f"响应时间 {actual}ms 超过上限 {limit}ms")
+
+
+# 断言类型 -> 检查项
+CHECKS: t.Dict[t.Text, Check] = {check.name: check for check in (
+    ExpectCode(), ResultCheck(), RegularCheck(), JsonPathCheck(), ContainsCheck(), RangeCheck(),
+    LengthCheck(), MaxResponseTime())}
+
+
+def _skipped(expected: t.Any) -> bool:
+    """预期值为空的断言不执行（如参数组中未提供resultcheck）"""
+    return expected is None or expected == ""
+
+
+def _prepare(check: Check, expected: t.Any) -> t.Tuple[t.Any, t.Optional[t.Text]]:
+    """-> (转换后的预期值, 预期值无效时的错误信息)"""
+    try:
+        return check.prepare(expected), None
+    except ValueError as e:
+        return None, str(e)
+
+
+def _show(value: t.Any) -> t.Text:
+    return attachment_writer.clip(value if isinstance(value, str) else repr(value), _SHOW_LIMIT)
+
+
+class Validator:
+    """编译后的Validate块"""
+    def __init__(self, validate: t.Dict):
+        # [(断言类型, 检查项, 是否含变量, 原始预期值, 转换后的预期值, 错误信息)]
+        self.entries: t.List[t.Tuple[t.Text, Check, bool, t.Any, t.Any, t.Optional[t.Text]]] = []
+        for key, expected in validate.items():
+            check = CHECKS.get(key)
+            if check is None:
+                logger.warning(f"未知的断言类型 {key}，可选：{', '.join(CHECKS)}")
+                continue
+            if compile_template(expected).keys:
+                self.entries.append((key, check, True, expected, None, None))
+            elif not _skipped(expected):
+                self.entries.append((key, check, False, expected, *_prepare(check, expected)))
+
+    def __bool__(self):
+        return bool(self.entries)
+
+    def run(self, r: ParsedResponse, rendered: t.Optional[t.Dict] = None,
+            fail_fast: bool = False) -> t.List[CheckResult]:
+        """执行全部断言
+        :param rendered: 与请求一起渲染的Validate块，含变量的断言从中取预期值
+        :param fail_fast: 遇到第一个失败的断言即停止
+        """
+        results = []
+        for key, check, dynamic, expected, prepared, error in self.entries:
+            start = time.perf_counter()
+            if dynamic:
+                expected = (rendered or {}).get(key)
+                if _skipped(expected):
+                    continue
+                prepared, error = _prepare(check, expected)
+            if error is not None:
+                items = iter([CheckResult(key, "", False, expected, None, error)])
+            else:
+                items = check.evaluate(r, prepared)
+            for result in items:
+                now = time.perf_counter()
+                result.cost, start = now - start, now
+                results.append(result)
+                if fail_fast and not result.passed:
+                    return results
+        return results
+
+    def check(self, r: ParsedResponse, rendered: t.Optional[t.Dict] = None) -> t.List[CheckResult]:
+        """执行断言并报告：结果汇总为一个Allure附件，失败的断言以软断言报告"""
+        results = self.run(r, rendered)
+        if not results:
+            return results
+        failed = sum(not result.passed for result in results)
+        lines = ["结果\t断言\t目标\t预期\t实际\t耗时(ms)"]
+        for result in results:
+            title = CHECKS[result.check].title
+            lines.append(f"{'通过' if result.passed else '失败'}\t{title}\t{result.target}\t"
+                         f"{_show(result.expected)}\t{_show(result.actual)}\t{result.cost * 1000:.3f}")
+        logger.debug("响应校验：\n%s", "\n".join(lines))
+        with step(f"响应校验：{len(results)}项，失败{failed}项"):
+            attach(name="校验结果", body="\n".join(lines))
+        for result in results:
+            assume(result.passed, result.message)
+        return results
+
+
+def compile_validate(validate: t.Optional[t.Dict]) -> t.Optional[Validator]:
+    """编译Validate块，没有需要执行的断言时返回None"""
+    if not validate:
+        return None
+    validator = Validator(validate)
+    return validator if validator else None
@@ -2,19 +2,34 @@
 pytest处理
 该模块用于处理pytest测试，包括收集YAML测试文件、执行测试用例和处理测试结果。
 """
+import time
 import typing as t
-import yaml
+import itertools
+from contextlib import closing
+import allure
 import pytest
-from requests import Response
-from common.db import DatabaseClient
-from common.redis_client import RedisClient
-from common.cache import cache
-from common.json import dumps, loads
-from common.request import HttpRequest
-from common.regular import findalls, sub_var, sub_sql_var, sub_redis_var
-from common.result import get_result, check_results
-from common.exceptions import YamlException, RequestException
-from utils.logger import logger, log_handler
+from common.db import BULK_CHUNK_SIZE, NULL_MARK, DatabaseClient, db_pool
+from common.redis_client import RedisClient, parse_command, redis_pool
+from common.cache import CASE, FILE, PARAM, SESSION, cache
+from common.json import json
+from common import report, timing
+from common.report import run_recorded, attachment_writer
+from common.request import http_pool
+from common.response import ParsedResponse
+from common.scheduler import DependencyGraph, DagScheduler, case_io, case_resources
+from common.auth_cache import REJECTED_STATUS, auth_cache
+from common.shared_store import SharedStore, open_shared_store
+from common.regular import sub_redis_var
+from common.sql import bind_sql
+from common.db_extract import extract_rows, is_query, parse_rules, pushdown
+from common.loader import apply_file_config, suite_cache
+from common.params import ParameterSource, iter_parameters
+from common.template import compile_template
+from common.timing import timing_report
+from common.result import extract_rules, get_result
+from common.validator import compile_validate
+from utils.faker_utils import DEFAULT_BATCH_SIZE, DEFAULT_UNIQUE, faker_pool
+from utils.logger import lazy, logger, log_handler
 
 
 # @pytest.fixture(autouse=True)
@@ -22,6 +37,10 @@ from utils.logger import logger, log_handler
 #     # 每次清空缓存
 #     cache.data.clear()
 
+# 并行模式下的依赖调度器
+scheduler_key = pytest.StashKey[DagScheduler]()
+shared_store_key = pytest.StashKey[SharedStore]()
+
 def pytest_addoption(parser):
     """添加命令行参数"""
     parser.addoption(
@@ -30,6 +49,195 @@ def pytest_addoption(parser):
         default="dev",  # 默认使用开发环境
         help="指定测试环境，可选值：XXX/XXXX/XXXXX"
     )
+    parser.addoption("--pool-connections", action="store", type=int, default=10,
+                     help="HTTP连接池缓存的host数量")
+    parser.addoption("--pool-maxsize", action="store", type=int, default=10,
+                     help="每个host保留的最大连接数")
+    parser.addoption("--no-keep-alive", action="store_true", default=False,
+                     help="关闭HTTP长连接，每个请求结束后断开")
+    parser.addoption("--db-pool-size", action="store", type=int, default=10,
+                     help="每个数据库配置的最大连接数")
+    parser.addoption("--db-health-check", action="store", type=float, default=30.0,
+                     help="数据库连接空闲超过该秒数后，取出时先做健康检查")
+    parser.addoption("--db-isolation", action="store", default="commit", choices=["commit", "rollback"],
+                     help="数据库用例的隔离方式：commit(执行teardown_db清理) / rollback(setup_db在事务中执行，用例结束时回滚)")
+    parser.addoption("--redis-pool-size", action="store", type=int, default=10,
+                     help="每个Redis配置的最大连接数")
+    parser.addoption("--attach-max-size", action="store", type=int, default=1024 * 1024,
+                     help="单个Allure附件的大小上限（字符），超出部分截断，0表示不限制")
+    parser.addoption("--attach-inline-limit", action="store", type=int, default=4096,
+                     help="用例描述中内联请求/响应内容的上限，超过时另存为附件")
+    parser.addoption("--timing", action="store_true", default=False,
+                     help="统计每条用例各阶段耗时，写入Allure附件并在终端汇总")
+    parser.addoption("--timing-json", action="store", default=None,
+                     help="阶段耗时导出的JSON文件路径（指定时自动开启--timing）")
+    parser.addoption("--param-sample", action="store", default=None,
+                     help="parameters_from数据源的抽样比例，如0.01或1%%，用于冒烟测试")
+    parser.addoption("--workers", action="store", type=int, default=1,
+                     help="并行执行的工作线程数，大于1时按用例变量依赖关系并行调度；共享Cookie会话(session: file/session)"
+                          "或执行数据库/Redis写操作的用例按收集顺序串行，只依赖其他用例在服务端产生的数据而没有变量引用的用例不保证顺序")
+    parser.addoption("--engine", action="store", default="sync", choices=["sync", "async"],
+                     help="执行引擎：sync(requests) / async(aiohttp单事件循环并发)")
+    parser.addoption("--concurrency", action="store", type=int, default=50,
+                     help="异步引擎的并发请求上限")
+    parser.addoption("--shared-store", action="store", default=None,
+                     help="多进程执行时共享会话级变量的存储，如sqlite:///tmp/apitest-vars.db或redis://127.0.0.1:6379/15")
+    parser.addoption("--shared-run-id", action="store", default=None,
+                     help="共享变量的执行标识，同一次执行的各进程必须一致；pytest-xdist下默认使用testrunuid")
+    parser.addoption("--shared-timeout", action="store", type=float, default=60.0,
+                     help="等待其他进程发布变量的超时时间（秒）")
+    parser.addoption("--auth-cache", action="store", default=None,
+                     help="登录凭证缓存文件，默认保存在pytest缓存目录中（--cache-clear时清除）")
+    parser.addoption("--no-auth-cache", action="store_true", default=False,
+                     help="不使用登录凭证缓存，登录用例总是请求登录接口")
+    parser.addoption("--case-log-level", action="store", default="DEBUG",
+                     choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                     help="用例日志级别，级别以下的日志不合并参数也不写入")
+    parser.addoption("--shared-keys", action="store", default="",
+                     help="其他分片中的用例会发布的变量（逗号分隔），本分片未收集到生产者用例时需要指定")
+    parser.addoption("--faker-seed", action="store", default=None,
+                     help="faker数据的随机种子，未指定时随机生成并输出在报告中，用于复现失败的用例")
+    parser.addoption("--faker-unique", action="store", default=",".join(DEFAULT_UNIQUE),
+                     help="同一次执行中不重复的faker数据（逗号分隔），为空时不去重")
+    parser.addoption("--faker-batch", action="store", type=int, default=DEFAULT_BATCH_SIZE,
+                     help="每种faker数据每批预先生成的数量")
+
+def pytest_configure(config):
+    """初始化全局HTTP连接池、数据库连接池和Allure附件写入"""
+    logger.setLevel(config.getoption("--case-log-level"))
+    http_pool.configure(
+        pool_connections=config.getoption("--pool-connections"),
+        pool_maxsize=config.getoption("--pool-maxsize"),
+        keep_alive=not config.getoption("--no-keep-alive"),
+    )
+    db_pool.configure(
+        max_size=config.getoption("--db-pool-size"),
+        health_check_interval=config.getoption("--db-health-check"),
+    )
+    redis_pool.configure(max_connections=config.getoption("--redis-pool-size"))
+    attachment_writer.configure(
+        report_dir=config.getoption("allure_report_dir", None),
+        max_size=config.getoption("--attach-max-size"),
+        inline_limit=config.getoption("--attach-inline-limit"),
+    )
+    # 已编译用例缓存放在pytest缓存目录中，--cache-clear时一并清除；禁用cacheprovider时不缓存
+    suite_cache.configure(config.cache.mkdir("yaml_suite") if getattr(config, "cache", None) else None)
+    timing_report.configure(enabled=config.getoption("--timing") or bool(config.getoption("--timing-json")))
+    # 开启计时时日志入队的耗时记入用例的logging阶段
+    log_handler.set_phase_hook(timing.phase if timing_report.enabled else None)
+    if config.getoption("--no-auth-cache"):
+        auth_cache.configure(None)
+    elif path := config.getoption("--auth-cache"):
+        auth_cache.configure(path)
+    else:
+        auth_cache.configure(config.cache.mkdir("auth") / "credentials.json" if getattr(config, "cache", None) else None)
+    workerinput = getattr(config, "workerinput", {})
+    # xdist进程使用主进程的种子（见pytest_configure_node），按进程标识区分生成的数据
+    faker_pool.configure(
+        seed=workerinput.get("faker_seed", config.getoption("--faker-seed")),
+        unique=[name.strip() for name in config.getoption("--faker-unique").split(",") if name.strip()],
+        batch_size=config.getoption("--faker-batch"),
+        namespace=workerinput.get("workerid", ""),
+    )
+    if url := config.getoption("--shared-store"):
+        run_id = config.getoption("--shared-run-id") or workerinput.get("testrunuid")
+        if not run_id:
+            logger.warning("未指定--shared-run-id，共享变量只在当前进程内有效")
+        config.stash[shared_store_key] = open_shared_store(url, run_id)
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    """pytest-xdist：把主进程的faker种子传给工作进程"""
+    node.workerinput["faker_seed"] = faker_pool.seed
+
+def pytest_report_header(config):
+    """报告头部输出faker随机种子"""
+    return f"faker seed: {faker_pool.seed}（使用 --faker-seed {faker_pool.seed} 复现相同的数据）"
+
+def pytest_collection_finish(session):
+    """开启跨进程共享：-k/-m筛选后最终执行的用例会写入的变量，本地不存在时等待其他进程发布
+    被筛选掉的用例不会执行，其写入的变量不等待。
+    """
+    config = session.config
+    if shared := config.stash.get(shared_store_key, None):
+        expected = {key.strip() for key in config.getoption("--shared-keys").split(",") if key.strip()}
+        for item in session.items:
+            if isinstance(item, YamlTest):
+                expected |= item.dependencies()[1]
+        cache.share(shared, expected, config.getoption("--shared-timeout"))
+
+def pytest_runtest_teardown(item):
+    """跳过或未执行的用例同样放弃发布其写入的变量"""
+    if isinstance(item, YamlTest):
+        item.release_shared()
+
+def _graph_entry(item):
+    """依赖图中的一条用例：(用例, 读取的变量和资源, 写入的变量和资源)"""
+    reads, writes = item.dependencies()
+    resource_reads, resource_writes = item.resources()
+    return item, reads | resource_reads, writes | resource_writes
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtestloop(session):
+    """并行/异步模式下按依赖图在后台调度执行用例，pytest主循环按收集顺序回放结果"""
+    workers = session.config.getoption("--workers")
+    engine = session.config.getoption("--engine")
+    if (workers <= 1 and engine == "sync") or session.config.option.collectonly:
+        return None
+    items = [item for item in session.items if isinstance(item, YamlTest)]
+    graph = DependencyGraph(_graph_entry(item) for item in items)
+    if engine == "async":
+        from common.async_engine import AsyncEngine
+        scheduler = AsyncEngine(graph, session.config.getoption("--concurrency"))
+    else:
+        scheduler = DagScheduler(graph, workers)
+    session.config.stash[scheduler_key] = scheduler
+    futures = scheduler.start(lambda item: run_recorded(item.execute))
+    for item, future in zip(items, futures):
+        item.future = future
+    return None
+
+def pytest_sessionfinish(session):
+    """停止调度并关闭全局连接池"""
+    if scheduler := session.config.stash.get(scheduler_key, None):
+        scheduler.shutdown()
+    http_pool.close()
+    for name, stats in db_pool.stats().items():
+        logger.info(f"数据库连接池 {name}: {stats}")
+    if suite_cache.cache_dir:
+        logger.info(f"用例缓存命中 {suite_cache.hits} 个文件，重新解析 {suite_cache.misses} 个文件")
+    if path := session.config.getoption("--timing-json"):
+        timing_report.dump(path)
+    if auth_cache.enabled and any(auth_cache.stats.values()):
+        logger.info(f"登录凭证缓存: {auth_cache.stats}")
+    if shared := session.config.stash.get(shared_store_key, None):
+        logger.info(f"共享变量 run_id={shared.run_id}: {shared.stats}")
+    if faker_stats := faker_pool.stats():
+        logger.info(f"faker数据 seed={faker_pool.seed}: {faker_stats}")
+
+def pytest_unconfigure(config):
+    """关闭数据库/Redis连接池（在终端报告输出之后），写完剩余的Allure附件"""
+    db_pool.close()
+    redis_pool.close()
+    if shared := config.stash.get(shared_store_key, None):
+        cache.unshare()
+        shared.close()
+    attachment_writer.close()
+
+def pytest_terminal_summary(terminalreporter):
+    """输出依赖调度报告、连接池复用统计和阶段耗时"""
+    if scheduler := terminalreporter.config.stash.get(scheduler_key, None):
+        terminalreporter.write_sep("=", "依赖调度")
+        for line in scheduler.summary():
+            terminalreporter.write_line(line)
+    if db_stats := db_pool.stats():
+        terminalreporter.write_sep("=", "数据库连接池")
+        for name, stats in db_stats.items():
+            terminalreporter.write_line(f"{name}: {stats}")
+    if timing_report.cases:
+        terminalreporter.write_sep("=", "阶段耗时")
+        for line in timing_report.summary():
+            terminalreporter.write_line(line)
 
 @pytest.fixture(scope="session")
 def env_config(request):
@@ -57,56 +265,46 @@ class YamlFile(pytest.File):
     用于收集YAML文件中的测试用例。
     """
     def collect(self):
-        # 加载YAML文件内容
-        raw = yaml.safe_load(self.path.open(encoding='utf-8'))
-        # 检查是否包含以test开头的键
-        if not any(k.startswith('test') for k in raw.keys()):
-            # 如果不包含，则抛出YamlException异常
-            raise YamlException(f"{self.path}yaml non test found")
-        # 获取变量配置
-        if variable := raw.get('variable'):
-            # 将变量添加到全局变量池
-            for k, v in variable.items():
-                cache.set(k, v)
-        # 获取配置信息
-        if config := raw.get('config'):
-            # 查找需要替换的变量
-            keys = findalls(dumps(config))
-            # 替换变量
-            config = loads(sub_var({k: cache.get(k)
-                           for k in keys}, dumps(config)))
-            if 'headers' in config:
-                existing_headers = cache.get('headers', {})  # 获取缓存中已有的headers
-                existing_headers.update(config['headers'])  # 合并新headers
-                config['headers'] = existing_headers  # 更新为合并后的值
-            # 将配置信息添加到全局变量池
-            for k, v in config.items():
-                cache.set(k, v)
+        # 加载YAML文件内容（文件未修改时使用已编译的缓存）
+        raw, templates = suite_cache.load(self.path)
+        # 变量和配置写入文件级变量池，记录文件级会话隔离级别
+        self.variables = cache.session.fork(FILE)
+        self.session_scope = apply_file_config(raw, self.variables)
         # 获取测试用例
         if tests := raw.get('tests'):
             for name, spec in tests.items():
-                parameters = spec.get('parameters', None)
-                if parameters:
-                    logger.info(f"用例 {name} 解析到 {len(parameters)} 个参数组，将生成 {len(parameters)} 条独立用例")
+                # 参数组逐行读取（parameters_from数据文件流式读取），边读边生成用例
+                parameters = iter_parameters(spec, self.path.parent, self.config.getoption("--param-sample"))
+                template = templates[name]
+                # Validate块编译一次，参数组生成的用例共享
+                validator = compile_validate(spec.get('Validate'))
+                if parameters is not None:
+                    count = 0
                     for i, param in enumerate(parameters):
+                        count += 1
                         # 生成用例名称
                         param_desc = param.get('case_description') or param.get('description')
                         if param_desc:
                             test_name = param_desc
                         else:
                             test_name = f"{spec.get('case_description') or spec.get('description') or name}_param_{i}"
-                        logger.debug(f"生成独立用例：{test_name}，参数：{param}")
+                        logger.debug("生成独立用例：%s，参数：%s", test_name, param)
                         yield YamlTest.from_parent(
                             self,
                             name=test_name,
                             spec=spec,
+                            template=template,
+                            validator=validator,
                             param=param
                         )
+                    logger.info(f"用例 {name} 解析到 {count} 个参数组，已生成 {count} 条独立用例")
                 else:
                     yield YamlTest.from_parent(
                         self,
                         name=spec.get('case_description') or spec.get('description') or name,
                         spec=spec,
+                        template=template,
+                        validator=validator,
                         param=None
                     )
 
@@ -114,35 +312,109 @@ class YamlTest(pytest.Item):
     """
     YAML测试用例类
     用于执行YAML文件中的测试用例。
+    收集阶段只保存共享的用例规格、模板和参数组，HTTP会话、数据库/Redis客户端在执行时创建，执行完即释放，
+    大量参数组生成的用例不会在收集阶段占用连接和会话。
     """
-    def __init__(self, name, parent, spec, param=None):
+    def __init__(self, name, parent, spec, template=None, validator=None, param=None):
         # 调用父类的构造函数
         super(YamlTest, self).__init__(name, parent)
         # 保存测试用例的规格信息
         self.spec = spec
+        # 收集阶段编译好的请求模板
+        self.template = template
+        # 收集阶段编译好的校验器，没有断言时为None
+        self.validator = validator
         # 接收参数化数据
         self.param = param
-        # 创建HttpRequest对象
-        self.request = HttpRequest(exception=(RequestException, Exception))
+        # 会话隔离级别：用例级 > 文件级 > 默认每条用例独立（Cookie共享需要显式开启）
+        self.session_scope = spec.get('session') or parent.session_scope or 'case'
+        self.request = None
         self.db_client = None
         self.redis_client = None
+        # 并行模式下由调度器执行，结果为用例记录器
+        self.future = None
+        # 阶段耗时计时器，开启--timing时在执行时创建
+        self.timer = None
+
+    def dependencies(self):
+        """用例读写的变量，用于构建依赖图"""
+        return case_io(self.spec, self.param, self.template.keys if self.template else None)
+
+    def resources(self):
+        """用例读写的共享资源（共享的Cookie会话、数据库、Redis），与变量一起构建依赖图"""
+        session = {"session": "session", "file": f"file:{self.fspath}"}.get(self.session_scope)
+        return case_resources(self.spec, self.param, session)
 
     def runtest(self):
         """Some custom test execution (dumb example follows).
-        执行测试用例，发送请求并处理响应。
+        并行模式下等待调度器执行完毕并回放断言与报告，否则直接执行。
         """
-        if self.param:
-            for key in self.param.keys():
-                if key in cache.data:  # 直接操作缓存底层数据结构
-                    del cache.data[key]
+        try:
+            if self.future is not None:
+                # 回放后不再持有调度结果
+                future, self.future = self.future, None
+                with timing.activate(self.timer):
+                    future.result().replay()
+            else:
+                self.execute()
+        finally:
+            self.report_timing()
+            self.timer = None
+
+    def case_store(self):
+        """用例的变量池：在文件级变量池上叠加参数组和用例两层，参数组只对当前用例可见"""
+        return self.parent.variables.fork(PARAM, self.param).fork(CASE)
+
+    def execute(self):
+        """执行测试用例，发送请求并处理响应。"""
+        self.timer = timing_report.new_timer()
+        with timing.activate(self.timer), cache.activate(self.case_store()):
+            try:
+                with timing.phase("prepare"):
+                    self.prepare()
+                try:
+                    # 登录用例命中凭证缓存时不发送请求
+                    if self.restore_auth():
+                        return
+                    self.exec_setup()
+                    # 发送请求
+                    r, processed_kwargs = self.request.send_request(self.template, **self.spec)
+                    # 缓存的凭证被服务端拒绝时重新登录，新的Cookie写入当前会话后重发一次
+                    if (cookies := self.refresh_auth(r, processed_kwargs.get('Validate'))) is not None:
+                        self.request.cookies.update(cookies)
+                        r, processed_kwargs = self.request.send_request(self.template, **self.spec)
+                    # 处理响应
+                    self.response_handle(r, processed_kwargs.get('Validate'), processed_kwargs.get('Extract'))
+                    self.save_auth(r, processed_kwargs.get('Extract'))
+                    self.exec_teardown()
+                finally:
+                    with timing.phase("cleanup"):
+                        self.cleanup()
+            finally:
+                if self.timer:
+                    self.timer.stop()
+                self.release_shared()
+
+    def release_shared(self):
+        """开启跨进程共享时，用例写入但未发布的变量（失败或未提取到）标记为放弃，其他进程不再等待"""
+        if cache.sharing:
+            cache.abandon(self.dependencies()[1])
+
+    def report_timing(self):
+        """记录阶段耗时并写入Allure附件"""
+        if self.timer is None:
+            return
+        route = f"{str(self.spec.get('method', 'GET')).upper()} {self.spec.get('route')}"
+        case = timing_report.record(self.nodeid, str(self.fspath), route, self.timer)
+        report.attach(json.dumps(case, ensure_ascii=False, indent=2), name="阶段耗时",
+                      attachment_type=allure.attachment_type.JSON)
+
+    def prepare(self):
+        """执行前准备：切换环境、初始化客户端并获取HTTP会话，参数组已在用例的变量池中"""
         # 切换到当前用例再打印
-        log_handler.set_test_name(self.name)
-        logger.info(f"当前执行参数组：{self.param}")
-        # 处理参数化变量：将当前参数存入缓存
-        if self.param:
-            for k, v in self.param.items():
-                cache.set(k, v)
-        logger.debug(f"发送请求前缓存内容: {cache.data}")
+        log_handler.set_test_id(self.nodeid)
+        logger.info("当前执行参数组：%s", self.param)
+        logger.debug("发送请求前缓存内容: %s", cache.data)
         from config.environments import ENVIRONMENTS  # 导入环境配置
         env = self.config.getoption("--env")
         # 验证环境有效性
@@ -150,27 +422,122 @@ class YamlTest(pytest.Item):
             raise ValueError(f"无效环境：{env}，可选环境：{list(ENVIRONMENTS.keys())}")
         # 获取环境配置并覆盖baseurl
         env_config = ENVIRONMENTS[env]
-        cache.set("baseurl", env_config["baseurl"])
+        # 写入用例级变量池，优先于文件config中的baseurl
+        cache.set("baseurl", env_config["baseurl"], scope=CASE)
         self._init_clients(env_config)
-        try:
+        # 从全局连接池获取会话
+        self.request = http_pool.get(self.session_scope, str(self.fspath))
+
+    def auth_key(self):
+        """登录凭证缓存的(环境, 账号)，用例未配置auth_cache或未开启缓存时为None"""
+        spec = self.spec.get('auth_cache')
+        if not spec or not auth_cache.enabled:
+            return None
+        account = compile_template(spec.get('account', '')).render() if isinstance(spec, dict) else ''
+        return self.config.getoption("--env"), account
+
+    def restore_auth(self):
+        """命中登录凭证缓存时恢复提取的变量和Cookie，返回缓存的凭证"""
+        if (key := self.auth_key()) is None or (entry := auth_cache.get(*key)) is None:
+            return None
+        for k, v in entry["values"].items():
+            cache.set(k, v, scope=SESSION)
+        self.request.cookies.update(entry["cookies"])
+        auth_cache.track(*key, self.relogin)
+        expires = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["expires_at"]))
+        logger.info("使用缓存的登录凭证 %s@%s，有效期至 %s，跳过登录请求", key[1], key[0], expires)
+        report.attach(json.dumps({"account": key[1], "env": key[0], "expires_at": expires,
+                                  "variables": list(entry["values"])}, ensure_ascii=False, indent=2),
+                      name="使用缓存的登录凭证", attachment_type=allure.attachment_type.JSON)
+        return entry
+
+    def save_auth(self, response: ParsedResponse, extract: t.List):
+        """登录成功且提取到全部变量时保存凭证"""
+        if (key := self.auth_key()) is None:
+            return
+        if not response.ok:
+            # 登录被拒绝时，其他进程保存的该账号凭证也不再使用
+            if response.status_code in REJECTED_STATUS:
+                auth_cache.invalidate(*key)
+            return
+        values = {k: cache.get(k) for k, _ in extract_rules(extract or ())}
+        if not values or any(v is None for v in values.values()):
+            logger.warning(f"登录用例未提取到全部变量，不缓存凭证：{values}")
+            return
+        spec = self.spec['auth_cache'] if isinstance(self.spec['auth_cache'], dict) else {}
+        jwt = cache.get(spec['jwt']) if spec.get('jwt') else None
+        expires_at = auth_cache.put(*key, values, dict(response.cookies), ttl=spec.get('ttl'), jwt=jwt)
+        logger.info("已缓存登录凭证 %s@%s，有效期至 %s", key[1], key[0],
+                    lazy(time.strftime, '%Y-%m-%d %H:%M:%S', time.localtime(expires_at)))
+
+    def refresh_auth(self, response: ParsedResponse, validate: t.Optional[t.Dict] = None):
+        """请求被拒绝（401/403）且本次执行使用了缓存的凭证时，删除这些凭证并重新登录。
+        返回重新登录得到的Cookie，不需要重发请求时返回None；登录用例本身、
+        以及渲染后的Validate预期该响应码的用例（未授权的反向用例）不重新登录。
+        """
+        if response.status_code not in REJECTED_STATUS or self.spec.get('auth_cache'):
+            return None
+        expected = (validate or {}).get('expectcode')
+        if expected is not None and str(expected).strip() == str(response.status_code):
+            return None
+        return auth_cache.refresh()
+
+    def relogin(self):
+        """缓存的凭证被拒绝后重新执行登录请求（不使用凭证缓存），返回登录响应设置的Cookie"""
+        from config.environments import ENVIRONMENTS
+        with cache.activate(self.case_store()):
+            cache.set("baseurl", ENVIRONMENTS[self.config.getoption("--env")]["baseurl"], scope=CASE)
+            request = http_pool.get(self.session_scope, str(self.fspath))
+            try:
+                r, processed_kwargs = request.send_request(self.template, **self.spec)
+                self.response_handle(r, processed_kwargs.get('Validate'), processed_kwargs.get('Extract'))
+                self.save_auth(r, processed_kwargs.get('Extract'))
+            finally:
+                http_pool.release(request)
+        logger.info("重新登录完成：%s", self.nodeid)
+        return dict(r.cookies)
+
+    @property
+    def db_isolation(self):
+        """数据库隔离方式：用例中的db_isolation优先于命令行--db-isolation"""
+        return self.spec.get('db_isolation') or self.config.getoption("--db-isolation")
+
+    def exec_setup(self):
+        """前置数据库/Redis操作
+        rollback隔离模式下先开启事务，setup_db的写操作在用例结束时回滚。
+        """
+        if self.db_client and self.db_isolation == "rollback":
+            self.db_client.begin()
+        with timing.phase("setup_db"):
             self._exec_db_operations("setup_db")
+        with timing.phase("setup_redis"):
             self._exec_redis_operations("setup_redis")
-            # 发送请求
-            r, processed_kwargs = self.request.send_request(** self.spec)
-            # 处理响应
-            self.response_handle(r, processed_kwargs.get('Validate'), processed_kwargs.get('Extract'))
-            self._exec_db_operations("teardown_db")
+
+    def exec_teardown(self):
+        """后置数据库/Redis操作，rollback隔离模式下由回滚代替teardown_db"""
+        with timing.phase("teardown_db"):
+            if self.db_client and self.db_client.isolated:
+                logger.info("事务隔离模式，跳过teardown_db，用例结束时回滚")
+            else:
+                self._exec_db_operations("teardown_db")
+        with timing.phase("teardown_redis"):
             self._exec_redis_operations("teardown_redis")
-        finally:
-            self._close_clients()
+
+    def cleanup(self):
+        """归还HTTP会话并关闭客户端"""
+        if self.request is not None:
+            http_pool.release(self.request)
+            self.request = None
+        self._close_clients()
 
     def _init_clients(self, env_config):
         if "db" in env_config:
-            self.db_client = DatabaseClient(lambda: env_config["db"])
+            # 从会话级连接池按需取连接，用例未执行SQL时不会建立连接
+            self.db_client = DatabaseClient(lambda: env_config["db"], pool=db_pool.get(env_config["db"]))
             logger.info("数据库客户端初始化成功")
 
         if "redis" in env_config:
-            self.redis_client = RedisClient(env_config["redis"])
+            self.redis_client = RedisClient(env_config["redis"], pool=redis_pool.get(env_config["redis"]))
             logger.info("Redis客户端初始化成功")
 
         else:
@@ -184,34 +551,76 @@ class YamlTest(pytest.Item):
             return
 
         sql_list = [operation_sql] if isinstance(operation_sql, str) else operation_sql
+        extract_config = self.spec.get("extract_db")
 
-        for sql in sql_list:
-            processed_sql = sub_sql_var(cache.data, sql)
-            logger.info(f"执行{operation_type} SQL: {processed_sql}")
+        for i, sql in enumerate(sql_list):
+            if isinstance(sql, dict):
+                self._exec_db_load(operation_type, sql["load"])
+                continue
+            # ${key}编译为绑定参数，有参数时使用连接上缓存的预处理语句执行
+            statement, params = bind_sql(sql)
+            # 最后一条查询的结果用于extract_db
+            if extract_config and i == len(sql_list) - 1 and is_query(statement):
+                self._extract_db_result(operation_type, statement, params, extract_config)
+                continue
+            logger.info("执行%s SQL: %s 参数: %s", operation_type, statement, params)
 
             try:
-                result = self.db_client.execute(processed_sql)
-                logger.debug(f"{operation_type} 执行结果: {result}")
+                result = self.db_client.execute(statement, params or None)
+                logger.debug("%s 执行结果: %s", operation_type, result)
             except Exception as e:
-                logger.error(f"{operation_type} 执行失败 (SQL: {processed_sql}): {str(e)}")
+                logger.error(f"{operation_type} 执行失败 (SQL: {statement} 参数: {params}): {str(e)}")
                 raise
-        self._extract_db_result(result)
 
-    def _extract_db_result(self, db_result):
-        extract_config = self.spec.get("extract_db")
-        if not extract_config or not db_result:
-            return
+    def _exec_db_load(self, operation_type, spec):
+        """从CSV/JSONL文件批量导入数据
+        默认逐行读取文件并分批executemany；method为infile时使用LOAD DATA LOCAL INFILE直接导入CSV文件。
+        """
+        spec = dict(spec)
+        table = spec.pop("table")
+        method = spec.pop("method", "executemany")
+        chunk_size = spec.pop("chunk_size", BULK_CHUNK_SIZE)
+        path = self.path.parent / spec["file"]
+        logger.info("执行%s 批量导入: %s -> %s (%s)", operation_type, path, table, method)
+        try:
+            if method == "infile":
+                options = {k: v for k, v in spec.items() if k != "file"}
+                count = self.db_client.load_infile(table, str(path), **options)
+            else:
+                # 与LOAD DATA一致，\N表示NULL
+                spec.setdefault("null", NULL_MARK)
+                rows = ParameterSource.from_spec(spec, self.path.parent).rows()
+                first = next(rows, None)
+                if first is None:
+                    logger.info("%s 数据文件为空: %s", operation_type, path)
+                    return
+                columns = list(first)
+                values = (tuple(row.get(c) for c in columns) for row in itertools.chain([first], rows))
+                count = self.db_client.bulk_insert(table, columns, values, chunk_size)
+        except Exception as e:
+            logger.error(f"{operation_type} 批量导入失败 ({path} -> {table}): {str(e)}")
+            raise
+        logger.info("%s 批量导入完成: %s %s 行", operation_type, table, count)
 
-        for item in extract_config:
-            for cache_key, extract_rule in item.items():
-                # 支持提取全部结果或指定字段（如"id"取所有id字段，""取全部）
-                if extract_rule == "":
-                    cache.set(cache_key, db_result)
-                else:
-                    # 提取指定字段（适用于字典列表结果）
-                    extracted = [row.get(extract_rule) for row in db_result if row.get(extract_rule)]
-                    cache.set(cache_key, extracted)
-        logger.debug(f"数据库提取后缓存: {cache.data}")
+    def _extract_db_result(self, operation_type, statement, params, extract_config):
+        """流式执行查询并按extract_db规则提取，只保存规则引用的数据"""
+        rules = parse_rules(extract_config)
+        query = pushdown(statement, rules)
+        logger.info("执行%s SQL: %s 参数: %s", operation_type, query, params)
+        try:
+            with closing(self.db_client.stream(query, params)) as rows:
+                first = next(rows, None)
+                # 与原有行为一致：查询没有结果时不更新变量；有结果但字段为空时仍写入空值
+                if first is None:
+                    logger.info("%s 查询无结果，未提取变量", operation_type)
+                    return
+                extracted = extract_rows(itertools.chain([first], rows), rules)
+        except Exception as e:
+            logger.error(f"{operation_type} 执行失败 (SQL: {query} 参数: {params}): {str(e)}")
+            raise
+        for cache_key, value in extracted.items():
+            cache.set(cache_key, value, scope=SESSION)
+            logger.debug("数据库提取 %s: %s 条", cache_key, len(value) if isinstance(value, list) else 1)
 
     def _exec_redis_operations(self, operation_type):
         if not self.redis_client:
@@ -221,17 +630,26 @@ class YamlTest(pytest.Item):
         if not operation_cmd:
             return
 
-        cmd = sub_redis_var(cache.data, operation_cmd)
-        cmd_parts = cmd.split()  # 拆分命令（如"HGET user:123 balance"拆分为列表）
-        if not cmd_parts:
+        # 支持单条命令或命令列表；先拆分再逐个参数替换变量，含空格的值仍是一个参数
+        cmd_list = [operation_cmd] if isinstance(operation_cmd, str) else operation_cmd
+        commands = []
+        for cmd in cmd_list:
+            cmd_parts = [sub_redis_var(cache.data, part) if "${" in part else part
+                         for part in parse_command(cmd)]
+            if cmd_parts:
+                commands.append(cmd_parts)
+        if not commands:
             logger.warning("Redis命令为空，跳过执行")
             return
-        logger.info(f"执行{operation_type} Redis命令: {cmd}")
+        logger.info("执行%s Redis命令: %s", operation_type, commands)
 
-        # 执行Redis命令并处理结果
+        # 执行Redis命令并处理结果，多条命令通过管道一次往返执行
         try:
-            result = self.redis_client.execute_command(*cmd_parts)
-            logger.debug(f"{operation_type} 执行结果: {result}")
+            if isinstance(operation_cmd, str):
+                result = self.redis_client.execute_command(*commands[0])
+            else:
+                result = self.redis_client.execute_pipeline(commands, transaction=bool(redis_spec.get("transaction")))
+            logger.debug("%s 执行结果: %s", operation_type, result)
         except Exception as e:
             logger.error(f"{operation_type} 执行失败: {str(e)}")
             raise
@@ -247,27 +665,44 @@ class YamlTest(pytest.Item):
 
         for item in extract_config:
             for cache_key, extract_rule in item.items():
-                cache.set(cache_key, redis_result)
-        logger.debug(f"Redis提取后缓存: {cache.data}")
+                # 结果为列表且规则为整数下标时提取单条命令的结果（支持负数），其他规则与原来一样取全部结果
+                try:
+                    index = int(extract_rule) if isinstance(redis_result, list) else None
+                except (TypeError, ValueError):
+                    index = None
+                if index is None:
+                    cache.set(cache_key, redis_result, scope=SESSION)
+                elif -len(redis_result) <= index < len(redis_result):
+                    cache.set(cache_key, redis_result[index], scope=SESSION)
+                else:
+                    raise IndexError(f"Redis结果提取失败 {cache_key}: 下标{extract_rule}超出结果范围（共{len(redis_result)}条）")
+        logger.debug("Redis提取后缓存: %s", cache.data)
 
     def _close_clients(self):
         if self.db_client:
-            self.db_client.close()
-            logger.info("数据库连接已关闭")
+            try:
+                self.db_client.rollback()
+            finally:
+                self.db_client.close()
+            logger.info("数据库连接已归还")
         if self.redis_client:
             self.redis_client.close()
             logger.info("Redis连接已关闭")
+        self.db_client = None
+        self.redis_client = None
 
-    def response_handle(self, r: Response, validate: t.Dict, extract: t.List):
+    def response_handle(self, r: ParsedResponse, validate: t.Dict, extract: t.List):
         """Handling of responses
         处理响应，包括校验和提取结果。
         """
-        # 如果有校验信息，则进行校验
-        if validate:
-            check_results(r, validate)
+        # 如果有校验信息，则进行校验（含变量的预期值取自与请求一起渲染的Validate块）
+        if self.validator is not None:
+            with timing.phase("validation"):
+                self.validator.check(r, validate)
         # 如果有提取信息，则进行提取
         if extract:
-            get_result(r, extract)
+            with timing.phase("extraction"):
+                get_result(r, extract)
         # logger.debug(f"提取变量后缓存内容: {cache}")
 
     def repr_failure(self, excinfo):
@@ -14,6 +14,7 @@ def main():
         # "cp environment.properties allure-results",  # 复制环境配置文件到Allure结果目录
         "allure generate allure-results -c -o allure-report --lang zh ",  # 生成Allure报告
         # "allure open allure-report"  # 打开Allure报告（注释掉，可根据需要启用）
+        # "python -m common.load tests/Qspace/02环境/05环境管理/test_37_1_环境_环境管理_创建环境.yaml --env Qspace --users 20 --duration 60 --json load-report.json",  # 复用用例压测
     )
     for cmd in cmd_all:
         subprocess.run(cmd, shell=True)
@@ -0,0 +1,119 @@
+"""异步引擎：与同步执行发送相同的请求并得到相同的结果"""
+import re
+from urllib.parse import urlencode
+import pytest
+import requests
+
+aiohttp = pytest.importorskip("aiohttp")
+
+from common.async_engine import _query_params, _request_kwargs  # noqa: E402
+
+PARITY_SUITE = """
+config:
+  session: file
+variable:
+  ids: [1, 2]
+tests:
+  test_login:
+    method: post
+    route: /api/login
+    Validate:
+      expectcode: 200
+    Extract:
+      - data.token
+  test_params_and_cookie:
+    method: get
+    route: /api/echo
+    RequestData:
+      params:
+        ids: ${ids}
+        name: 张三
+        flag: true
+        skipped: null
+      headers:
+        Authorization: Bearer ${data.token}
+    Validate:
+      expectcode: 200
+      jsonpath_check:
+        $.query: {ids: ["1", "2"], name: ["张三"], flag: ["True"]}
+      contains:
+        $.cookie: sessionid=s
+        $.headers.Authorization: Bearer tok-
+  test_json_body:
+    method: post
+    route: /api/echo
+    RequestData:
+      json: {ids: "${ids}", nested: {a: [1, {b: null}]}}
+    Validate:
+      jsonpath_check:
+        $.data: {ids: [1, 2], nested: {a: [1, {b: null}]}}
+"""
+
+
+@pytest.mark.parametrize("params", [
+    {"ids": [1, 2], "name": "张三", "none": None, "flag": True, "n": 0},
+    {"ids": (3, None, 4), "empty": []},
+    [("k", "v"), ("k", "w")],
+    "raw=1&raw=2",
+])
+def test_query_params_match_requests(params):
+    expected = requests.Request("GET", "http://h/", params=params).prepare().url.partition("?")[2]
+    encoded = _query_params(params)
+    assert (encoded if isinstance(encoded, str) else urlencode(encoded)) == expected
+
+
+def test_request_kwargs():
+    kwargs = _request_kwargs({"params": {"a": [1, 2]}, "headers": {"X": 1, "Y": None}, "json": {"a": 1},
+                              "timeout": 5, "verify": False})
+    assert kwargs["params"] == [("a", "1"), ("a", "2")]
+    assert kwargs["headers"] == {"X": "1"}
+    assert kwargs["json"] == {"a": 1}
+    assert kwargs["timeout"].total == 5.0
+    assert kwargs["ssl"] is False
+
+
+def _normalized(requests_seen):
+    """登录签发的sessionid每次不同，只比较Cookie的名称"""
+    return [(method, path, re.sub(r"=\w+", "=*", cookie) if cookie else cookie)
+            for method, path, cookie in requests_seen]
+
+
+def test_sync_async_parity(run_yaml, stub_server):
+    results, seen = {}, {}
+    for engine in ("sync", "async"):
+        start = len(stub_server.requests)
+        results[engine] = run_yaml(PARITY_SUITE, "--engine", engine)
+        seen[engine] = _normalized(stub_server.requests[start:])
+    for result in results.values():
+        result.assert_outcomes(passed=3)
+    assert seen["sync"] == seen["async"]
+    assert seen["sync"][1][2] == "sessionid=*"
+
+
+OUTCOME_PLUGIN = """
+import pytest
+import conftest
+
+_exec_setup = conftest.YamlTest.exec_setup
+
+
+def exec_setup(self):
+    if self.name.startswith("test_fail"):
+        pytest.fail("boom")
+    if self.name.startswith("test_skip"):
+        pytest.skip("skipped")
+    _exec_setup(self)
+
+
+conftest.YamlTest.exec_setup = exec_setup
+"""
+
+
+def test_fail_and_skip_do_not_stop_the_engine(run_yaml, tmp_path):
+    (tmp_path / "outcome_plugin.py").write_text(OUTCOME_PLUGIN, encoding="utf-8")
+    case = "    method: get\n    route: /api/echo\n"
+    content = "tests:\n" + "".join(f"  {name}:\n{case}" for name in ("test_fail", "test_skip", "test_ok"))
+    result = run_yaml(content, "--engine", "async", "-p", "outcome_plugin")
+    result.assert_outcomes(passed=1, failed=1)
+    assert result.outcomes.get("skipped") == 1
+    assert "异步引擎已停止" not in result.output
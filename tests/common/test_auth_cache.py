@@ -0,0 +1,200 @@
+"""登录凭证缓存：有效期取ttl与JWT exp的较早者，多进程写入不丢失，凭证被拒绝时重新登录"""
+import ast
+import base64
+import multiprocessing
+import threading
+import time
+import pytest
+from common.auth_cache import AuthCache, jwt_expiry
+from common.json import json
+
+
+def make_jwt(exp):
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).decode().rstrip("=")
+    return f"eyJhbGciOiJIUzI1NiJ9.{payload}.sig"
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = AuthCache()
+    store.configure(tmp_path / "credentials.json", skew=60)
+    return store
+
+
+def test_jwt_expiry():
+    assert jwt_expiry(make_jwt(1700000000)) == 1700000000.0
+    assert jwt_expiry("tok-1") is None
+    assert jwt_expiry("a.!!!.c") is None
+    assert jwt_expiry(None) is None
+
+
+def test_expiry_is_earlier_of_ttl_and_jwt(store):
+    now = time.time()
+    assert store.put("stub", "a", {"token": "t"}, {}, ttl=3600, jwt=make_jwt(int(now) + 600)) == pytest.approx(now + 600, abs=2)
+    assert store.put("stub", "b", {"token": "t"}, {}, ttl=600, jwt=make_jwt(int(now) + 3600)) == pytest.approx(now + 600, abs=2)
+    assert store.put("stub", "c", {"token": "t"}, {}) == pytest.approx(now + 1800, abs=2)
+    assert store.get("stub", "a")["values"] == {"token": "t"}
+    assert store.stats["hits"] == 1
+
+
+def test_expiring_within_skew_is_a_miss(store):
+    store.put("stub", "a", {"token": "t"}, {}, ttl=30)
+    store.put("stub", "b", {"token": "t"}, {}, jwt=make_jwt(int(time.time()) - 10))
+    assert store.get("stub", "a") is None and store.get("stub", "b") is None
+    assert store.stats["misses"] == 2
+    # 写入时清理已过期的凭证
+    store.put("stub", "c", {"token": "t"}, {}, ttl=600)
+    assert set(json.loads(store.path.read_text())) == {"stub:a", "stub:c"}
+
+
+def test_invalidate_and_disabled(store):
+    store.put("stub", "a", {"token": "t"}, {"sessionid": "s"}, ttl=600)
+    store.invalidate("stub", "a")
+    assert store.get("stub", "a") is None
+    disabled = AuthCache()
+    assert not disabled.enabled and disabled.get("stub", "a") is None
+    disabled.invalidate("stub", "a")
+
+
+def _put_many(path, worker):
+    store = AuthCache()
+    store.configure(path)
+    for i in range(20):
+        store.put("stub", f"{worker}-{i}", {"token": f"t{i}"}, {}, ttl=600)
+
+
+def test_concurrent_processes_keep_all_entries(tmp_path):
+    pytest.importorskip("fcntl")
+    path = tmp_path / "credentials.json"
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_put_many, args=(path, worker)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert len(json.loads(path.read_text())) == 80
+
+
+def test_refresh_relogins_restored_credentials_once(store):
+    store.put("stub", "a", {"token": "old"}, {}, ttl=600)
+    logins = []
+
+    def relogin():
+        logins.append(1)
+        time.sleep(0.2)
+        return {"sessionid": "new"}
+    assert store.refresh() is None
+    store.track("stub", "a", relogin)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.refresh())) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 同时被拒绝的请求只重新登录一次，都使用新的Cookie重发
+    assert len(logins) == 1 and results == [{"sessionid": "new"}] * 3
+    assert store.get("stub", "a") is None and store.stats["refreshed"] == 1
+    assert store.refresh() is None
+
+
+LOGIN_THEN_ME = """
+tests:
+  test_login:
+    method: post
+    route: /api/login
+    auth_cache:
+      account: admin
+      ttl: 600
+    Extract:
+      - token: $.data.token
+    Validate:
+      expectcode: 200
+  test_me:
+    method: get
+    route: /api/me
+    RequestData:
+      headers: {Authorization: "Bearer ${token}"}
+    Validate:
+      expectcode: 200
+"""
+
+
+@pytest.mark.parametrize("engine", ["sync", "async"])
+def test_revoked_credentials_relogin(engine, run_yaml, stub_server, tmp_path):
+    if engine == "async":
+        pytest.importorskip("aiohttp")
+    import requests
+    args = ("--auth-cache", str(tmp_path / "credentials.json"), "--engine", engine)
+
+    def logins():
+        return sum(path == "/api/login" for _, path, _ in stub_server.requests)
+    before = logins()
+    run_yaml(LOGIN_THEN_ME, *args).assert_outcomes(passed=2)
+    run_yaml(LOGIN_THEN_ME, *args).assert_outcomes(passed=2)
+    assert logins() == before + 1
+    # 服务端注销后，使用缓存凭证的请求收到401，重新登录后重发
+    requests.get(f"{stub_server.url}/api/revoke")
+    run_yaml(LOGIN_THEN_ME, *args).assert_outcomes(passed=2)
+    assert logins() == before + 2
+    run_yaml(LOGIN_THEN_ME, *args).assert_outcomes(passed=2)
+    assert logins() == before + 2
+
+
+STATS_PLUGIN = """
+from common.auth_cache import auth_cache
+
+
+def pytest_sessionfinish(session):
+    session.config.pluginmanager.get_plugin("terminalreporter").write_line(f"AUTH_STATS {auth_cache.stats}")
+"""
+
+
+def auth_stats(result):
+    return ast.literal_eval(result.output.split("AUTH_STATS ", 1)[1].splitlines()[0])
+
+
+LOGIN_THEN_UNAUTHORIZED = LOGIN_THEN_ME.replace("""    RequestData:
+      headers: {Authorization: "Bearer ${token}"}
+    Validate:
+      expectcode: 200
+""", """    Validate:
+      expectcode: 401
+""")
+
+
+def test_expected_unauthorized_keeps_cached_credentials(run_yaml, stub_server, tmp_path):
+    (tmp_path / "auth_stats.py").write_text(STATS_PLUGIN, encoding="utf-8")
+    args = ("--auth-cache", str(tmp_path / "credentials.json"), "-p", "auth_stats")
+    run_yaml(LOGIN_THEN_UNAUTHORIZED, *args).assert_outcomes(passed=2)
+    logins = len(stub_server.requests)
+    # 预期401的反向用例不删除缓存的凭证，也不重新登录
+    result = run_yaml(LOGIN_THEN_UNAUTHORIZED, *args)
+    result.assert_outcomes(passed=2)
+    assert auth_stats(result)["hits"] == 1 and auth_stats(result)["refreshed"] == 0
+    assert not any(path == "/api/login" for _, path, _ in stub_server.requests[logins:])
+
+
+COOKIE_ME = """
+tests:
+  test_me:
+    method: get
+    route: /api/me
+    Validate:
+      expectcode: 200
+"""
+
+
+@pytest.mark.parametrize("engine", ["sync", "async"])
+def test_relogin_cookies_applied_to_rejected_session(engine, run_yaml, tmp_path):
+    if engine == "async":
+        pytest.importorskip("aiohttp")
+    # 缓存中是已失效的凭证；登录用例与被拒绝的用例在不同文件中，不共享会话
+    store = AuthCache()
+    store.configure(tmp_path / "credentials.json")
+    store.put("stub", "admin", {"token": "tok-stale"}, {"sessionid": "s0"}, ttl=600)
+    (tmp_path / "test_me.yaml").write_text(COOKIE_ME, encoding="utf-8")
+    (tmp_path / "auth_stats.py").write_text(STATS_PLUGIN, encoding="utf-8")
+    result = run_yaml(LOGIN_THEN_ME.split("  test_me:")[0], "test_me.yaml", "--engine", engine,
+                      "--auth-cache", str(tmp_path / "credentials.json"), "-p", "auth_stats", name="test_login.yaml")
+    result.assert_outcomes(passed=2)
+    assert auth_stats(result)["refreshed"] == 1
@@ -0,0 +1,78 @@
+"""变量池：分作用域查找、fork共享外层、snapshot写时复制、按上下文切换"""
+import threading
+import pytest
+from common.cache import CASE, FILE, PARAM, SESSION, CachePool, VariableStore, cache
+
+
+def test_scoped_lookup_inner_first():
+    session = VariableStore()
+    session.set("env", "test")
+    session.set("token", "s")
+    file = session.fork(FILE, {"token": "f"})
+    case = file.fork(PARAM, {"page": 1}).fork(CASE)
+    assert case.scopes == [CASE, PARAM, FILE, SESSION]
+    assert (case["token"], case["env"], case["page"]) == ("f", "test", 1)
+    case.set("token", "c")
+    assert case.get("token") == "c" and file.get("token") == "f"
+    assert dict(case.data) == {"env": "test", "token": "c", "page": 1}
+    assert "page" in case and "page" not in file and len(case) == 3
+    with pytest.raises(KeyError):
+        case["missing"]
+    with pytest.raises(KeyError, match="没有作用域"):
+        file.set("x", 1, scope=CASE)
+
+
+def test_fork_shares_outer_layers():
+    session = VariableStore()
+    first, second = session.fork(CASE), session.fork(CASE)
+    # 提取的变量写入会话级，其他分支和会话本身都可见
+    first.set("token", "t1", scope=SESSION)
+    first.set("local", 1)
+    assert second.get("token") == session.get("token") == "t1"
+    assert second.get("local") is None
+
+
+def test_snapshot_copy_on_write():
+    session = VariableStore()
+    session.set("token", "t1")
+    file = session.fork(FILE, {"a": 1})
+    snap = file.snapshot()
+    file.set("token", "t2", scope=SESSION)
+    file.set("a", 2)
+    assert (snap["token"], snap["a"]) == ("t1", 1)
+    snap.set("token", "t3", scope=SESSION)
+    assert session["token"] == "t2"
+    # 快照之后的写入复制一次数据，不再影响快照
+    session.set("other", 1)
+    assert "other" not in snap
+
+
+def test_update_delete_setdefault():
+    store = VariableStore().fork(CASE)
+    store.update({"a": 1, "b": 2})
+    store.delete("a")
+    store.delete("missing")
+    assert store.setdefault("b", 3) == 2
+    assert store.setdefault("c", 3, scope=SESSION) == 3
+    assert dict(store.data) == {"b": 2, "c": 3}
+
+
+def test_cache_pool_proxies_current_context():
+    assert CachePool() is cache
+    store = cache.session.fork(CASE)
+    results = {}
+
+    def worker(name):
+        with cache.activate(cache.session.fork(CASE)):
+            cache.set("name", name)
+            results[name] = cache.get("name")
+    with cache.activate(store):
+        cache.set("name", "main")
+        threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert cache.get("name") == "main" and cache.store is store
+    assert results == {f"w{i}": f"w{i}" for i in range(4)}
+    assert cache.store is cache.session and "name" not in cache
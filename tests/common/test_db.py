@@ -0,0 +1,285 @@
+"""数据库连接池：使用假连接验证复用、健康检查、等待和归还时的回滚"""
+import threading
+import time
+import pytest
+import common.db as db
+from common.db import ConnectionPool, DatabaseClient, DatabasePoolManager
+
+DB_CONFIG = {"host": "127.0.0.1", "port": 3306, "user": "root", "password": "", "database": "test",
+             "charset": "utf8mb4"}
+
+
+class FakeCursor:
+    def __init__(self, conn, **options):
+        self.conn = conn
+        self.options = options
+        self.rowcount = 0
+        self.closed = False
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        self.conn.executed.append((sql, params))
+        self.rowcount = 1
+        self._rows = list(self.conn.rows)
+
+    def executemany(self, sql, rows):
+        rows = list(rows)
+        if self.conn.error is not None and len(self.conn.executed) >= self.conn.fail_after:
+            raise self.conn.error
+        self.conn.executed.append((sql, rows))
+        self.rowcount = len(rows)
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    """记录执行的语句和事务状态的假连接"""
+    def __init__(self):
+        self.executed = []
+        self.rows = []
+        self.in_transaction = False
+        self.connected = True
+        self.commits = 0
+        self.rollbacks = 0
+        self.cursors = []
+        # 执行fail_after条语句后executemany抛出的异常
+        self.error = None
+        self.fail_after = 0
+
+    def cursor(self, **options):
+        cursor = FakeCursor(self, **options)
+        self.cursors.append(cursor)
+        return cursor
+
+    def start_transaction(self):
+        self.in_transaction = True
+
+    def commit(self):
+        self.commits += 1
+        self.in_transaction = False
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def is_connected(self):
+        return self.connected
+
+    def close(self):
+        self.connected = False
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    """替换建立连接的函数，返回已建立的假连接列表"""
+    created = []
+
+    def connect(db_config):
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+    monkeypatch.setattr(db, "_connect", connect)
+    return created
+
+
+def test_pool_reuses_released_connection(connections):
+    pool = ConnectionPool(DB_CONFIG, max_size=2)
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    assert len(connections) == 1
+    assert pool.stats == {"created": 1, "reused": 1, "checkouts": 2, "health_failures": 0, "waits": 0}
+
+
+def test_pool_rolls_back_open_transaction_on_release(connections):
+    pool = ConnectionPool(DB_CONFIG)
+    conn = pool.acquire()
+    conn.start_transaction()
+    pool.release(conn)
+    assert conn.rollbacks == 1 and not conn.in_transaction
+
+
+def test_pool_discards_unhealthy_idle_connection(connections):
+    pool = ConnectionPool(DB_CONFIG, health_check_interval=0)
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.connected = False
+    fresh = pool.acquire()
+    assert fresh is not conn and len(connections) == 2
+    assert pool.stats["health_failures"] == 1
+    assert pool._size == 1
+
+
+def test_pool_waits_for_release_when_full(connections):
+    pool = ConnectionPool(DB_CONFIG, max_size=1)
+    conn = pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.05)
+    threading.Timer(0.05, pool.release, (conn,)).start()
+    assert pool.acquire(timeout=2) is conn
+    assert pool.stats["waits"] == 2
+    assert len(connections) == 1
+
+
+def test_pool_frees_slot_when_connect_fails(monkeypatch):
+    def connect(db_config):
+        raise ConnectionError("refused")
+    monkeypatch.setattr(db, "_connect", connect)
+    pool = ConnectionPool(DB_CONFIG, max_size=1)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            pool.acquire(timeout=0.05)
+    assert pool._size == 0
+
+
+def test_pool_close_closes_idle_connections(connections):
+    pool = ConnectionPool(DB_CONFIG)
+    conns = [pool.acquire() for _ in range(3)]
+    for conn in conns:
+        pool.release(conn)
+    pool.close()
+    assert not any(conn.connected for conn in conns)
+    assert pool._size == 0
+
+
+def test_manager_shares_pool_per_config(connections):
+    manager = DatabasePoolManager()
+    manager.configure(max_size=3, health_check_interval=5)
+    pool = manager.get(dict(DB_CONFIG))
+    assert manager.get(dict(DB_CONFIG)) is pool
+    assert manager.get({**DB_CONFIG, "database": "other"}) is not pool
+    assert (pool.max_size, pool.health_check_interval) == (3, 5)
+    pool.release(pool.acquire())
+    assert manager.stats() == {"127.0.0.1:3306/test": pool.stats}
+    manager.close()
+    assert not connections[0].connected
+
+
+def test_client_checks_out_lazily_and_returns_on_close(connections):
+    pool = ConnectionPool(DB_CONFIG)
+    client = DatabaseClient(lambda: DB_CONFIG, pool=pool)
+    assert client.connection is None and not connections
+    client.execute("SELECT 1")
+    conn = connections[0]
+    conn.rows = [{"id": 1}]
+    assert client.execute("SELECT id FROM t") == [{"id": 1}]
+    assert client.execute("DELETE FROM t") == 1
+    assert conn.commits == 1
+    client.close()
+    assert client.connection is None and conn.connected
+    assert pool._idle[0][0] is conn
+
+
+def test_client_without_pool_closes_connection(connections):
+    client = DatabaseClient(lambda: DB_CONFIG)
+    conn = connections[0]
+    client.close()
+    assert not conn.connected
+
+
+def test_idle_connection_checked_after_interval(connections):
+    pool = ConnectionPool(DB_CONFIG, health_check_interval=60)
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.connected = False
+    # 未超过健康检查间隔时直接复用，不做检查
+    assert pool.acquire() is conn
+    pool.release(conn)
+    pool._idle[0] = (conn, time.monotonic() - 61)
+    assert pool.acquire() is not conn
+
+
+def test_isolated_writes_rolled_back(connections):
+    pool = ConnectionPool(DB_CONFIG)
+    client = DatabaseClient(lambda: DB_CONFIG, pool=pool)
+    client.begin()
+    # 没有执行SQL时不取出连接
+    assert not connections
+    assert client.execute("INSERT INTO t VALUES (1)") == 1
+    conn = connections[0]
+    assert conn.in_transaction and conn.commits == 0
+    client.rollback()
+    assert conn.rollbacks == 1 and not client.isolated
+    # 回滚后恢复自动提交
+    client.execute("DELETE FROM t")
+    assert conn.commits == 1
+
+
+def test_isolation_uses_savepoint_inside_open_transaction(connections):
+    client = DatabaseClient(lambda: DB_CONFIG, pool=ConnectionPool(DB_CONFIG))
+    client.execute("SELECT 1")
+    conn = connections[0]
+    conn.in_transaction = True
+    client.begin()
+    client.execute("UPDATE t SET a = 1")
+    client.rollback()
+    statements = [sql for sql, _ in conn.executed]
+    assert statements[1:] == ["SAVEPOINT apitest_case", "UPDATE t SET a = 1",
+                              "ROLLBACK TO SAVEPOINT apitest_case", "RELEASE SAVEPOINT apitest_case"]
+    # 外层事务保持不变
+    assert conn.rollbacks == 0 and conn.in_transaction
+
+
+def test_rollback_without_statements(connections):
+    client = DatabaseClient(lambda: DB_CONFIG, pool=ConnectionPool(DB_CONFIG))
+    client.rollback()
+    client.begin()
+    client.rollback()
+    client.close()
+    assert not connections
+
+
+def test_quote_name():
+    assert db.quote_name("user") == "`user`"
+    assert db.quote_name("app.user") == "`app`.`user`"
+    assert db.quote_name("we`ird") == "`we``ird`"
+
+
+def test_bulk_insert_chunks_in_one_transaction(connections):
+    client = DatabaseClient(lambda: DB_CONFIG, pool=ConnectionPool(DB_CONFIG))
+    rows = ((i, f"user{i}") for i in range(2500))
+    assert client.bulk_insert("app.user", ["id", "name"], rows, chunk_size=1000) == 2500
+    conn = connections[0]
+    assert [len(chunk) for _, chunk in conn.executed] == [1000, 1000, 500]
+    assert conn.executed[0][0] == "INSERT INTO `app`.`user` (`id`, `name`) VALUES (%s, %s)"
+    assert conn.commits == 1 and not conn.in_transaction
+
+
+def test_bulk_insert_rolls_back_on_failure(connections):
+    mysql = pytest.importorskip("mysql.connector")
+    client = DatabaseClient(lambda: DB_CONFIG, pool=ConnectionPool(DB_CONFIG))
+    client.execute("SELECT 1")
+    conn = connections[0]
+    conn.error, conn.fail_after = mysql.Error("Duplicate entry"), 2
+    with pytest.raises(mysql.Error):
+        client.bulk_insert("user", ["id"], ([i] for i in range(50)), chunk_size=10)
+    assert conn.rollbacks == 1 and conn.commits == 0
+
+
+def test_bulk_insert_isolated_not_committed(connections):
+    client = DatabaseClient(lambda: DB_CONFIG, pool=ConnectionPool(DB_CONFIG))
+    client.begin()
+    assert client.bulk_insert("user", ["id"], [[1], [2]]) == 2
+    conn = connections[0]
+    assert conn.commits == 0 and conn.in_transaction
+    client.rollback()
+    assert conn.rollbacks == 1
+
+
+def test_load_infile(connections):
+    client = DatabaseClient(lambda: DB_CONFIG, pool=ConnectionPool(DB_CONFIG))
+    client.load_infile("user", "/data/users.csv", columns=["id", "name"])
+    sql, params = connections[0].executed[-1]
+    assert sql == ("LOAD DATA LOCAL INFILE %s INTO TABLE `user` CHARACTER SET utf8mb4 FIELDS TERMINATED BY %s "
+                   "OPTIONALLY ENCLOSED BY %s LINES TERMINATED BY %s IGNORE 1 LINES (`id`, `name`)")
+    assert params == ("/data/users.csv", ",", '"', "\n")
+    assert connections[0].commits == 1
@@ -0,0 +1,129 @@
+"""数据库结果提取：规则下推到原语句，单次遍历完成全部规则"""
+import sqlite3
+import types
+import pytest
+import conftest
+from common.cache import VariableStore, cache
+from common.db_extract import extract_rows, is_query, parse_rules, pushdown
+
+FIRST_NAME = [{"u": {"column": "username", "first": True}}]
+TEN_ROWS = [{"u": {"columns": ["id", "username"], "limit": 10}}]
+ALL_ROWS = [{"u": ""}]
+
+
+@pytest.mark.parametrize("sql, extract, expected", [
+    # 多表JOIN的SELECT *不改写为子查询（同名列会冲突），只追加LIMIT
+    ("SELECT * FROM t JOIN u ON u.t_id = t.id", FIRST_NAME, "SELECT * FROM t JOIN u ON u.t_id = t.id LIMIT 1"),
+    ("SELECT * FROM t;", TEN_ROWS, "SELECT * FROM t LIMIT 10"),
+    # 单表显式列的查询只保留规则用到的列
+    ("SELECT id, username, status FROM t WHERE status = %s", FIRST_NAME,
+     "SELECT username FROM t WHERE status = %s LIMIT 1"),
+    ("SELECT `id`, `username`, status FROM t AS a ORDER BY status", TEN_ROWS,
+     "SELECT `id`, `username` FROM t AS a ORDER BY status LIMIT 10"),
+    # 规则用到的列不在查询中、按列序号排序、别名或多表查询时不改写列
+    ("SELECT id, status FROM t", FIRST_NAME, "SELECT id, status FROM t LIMIT 1"),
+    ("SELECT id, username, status FROM t ORDER BY 3 DESC", FIRST_NAME,
+     "SELECT id, username, status FROM t ORDER BY 3 DESC LIMIT 1"),
+    ("SELECT id AS username, status FROM t", FIRST_NAME, "SELECT id AS username, status FROM t LIMIT 1"),
+    ("SELECT id, username FROM t JOIN u ON u.t_id = t.id", FIRST_NAME,
+     "SELECT id, username FROM t JOIN u ON u.t_id = t.id LIMIT 1"),
+    ("SELECT DISTINCT username, status FROM t", FIRST_NAME, "SELECT DISTINCT username, status FROM t LIMIT 1"),
+    # 已有LIMIT时收紧，不放宽
+    ("SELECT * FROM t LIMIT 100", FIRST_NAME, "SELECT * FROM t LIMIT 1"),
+    ("SELECT * FROM t LIMIT 5", TEN_ROWS, "SELECT * FROM t LIMIT 5"),
+    ("SELECT * FROM t LIMIT 20, 100", TEN_ROWS, "SELECT * FROM t LIMIT 20, 10"),
+    ("SELECT * FROM t LIMIT 100 OFFSET 20", TEN_ROWS, "SELECT * FROM t LIMIT 10 OFFSET 20"),
+    # 子查询中的LIMIT不影响外层
+    ("SELECT * FROM t WHERE id IN (SELECT t_id FROM u LIMIT 50)", FIRST_NAME,
+     "SELECT * FROM t WHERE id IN (SELECT t_id FROM u LIMIT 50) LIMIT 1"),
+    ("SELECT id FROM t UNION SELECT t_id FROM u", TEN_ROWS, "SELECT id FROM t UNION SELECT t_id FROM u LIMIT 10"),
+    ("WITH x AS (SELECT * FROM t) SELECT * FROM x", FIRST_NAME, "WITH x AS (SELECT * FROM t) SELECT * FROM x LIMIT 1"),
+    # 以注释结尾时换行追加；字面量中的内容不影响判断
+    ("SELECT * FROM t -- 全部用户", FIRST_NAME, "SELECT * FROM t -- 全部用户\nLIMIT 1"),
+    ("SELECT * FROM t WHERE username = 'a LIMIT 5'", FIRST_NAME,
+     "SELECT * FROM t WHERE username = 'a LIMIT 5' LIMIT 1"),
+])
+def test_pushdown(sql, extract, expected):
+    assert pushdown(sql, parse_rules(extract)) == expected
+
+
+@pytest.mark.parametrize("sql, extract", [
+    ("SELECT * FROM t", ALL_ROWS),
+    ("SELECT * FROM t", [{"u": {"column": "id", "sample": 5}}]),
+    ("SELECT * FROM t", [{"u": {"first": True}}, {"v": "username"}]),
+    ("SELECT * FROM t LIMIT %s", FIRST_NAME),
+    ("SELECT * FROM t WHERE id = 1 FOR UPDATE", FIRST_NAME),
+    ("SELECT * FROM t LOCK IN SHARE MODE", FIRST_NAME),
+    ("SELECT id INTO @x FROM t", FIRST_NAME),
+    ("SHOW TABLES", FIRST_NAME),
+    ("UPDATE t SET status = 1", FIRST_NAME),
+])
+def test_pushdown_unchanged(sql, extract):
+    assert pushdown(sql, parse_rules(extract)) == sql
+
+
+def test_pushed_down_statements_are_valid():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript("""
+        CREATE TABLE t (id INTEGER, username TEXT, status INTEGER);
+        CREATE TABLE u (id INTEGER, t_id INTEGER);
+        INSERT INTO t VALUES (1, 'a', 0), (2, 'b', 1), (3, 'c', 1);
+        INSERT INTO u VALUES (10, 1), (11, 2);
+    """)
+    for sql, rule in [("SELECT * FROM t JOIN u ON u.t_id = t.id", FIRST_NAME),
+                      ("SELECT id, username, status FROM t ORDER BY status", FIRST_NAME),
+                      ("SELECT * FROM t LIMIT 1, 100", TEN_ROWS),
+                      ("SELECT * FROM t -- 注释", TEN_ROWS)]:
+        rows = conn.execute(pushdown(sql, parse_rules(rule))).fetchall()
+        assert 0 < len(rows) <= 10
+
+
+def test_extract_rows_single_pass():
+    consumed = []
+
+    def rows():
+        for i in range(100000):
+            consumed.append(i)
+            yield {"id": i, "username": f"user{i}" if i else "", "status": i % 3}
+    rules = parse_rules([{"first_id": {"column": "id", "first": True}},
+                         {"page": {"columns": ["id"], "limit": 3}}])
+    assert extract_rows(rows(), rules) == {"first_id": 0, "page": [{"id": 0}, {"id": 1}, {"id": 2}]}
+    # 所有规则满足后停止读取
+    assert len(consumed) == 4
+
+
+def test_extract_rows_legacy_and_sample():
+    rows = [{"id": i, "username": f"user{i}" if i else ""} for i in range(1000)]
+    rules = parse_rules([{"usernames": "username"}, {"all": ""},
+                         {"some": {"column": "id", "sample": 3, "seed": 1}}])
+    result = extract_rows(rows, rules)
+    # 原有写法：列名取该列全部非空值，""取全部结果
+    assert len(result["usernames"]) == 999 and result["all"] == rows
+    assert len(result["some"]) == 3
+    again = extract_rows(rows, parse_rules([{"some": {"column": "id", "sample": 3, "seed": 1}}]))
+    assert again["some"] == result["some"]
+
+
+def test_is_query():
+    assert is_query("  select 1") and is_query("WITH x AS (SELECT 1) SELECT * FROM x")
+    assert not is_query("DELETE FROM t")
+
+
+def extract_db(store, rows, extract):
+    def stream(query, params):
+        yield from rows
+    case = types.SimpleNamespace(db_client=types.SimpleNamespace(stream=stream))
+    with cache.activate(store):
+        conftest.YamlTest._extract_db_result(case, "setup_db", "SELECT id, username FROM t", (), extract)
+
+
+def test_empty_column_overwrites_previous_value():
+    store = VariableStore()
+    store.update({"name": "old", "names": ["old"]})
+    extract = [{"name": {"column": "username", "first": True}}, {"names": "username"}]
+    # 查询没有结果时保留原值
+    extract_db(store, [], extract)
+    assert (store["name"], store["names"]) == ("old", ["old"])
+    # 有结果但字段为NULL时写入空值，不保留之前用例的值
+    extract_db(store, [{"id": 1, "username": None}], extract)
+    assert (store["name"], store["names"]) == (None, [])
@@ -0,0 +1,62 @@
+"""JSONPath：与jsonpath包的结果一致，点分路径兼容原有写法，相同路径只编译一次"""
+import pytest
+from common.json_path import MISSING, compile_path
+
+DATA = {"code": 0, "msg": None, "data": {"total": 3, "token": "t1", "items": [
+    {"id": 1, "name": "a", "price": 5, "tags": ["x"], "detail": {"sku": "S1"}},
+    {"id": 2, "name": "b", "price": 50, "tags": [], "detail": {"sku": "S2"}, "coupon": True},
+    {"id": 3, "name": "c", "price": 500, "tags": ["x", "y"], "detail": {"sku": "S3"}, "coupon": False},
+]}}
+
+
+@pytest.mark.parametrize("path", [
+    "$.data.total", "$.data.token", "$['data']['token']", "$.msg", "$.missing", "$.data.items[0]",
+    "$.data.items[5]", "$.data.items[0,2].name", "$.data.items[1:3].id",
+    "$.data.items[::2].id", "$.data.items[-2:].id", "$.data.*", "$.data.items[*].detail.sku",
+    "$..sku", "$..id", "$.data.items[?(@.price > 10)].id", "$.data.items[?(@.name == 'b')].price",
+    "$.data.items[?(@.coupon)].id", "$.data.items[*].tags[*]",
+])
+def test_same_as_jsonpath_package(path):
+    jsonpath = pytest.importorskip("jsonpath")
+    assert compile_path(path).find(DATA) == (jsonpath.jsonpath(DATA, path) or [])
+
+
+@pytest.mark.parametrize("path, expected", [
+    # jsonpath包不支持负下标、&&/||、正则和in
+    ("$.data.items[-1].id", [3]),
+    ("$.data.items[?(@.price > 10 && @.coupon == true)].id", [2]),
+    ("$.data.items[?(@.price < 10 || @.name == 'c')].id", [1, 3]),
+    ("$.data.items[?(!(@.price > 10))].id", [1]),
+    ("$.data.items[?(@.name =~ /^[AB]$/i)].id", [1, 2]),
+    ("$.data.items[?(@.id in [1, 3])].name", ["a", "c"]),
+    ("$.data.items[?(@.id nin [1, 3])].name", ["b"]),
+    ("$.data.items[?(@.detail.sku != 'S1')].id", [2, 3]),
+])
+def test_filters(path, expected):
+    assert compile_path(path).find(DATA) == expected
+
+
+def test_dotted_paths():
+    assert compile_path("data.token").first(DATA) == "t1"
+    assert compile_path("data.items.1.name").first(DATA) == "b"
+    assert compile_path("data.items.9.name").first(DATA, "default") == "default"
+    # 值为None与未找到不同
+    assert compile_path("msg").first(DATA, MISSING) is None
+    assert compile_path("nope").first(DATA, MISSING) is MISSING
+
+
+def test_value_shape():
+    assert compile_path("$.data.items[0].id").value(DATA) == 1
+    assert compile_path("$.data.items[*].id").value(DATA) == [1, 2, 3]
+    assert compile_path("$.data.items[?(@.price > 1000)].id").value(DATA, "none") == "none"
+    assert compile_path("$.data.items[0].id").definite and not compile_path("$..id").definite
+
+
+def test_compiled_once():
+    assert compile_path("$.data.items[*].id") is compile_path("$.data.items[*].id")
+
+
+@pytest.mark.parametrize("path", ["$.data[", "$.data.items[?(@.price >)]", "$.data.items[?(@.price > 1 &&)]"])
+def test_invalid_path(path):
+    with pytest.raises(ValueError):
+        compile_path(path)
@@ -0,0 +1,82 @@
+"""压测模式：对本地替身服务执行短时压测，检查请求计数和错误率"""
+from datetime import timedelta
+import pytest
+from common.load import LatencyHistogram, LoadProfile, LoadRunner, Scenario, VirtualUser
+from common.response import ParsedResponse
+from common.validator import compile_validate
+
+SCENARIO = """
+tests:
+  test_ok:
+    route: /api/echo
+  test_unexpected_500:
+    route: /api/status/500
+  test_expected_404:
+    route: /api/status/404
+    Validate:
+      expectcode: 404
+  test_wrong_code:
+    route: /api/echo
+    Validate:
+      expectcode: 201
+"""
+
+
+def response(status):
+    return ParsedResponse(status, {}, {}, b"{}", timedelta(0))
+
+
+def test_parse_stages_and_profile():
+    stages = LoadProfile.parse_stages("30s:10, 2m:50, 500ms:0")
+    assert stages == [(30.0, 10), (120.0, 50), (0.5, 0)]
+    profile = LoadProfile(stages=stages)
+    assert profile.duration == 150.5 and profile.max_users == 50
+    assert profile.users_at(0) == 0
+    assert profile.users_at(15) == 5
+    assert profile.users_at(90) == 30
+    assert profile.users_at(200) == 0
+    assert LoadProfile(users=3, duration=1).users_at(0.5) == 3
+    with pytest.raises(ValueError):
+        LoadProfile.parse_stages("10x:1")
+
+
+def test_latency_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for ms in range(1, 101):
+        histogram.record(ms / 1000)
+    assert histogram.count == 100
+    assert histogram.percentile(50) == pytest.approx(0.050, rel=0.02)
+    assert histogram.percentile(99) == pytest.approx(0.099, rel=0.02)
+    assert histogram.max == 0.1
+
+
+def test_validate_counts_unexpected_error_status():
+    assert VirtualUser.validate(response(200), None, None) is None
+    assert VirtualUser.validate(response(500), None, None) == "status 500"
+    assert VirtualUser.validate(response(404), compile_validate({"expectcode": 404}), None) is None
+    assert VirtualUser.validate(response(200), compile_validate({"expectcode": 404}), None) == "status 200"
+    # 含变量的预期状态码取自渲染后的Validate块
+    validator = compile_validate({"expectcode": "${code}"})
+    assert VirtualUser.validate(response(503), validator, {"expectcode": 503}) is None
+    assert VirtualUser.validate(response(503), compile_validate({"resultcheck": "{}"}), None) == "status 503"
+
+
+def test_load_smoke(tmp_path, stub_server):
+    path = tmp_path / "test_scenario.yaml"
+    path.write_text(SCENARIO, encoding="utf-8")
+    start = len(stub_server.requests)
+    runner = LoadRunner(Scenario.from_file(path), LoadProfile(users=2, duration=0.5), baseurl=stub_server.url)
+    report = runner.run()
+    routes = report["routes"]
+    total = report["total"]
+
+    assert total["requests"] == len(stub_server.requests) - start > 0
+    assert total["requests"] == sum(stats.latency.count for stats in runner.routes.values())
+    assert routes["GET /api/status/500"]["error_rate"] == 1.0
+    assert routes["GET /api/status/500"]["error_kinds"] == {"status 500": routes["GET /api/status/500"]["requests"]}
+    assert routes["GET /api/status/404"]["errors"] == 0
+    # test_ok与test_wrong_code的路由相同：一半请求的状态码不符合预期
+    echo = routes["GET /api/echo"]
+    assert echo["error_kinds"] == {"status 200": echo["errors"]}
+    assert abs(echo["errors"] * 2 - echo["requests"]) <= 2
+    assert total["errors"] == routes["GET /api/status/500"]["errors"] + echo["errors"]
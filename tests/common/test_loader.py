@@ -0,0 +1,94 @@
+"""用例加载：按内容哈希缓存解析和编译结果"""
+import pickle
+import pytest
+from common.cache import VariableStore, cache
+from common.exceptions import YamlException
+from common.loader import SuiteCache, apply_file_config, parse_yaml
+
+SUITE = """
+variable:
+  user: admin
+tests:
+  test_login:
+    method: post
+    route: /api/login
+    RequestData:
+      json: {username: "${user}"}
+"""
+
+
+@pytest.fixture
+def suite(tmp_path):
+    path = tmp_path / "test_login.yaml"
+    path.write_text(SUITE, encoding="utf-8")
+    return path
+
+
+def test_hit_after_first_load(tmp_path, suite):
+    suites = SuiteCache()
+    suites.configure(tmp_path / "cache")
+    (tmp_path / "cache").mkdir()
+    raw, templates = suites.load(suite)
+    assert (suites.hits, suites.misses) == (0, 1)
+    cached_raw, cached_templates = suites.load(suite)
+    assert (suites.hits, suites.misses) == (1, 1)
+    assert cached_raw == raw
+    render = cached_templates["test_login"].render
+    assert render(lambda key: "root")["RequestData"] == {"json": {"username": "root"}}
+
+
+def test_changed_content_reparsed(tmp_path, suite):
+    suites = SuiteCache(tmp_path)
+    suites.load(suite)
+    suite.write_text(SUITE.replace("/api/login", "/api/v2/login"), encoding="utf-8")
+    raw, _ = suites.load(suite)
+    assert raw["tests"]["test_login"]["route"] == "/api/v2/login"
+    assert (suites.hits, suites.misses) == (0, 2)
+    suites.load(suite)
+    assert suites.hits == 1
+
+
+def test_corrupt_or_stale_cache_reparsed(tmp_path, suite):
+    suites = SuiteCache(tmp_path)
+    suites.load(suite)
+    cache_file = suites._cache_file(suite)
+    cache_file.write_bytes(b"not a pickle")
+    assert suites.load(suite)[0]["variable"] == {"user": "admin"}
+    with open(cache_file, "rb") as f:
+        version, digest, suite_data = pickle.load(f)
+    with open(cache_file, "wb") as f:
+        pickle.dump((version - 1, digest, suite_data), f)
+    suites.load(suite)
+    assert (suites.hits, suites.misses) == (0, 3)
+
+
+def test_no_cache_dir(suite):
+    suites = SuiteCache()
+    suites.load(suite)
+    suites.load(suite)
+    assert (suites.hits, suites.misses) == (0, 2)
+
+
+def test_parse_yaml_requires_tests():
+    with pytest.raises(YamlException):
+        parse_yaml("variable: {a: 1}", "a.yaml")
+
+
+def test_apply_file_config(monkeypatch):
+    session = VariableStore()
+    monkeypatch.setattr(cache, "session", session)
+    store = session.fork("file")
+    raw = parse_yaml("""
+variable: {host: example.com}
+config:
+  session: file
+  url: "https://${host}"
+  headers: {X-Env: test}
+tests: {}
+""")
+    store.set("headers", {"User-Agent": "apitest"})
+    assert apply_file_config(raw, store) == "file"
+    assert store.get("url") == "https://example.com"
+    assert store.get("headers") == {"User-Agent": "apitest", "X-Env": "test"}
+    # 同时作为会话级变量的默认值
+    assert session.get("host") == "example.com"
@@ -0,0 +1,94 @@
+"""参数组数据源：CSV/JSONL/XLSX逐行读取，列映射、类型转换、过滤和抽样"""
+import itertools
+import pytest
+from common.exceptions import YamlException
+from common.params import ParameterSource, iter_parameters
+
+
+@pytest.fixture
+def users_csv(tmp_path):
+    with open(tmp_path / "users.csv", "w", encoding="utf-8") as f:
+        f.write("user_name,code,status,extra\n")
+        for i in range(1000):
+            extra = "\\N" if i % 3 == 0 else i
+            f.write(f"user{i},200,{'active' if i % 2 else 'frozen'},{extra}\n")
+    return tmp_path
+
+
+def test_csv_mapping_types_filter_and_sample(users_csv):
+    spec = {"file": "users.csv", "columns": {"username": "user_name", "expectcode": "code"},
+            "types": {"expectcode": "int"}, "filter": {"status": "active"}, "sample": "10%", "seed": 1}
+    rows = list(ParameterSource.from_spec(spec, users_csv).rows())
+    assert 20 < len(rows) < 90
+    assert all(set(row) == {"username", "expectcode"} and row["expectcode"] == 200 for row in rows)
+    assert all(int(row["username"][4:]) % 2 for row in rows)
+    # 相同种子抽中的行相同
+    assert rows == list(ParameterSource.from_spec(spec, users_csv).rows())
+    assert rows != list(ParameterSource.from_spec({**spec, "seed": 2}, users_csv).rows())
+
+
+def test_sample_override_limit_and_null(users_csv):
+    source = ParameterSource.from_spec({"file": "users.csv", "null": "\\N", "limit": 4}, users_csv)
+    rows = list(source.rows())
+    assert [row["extra"] for row in rows] == [None, "1", "2", None]
+    assert list(source.rows(sample=0)) == []
+
+
+def test_rows_are_streamed(users_csv):
+    rows = ParameterSource.from_spec("users.csv", users_csv).rows()
+    assert next(rows)["user_name"] == "user0"
+    assert list(itertools.islice(rows, 2))[-1]["user_name"] == "user2"
+
+
+def test_jsonl(tmp_path):
+    (tmp_path / "cases.jsonl").write_text('{"id": 1, "tags": ["a"]}\n\n{"id": "2", "ok": "yes"}\n', encoding="utf-8")
+    rows = list(ParameterSource.from_spec({"file": "cases.jsonl", "types": {"id": "int", "ok": "bool"}}, tmp_path).rows())
+    assert rows == [{"id": 1, "tags": ["a"]}, {"id": 2, "ok": True}]
+
+
+def test_xlsx(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Data"
+    sheet.append(["id", "name", "body"])
+    sheet.append([1, "张三", '{"a": 1}'])
+    sheet.append([None, None, None])
+    sheet.append([2.0, "李四", '{"a": 2}'])
+    workbook.save(tmp_path / "data.xlsx")
+    source = ParameterSource.from_spec({"file": "data.xlsx", "sheet": "Data", "types": {"id": "int", "body": "json"}},
+                                       tmp_path)
+    assert list(source.rows()) == [{"id": 1, "name": "张三", "body": {"a": 1}},
+                                   {"id": 2, "name": "李四", "body": {"a": 2}}]
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(YamlException):
+        ParameterSource.from_spec("data.txt", tmp_path)
+
+
+def test_iter_parameters_chains_inline_and_files(users_csv):
+    assert iter_parameters({}) is None
+    spec = {"parameters": [{"username": "admin"}],
+            "parameters_from": [{"file": "users.csv", "columns": {"username": "user_name"}, "limit": 2}]}
+    assert list(iter_parameters(spec, users_csv)) == [{"username": "admin"}, {"username": "user0"},
+                                                      {"username": "user1"}]
+
+
+def test_yaml_case_with_parameter_file(run_yaml, tmp_path):
+    (tmp_path / "ids.csv").write_text("id,expect\n1,200\n2,200\n3,200\n", encoding="utf-8")
+    content = """
+    tests:
+      test_echo:
+        method: get
+        route: /api/echo
+        RequestData:
+          params: {id: "${id}"}
+        parameters_from:
+          file: ids.csv
+          types: {expect: int}
+        Validate:
+          expectcode: ${expect}
+    """
+    run_yaml(content).assert_outcomes(passed=3)
+    run_yaml(content, "--param-sample", "0").assert_outcomes()
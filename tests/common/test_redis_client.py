@@ -0,0 +1,92 @@
+"""Redis：命令拆分、连接池管道执行和extract_redis提取规则"""
+import types
+import pytest
+import conftest
+from common.cache import VariableStore, cache
+from common.redis_client import RedisClient, parse_command
+
+REDIS_ENV = {"redis": {"host": "127.0.0.1", "port": 6379, "db": 0}}
+
+
+@pytest.mark.parametrize("cmd, expected", [
+    ("HGET user:1 balance", ["HGET", "user:1", "balance"]),
+    ("  GET   k  ", ["GET", "k"]),
+    ('SET k {"a":"b"}', ["SET", "k", '{"a":"b"}']),
+    ('SET k {"a":"b","c":[1,2]}', ["SET", "k", '{"a":"b","c":[1,2]}']),
+    ('SET greeting "hello world"', ["SET", "greeting", "hello world"]),
+    ("SET greeting 'hello world'", ["SET", "greeting", "hello world"]),
+    ("SET k '{\"a\": \"b c\"}'", ["SET", "k", '{"a": "b c"}']),
+    ('SET k "say \\"hi\\""', ["SET", "k", 'say "hi"']),
+    ('SET k ""', ["SET", "k", ""]),
+    # 引号不成对时与原来一样按空白拆分
+    ('SET k "a b', ["SET", "k", '"a', "b"]),
+    ("SET it's ok", ["SET", "it's", "ok"]),
+])
+def test_parse_command(cmd, expected):
+    assert parse_command(cmd) == expected
+
+
+@pytest.fixture
+def client():
+    fakeredis = pytest.importorskip("fakeredis")
+    redis = pytest.importorskip("redis")
+    connection_class = getattr(fakeredis, "FakeRedisConnection", None) or fakeredis.FakeConnection
+    pool = redis.ConnectionPool(connection_class=connection_class, server=fakeredis.FakeServer(), decode_responses=True)
+    client = RedisClient(REDIS_ENV["redis"], pool=pool)
+    yield client
+    client.close()
+
+
+def test_pipeline(client):
+    commands = [parse_command(cmd) for cmd in ['SET k {"a":"b"}', "HSET h f 1", "GET k", "HGET h f"]]
+    assert client.execute_pipeline(commands, transaction=True) == [True, 1, '{"a":"b"}', "1"]
+    assert client.execute_command("GET", "k") == '{"a":"b"}'
+
+
+EXTRACT = """
+tests:
+  test_extract:
+    redis:
+      setup_redis:
+        - SET k {{"a":"b"}}
+        - SET greeting "hello world"
+        - GET k
+        - GET greeting
+      extract_redis:
+        - {rule}
+    method: post
+    route: /api/echo
+    RequestData:
+      json:
+        v: ${{v}}
+    Validate:
+      jsonpath_check:
+        $.data.v: {expected}
+"""
+
+
+@pytest.mark.parametrize("rule, expected", [
+    ("v: 2", "'{\"a\":\"b\"}'"),
+    ("v: -1", "hello world"),
+    # 非整数的规则与原来一样取全部结果
+    ("v: ''", "[true, true, '{\"a\":\"b\"}', hello world]"),
+    ("v: all", "[true, true, '{\"a\":\"b\"}', hello world]"),
+])
+def test_extract_redis(run_yaml, rule, expected):
+    run_yaml(EXTRACT.format(rule=rule, expected=expected), env=REDIS_ENV).assert_outcomes(passed=1)
+
+
+def extract_redis(result, *rules):
+    case = types.SimpleNamespace(spec={"redis": {"extract_redis": [{f"v{i}": rule} for i, rule in enumerate(rules)]}})
+    with cache.activate(VariableStore()) as store:
+        conftest.YamlTest._extract_redis_result(case, result)
+    return [store.get(f"v{i}") for i in range(len(rules))]
+
+
+def test_extract_redis_rules():
+    assert extract_redis(["OK", "1", "2"], 1, "-1", "", None, "all", "1.5") == [
+        "1", "2", ["OK", "1", "2"], ["OK", "1", "2"], ["OK", "1", "2"], ["OK", "1", "2"]]
+    # 单条命令的结果不按下标提取
+    assert extract_redis("abc", 0) == ["abc"]
+    with pytest.raises(IndexError, match="下标3超出结果范围"):
+        extract_redis(["OK"], 3)
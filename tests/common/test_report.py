@@ -0,0 +1,69 @@
+"""Allure附件：按大小上限截断，正文由后台线程写入结果目录"""
+import json
+import pytest
+from common.report import AttachmentWriter, CaseRecorder, assume, attach, recording, run_recorded, step
+
+
+def test_clip_keeps_head_and_tail():
+    writer = AttachmentWriter()
+    writer.max_size = 8
+    assert writer.clip("abcdefgh") == "abcdefgh"
+    assert writer.clip("abcdefghij") == "abcdef\n...... 省略 2 字符 ......\nij"
+    assert writer.clip(b"0123456789") == b"012345\n...... \xe7\x9c\x81\xe7\x95\xa5 2 \xe5\xad\x97\xe7\xac\xa6 ......\n89"
+    assert writer.clip("abcdefghij", limit=4) == "abc\n...... 省略 6 字符 ......\nj"
+    # 0表示不限制，非文本内容原样返回
+    assert writer.clip("x" * 100, limit=0) == "x" * 100
+    assert writer.clip({"a": 1}) == {"a": 1}
+
+
+def test_recorder_replays_in_order():
+    with recording() as recorder:
+        with step("请求"):
+            attach("body", name="请求体")
+        assert not assume(False, "状态码不一致")
+        assert assume(True, "不会记录")
+    assert isinstance(recorder, CaseRecorder)
+    assert recorder.actions == [
+        ("step", "请求", [("attach", {"body": "body", "name": "请求体", "attachment_type": None, "extension": None})])]
+    assert recorder.failures == ["状态码不一致"]
+
+
+def test_run_recorded_keeps_exception():
+    def fail():
+        raise KeyError("token")
+    recorder = run_recorded(fail)
+    assert isinstance(recorder.exception, KeyError)
+    with pytest.raises(KeyError):
+        recorder.replay()
+
+
+def test_attachments_written_and_clipped(run_yaml, tmp_path):
+    content = """
+    tests:
+      test_big:
+        method: post
+        route: /api/echo
+        RequestData:
+          json:
+            text: "{text}"
+        Validate:
+          expectcode: 200
+    """.replace("{text}", "数据" * 5000)
+    run_yaml(content, "--alluredir", "allure", "--attach-max-size", "2000").assert_outcomes(passed=1)
+    results = [json.loads(p.read_text(encoding="utf-8")) for p in (tmp_path / "allure").glob("*-result.json")]
+    sources = []
+
+    def collect(node):
+        sources.extend(a["source"] for a in node.get("attachments", []))
+        for child in node.get("steps", []):
+            collect(child)
+    for result in results:
+        collect(result)
+    assert sources
+    bodies = [(tmp_path / "allure" / source).read_text(encoding="utf-8") for source in sources]
+    # 后台线程在会话结束前写完全部正文
+    assert all(bodies)
+    # 请求体和响应体按上限截断（日志附件由allure-pytest直接写入，不经过截断）
+    clipped = [body for source, body in zip(sources, bodies) if source.endswith(".json")]
+    assert len(clipped) == 2
+    assert all(len(body) <= 2000 + 40 and "...... 省略" in body for body in clipped)
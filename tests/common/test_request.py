@@ -0,0 +1,79 @@
+"""HTTP会话池：共享连接池适配器，Cookie默认按用例隔离"""
+import threading
+from common.request import HttpSessionPool
+
+LOGIN_THEN_READ = """
+config:
+  {session}
+tests:
+  test_login:
+    method: post
+    route: /api/login
+    Validate:
+      expectcode: 200
+  test_read_cookie:
+    method: get
+    route: /api/echo
+    Validate:
+      {check}
+"""
+
+
+def test_sessions_share_adapter():
+    pool = HttpSessionPool()
+    try:
+        first, second = pool.get(), pool.get()
+        assert first is not second
+        assert first.get_adapter("http://127.0.0.1") is pool.adapter
+        assert second.get_adapter("https://127.0.0.1") is pool.adapter
+        assert pool.get("file", "a.yaml") is pool.get("file", "a.yaml")
+        assert pool.get("file", "a.yaml") is not pool.get("file", "b.yaml")
+        assert pool.get("session") is pool.get("session", "ignored")
+    finally:
+        pool.close()
+
+
+def test_release_clears_case_cookies_only():
+    pool = HttpSessionPool()
+    try:
+        case, shared = pool.get("case"), pool.get("session")
+        case.cookies.set("sessionid", "1")
+        shared.cookies.set("sessionid", "2")
+        pool.release(case)
+        pool.release(shared)
+        assert not case.cookies
+        assert shared.cookies.get("sessionid") == "2"
+    finally:
+        pool.close()
+
+
+def test_release_reads_sessions_under_lock():
+    pool = HttpSessionPool()
+    try:
+        case = pool.get("case")
+        case.cookies.set("sessionid", "1")
+        # 其他线程在get中持有锁时，release等待锁释放后再判断会话是否共享
+        with pool._lock:
+            thread = threading.Thread(target=pool.release, args=(case,))
+            thread.start()
+            thread.join(timeout=0.2)
+            assert thread.is_alive() and case.cookies.get("sessionid") == "1"
+        thread.join()
+        assert not case.cookies
+    finally:
+        pool.close()
+
+
+def test_cookies_isolated_per_case_by_default(run_yaml):
+    run_yaml(LOGIN_THEN_READ.format(session="", check="jsonpath_check: {$.cookie: null}")).assert_outcomes(passed=2)
+
+
+def test_file_session_shares_cookies(run_yaml):
+    result = run_yaml(LOGIN_THEN_READ.format(session="session: file", check="contains: {$.cookie: 'sessionid=s'}"))
+    result.assert_outcomes(passed=2)
+
+
+def test_case_session_overrides_file_session(run_yaml):
+    content = LOGIN_THEN_READ.format(session="session: file", check="jsonpath_check: {$.cookie: null}")
+    content = content.replace("  test_read_cookie:\n", "  test_read_cookie:\n    session: case\n")
+    run_yaml(content).assert_outcomes(passed=2)
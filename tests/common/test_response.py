@@ -0,0 +1,96 @@
+"""响应解析：文本和JSON只计算一次，校验、提取和报告共用"""
+from datetime import timedelta
+import pytest
+import requests
+import common.response as response_module
+import common.result as result_module
+from common.cache import VariableStore, cache
+from common.report import recording
+from common.response import ParsedResponse
+from common.result import extract_rules, extract_value
+
+
+def parsed(content: bytes, status_code: int = 200, headers=None, cookies=None, encoding=None) -> ParsedResponse:
+    return ParsedResponse(status_code, headers or {}, cookies or {}, content, timedelta(milliseconds=5),
+                          encoding=encoding)
+
+
+def test_json_parsed_once(monkeypatch):
+    calls = []
+
+    def loads(text):
+        calls.append(text)
+        return {"data": {"name": "张三"}}
+    monkeypatch.setattr(response_module, "loads", loads)
+    r = parsed('{"data": {"name": "张三"}}'.encode("utf-8"))
+    assert r.json() is r.json()
+    assert r.is_json
+    assert r.json_text == '{"data": {"name": "张三"}}'
+    assert r.pretty.startswith('{\n  "data"')
+    assert len(calls) == 1
+
+
+def test_invalid_json_raises_same_error():
+    r = parsed(b"<html>ok</html>")
+    with pytest.raises(ValueError) as first:
+        r.json()
+    with pytest.raises(ValueError) as second:
+        r.json()
+    assert first.value is second.value
+    assert not r.is_json
+    assert r.json_text == r.pretty == "<html>ok</html>"
+
+
+def test_text_decoding():
+    assert parsed("中文".encode("gbk"), encoding="gbk").text == "中文"
+    assert parsed(b"\xff ok").text == "� ok"
+
+
+def test_headers_case_insensitive_and_ok():
+    r = parsed(b"", status_code=404, headers={"Content-Type": "text/plain"})
+    assert r.headers["content-type"] == "text/plain"
+    assert not r.ok and parsed(b"").ok
+    assert repr(r) == "<Response [404]>"
+
+
+def test_from_requests_uses_requests_decoding():
+    raw = requests.Response()
+    raw.status_code = 200
+    raw._content = '{"msg": "成功"}'.encode("utf-8")
+    raw.headers["Content-Type"] = "application/json"
+    raw.elapsed = timedelta(milliseconds=1)
+    raw.url = "http://127.0.0.1/api"
+    r = ParsedResponse.from_requests(raw)
+    assert r.json() == {"msg": "成功"}
+    assert r.text == raw.text
+    assert (r.url, r.response) == ("http://127.0.0.1/api", raw)
+
+
+def test_extract_value_falls_back_to_headers_cookies_and_regex():
+    r = parsed(b'{"data": {"token": "t1"}}', headers={"X-Trace": "abc"}, cookies={"sid": "s1"})
+    body = r.json()
+    assert extract_value(r, body, "data.token") == "t1"
+    assert extract_value(r, body, "X-Trace") == "abc"
+    assert extract_value(r, body, "sid") == "s1"
+    # 指定JSONPath时不再回退
+    assert extract_value(r, body, "X-Trace", "$.missing") is None
+
+
+def test_extract_rules():
+    assert extract_rules(["data.token", {"ids": "$.data[*].id"}]) == [("data.token", None), ("ids", "$.data[*].id")]
+
+
+class _Probe:
+    """只允许按%s合并到日志中，f-string格式化时报错"""
+    def __format__(self, spec):
+        raise AssertionError("日志参数在调用处被格式化")
+
+    def __str__(self):
+        return "probe"
+
+
+def test_get_result_log_arguments_not_formatted_eagerly(monkeypatch):
+    monkeypatch.setattr(result_module, "extract_value", lambda *args: _Probe())
+    with cache.activate(VariableStore()) as store, recording() as recorder:
+        result_module.get_result(parsed(b'{"a": 1}'), [{"v": "$.a"}])
+    assert isinstance(store.get("v"), _Probe) and not recorder.failures
@@ -0,0 +1,122 @@
+"""依赖调度：变量和共享资源构建的依赖图与串行执行的顺序一致"""
+import threading
+import time
+from common.scheduler import DagScheduler, DependencyGraph, case_io, case_resources
+
+
+def edges(graph):
+    return {node.index: node.deps for node in graph.nodes}
+
+
+def test_case_io_reads_and_writes():
+    spec = {
+        "route": "/api/${version}/users/${user.id}",
+        "RequestData": {"json": {"name": "${name}", "phone": "${faker.phone}", "page": "${page}"}},
+        "Extract": ["data.token", {"ids": "$.data[*].id"}],
+        "extract_db": [{"usernames": ""}],
+        "redis": {"extract_redis": [{"balance": ""}]},
+    }
+    reads, writes = case_io(spec, param={"page": 1})
+    # ${user.id}可能来自缓存键user.id或user的嵌套字段；参数组和faker变量不依赖其他用例
+    assert reads == {"version", "user", "user.id", "name"}
+    assert writes == {"data.token", "ids", "usernames", "balance"}
+
+
+def test_graph_orders_readers_and_writers():
+    graph = DependencyGraph([
+        ("login", set(), {"token"}),
+        ("read1", {"token"}, set()),
+        ("read2", {"token"}, set()),
+        ("relogin", set(), {"token"}),
+        ("read3", {"token"}, set()),
+        ("other", {"x"}, set()),
+    ])
+    assert edges(graph) == {0: set(), 1: {0}, 2: {0}, 3: {0, 1, 2}, 4: {3}, 5: set()}
+    assert [node.item for node in graph.roots()] == ["login", "other"]
+    path, cost = graph.critical_path()
+    assert [node.item for node in path] == ["login", "read1", "relogin", "read3"]
+    assert cost == 4
+
+
+def test_case_resources():
+    assert case_resources({}) == (set(), set())
+    assert case_resources({}, session="file:a.yaml") == (set(), {"@cookies:file:a.yaml"})
+    assert case_resources({"setup_db": "SELECT 1"}) == ({"@db"}, set())
+    assert case_resources({"setup_db": ["SELECT 1", "DELETE FROM t"]}) == (set(), {"@db"})
+    assert case_resources({"teardown_db": "UPDATE t SET a = 1"}) == (set(), {"@db"})
+    assert case_resources({"setup_db": [{"load": {"file": "a.csv", "table": "t"}}]}) == (set(), {"@db"})
+    assert case_resources({"redis": {"setup_redis": "GET k"}}) == (set(), {"@redis"})
+    # 参数组中的setup_db优先于用例中的
+    assert case_resources({"setup_db": "DELETE FROM t"}, param={"setup_db": "SELECT 1"}) == ({"@db"}, set())
+
+
+def test_shared_resources_serialize_in_collection_order():
+    cases = [
+        ("login", *case_resources({}, session="session")),
+        ("seed", *case_resources({"setup_db": "INSERT INTO t VALUES (1)"})),
+        ("query1", *case_resources({"setup_db": "SELECT * FROM t"})),
+        ("query2", *case_resources({"setup_db": "SELECT * FROM t"})),
+        ("cleanup", *case_resources({"teardown_db": "DELETE FROM t"})),
+        ("profile", *case_resources({}, session="session")),
+        ("isolated", *case_resources({})),
+    ]
+    assert edges(DependencyGraph(cases)) == {0: set(), 1: set(), 2: {1}, 3: {1}, 4: {1, 2, 3}, 5: {0}, 6: set()}
+
+
+def test_scheduler_runs_dependencies_first():
+    graph = DependencyGraph([
+        ("producer", set(), {"token"}),
+        ("consumer", {"token"}, set()),
+        ("independent", set(), set()),
+    ])
+    finished = []
+    lock = threading.Lock()
+
+    def run(name):
+        time.sleep(0.05 if name == "producer" else 0.0)
+        with lock:
+            finished.append(name)
+        return name
+
+    scheduler = DagScheduler(graph, workers=3)
+    futures = scheduler.start(run)
+    assert [future.result(timeout=5) for future in futures] == ["producer", "consumer", "independent"]
+    scheduler.shutdown()
+    assert finished.index("producer") < finished.index("consumer")
+    assert finished[0] == "independent"
+    assert all(node.duration is not None for node in graph.nodes)
+
+
+def test_scheduler_continues_after_failure():
+    graph = DependencyGraph([("fail", set(), {"x"}), ("next", {"x"}, set())])
+
+    def run(name):
+        if name == "fail":
+            raise RuntimeError("boom")
+        return name
+
+    scheduler = DagScheduler(graph, workers=2)
+    futures = scheduler.start(run)
+    assert futures[1].result(timeout=5) == "next"
+    assert isinstance(futures[0].exception(timeout=5), RuntimeError)
+    scheduler.shutdown()
+
+
+def test_parallel_cases_sharing_cookies_run_in_order(run_yaml):
+    content = """
+    config:
+      session: file
+    tests:
+      test_login:
+        method: post
+        route: /api/login
+      test_read_1:
+        route: /api/echo
+        Validate:
+          contains: {$.cookie: 'sessionid=s'}
+      test_read_2:
+        route: /api/echo
+        Validate:
+          contains: {$.cookie: 'sessionid=s'}
+    """
+    run_yaml(content, "--workers", "4").assert_outcomes(passed=3)
@@ -0,0 +1,159 @@
+"""跨进程共享变量：发布、等待、放弃标记，以及按最终执行的用例确定等待的变量"""
+import multiprocessing
+import threading
+import time
+import pytest
+from common.cache import SESSION, VariableStore, cache
+from common.shared_store import SqliteSharedStore, open_shared_store
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = open_shared_store(f"sqlite://{tmp_path / 'vars.db'}", "run1")
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def redis_store(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    redis = pytest.importorskip("redis")
+    monkeypatch.setattr(redis.Redis, "from_url", staticmethod(lambda url: fakeredis.FakeRedis()))
+    store = open_shared_store("redis://127.0.0.1:6379/15", "run1")
+    yield store
+    store.close()
+
+
+def _publish_later(path, delay):
+    time.sleep(delay)
+    open_shared_store(f"sqlite://{path}", "run1").publish("data.token", {"token": "abc"})
+
+
+def test_wait_for_other_process(store):
+    process = multiprocessing.get_context("spawn").Process(target=_publish_later, args=(store.path, 0.3))
+    process.start()
+    try:
+        assert store.wait("data.token", timeout=30) == {"token": "abc"}
+    finally:
+        process.join()
+    assert store.stats["waits"] == 1 and store.stats["fetched"] == 1
+
+
+@pytest.mark.parametrize("backend", ["store", "redis_store"])
+def test_abandon_stops_waiting(backend, request):
+    store = request.getfixturevalue(backend)
+    store.abandon("token")
+    start = time.monotonic()
+    assert store.wait("token", timeout=30, default="missing") == "missing"
+    assert time.monotonic() - start < 1
+    assert store.fetch("token", "missing") == "missing"
+    assert store.stats["abandoned"] == 1
+    # 之后发布的值覆盖放弃标记；放弃标记不覆盖已发布的值
+    store.publish("token", "t1")
+    store.abandon("token")
+    assert store.wait("token", timeout=1) == "t1"
+
+
+def test_wait_times_out(store):
+    assert store.wait("never", timeout=0.1, default=None) is None
+    assert store.stats["timeouts"] == 1
+
+
+def test_runs_are_isolated(store, tmp_path):
+    store.publish("token", "t1")
+    other = SqliteSharedStore(str(tmp_path / "vars.db"), "run2")
+    assert other.fetch("token") is None
+    other.close()
+
+
+def test_unsupported_url():
+    with pytest.raises(ValueError):
+        open_shared_store("mysql://127.0.0.1/vars")
+
+
+@pytest.fixture
+def sharing(store):
+    cache.share(store, {"token", "user"}, timeout=5)
+    yield store
+    cache.unshare()
+
+
+def test_session_variables_published_and_looked_up(sharing):
+    publisher, consumer = VariableStore(), VariableStore()
+    assert cache.sharing
+    publisher.set("token", "t1", scope=SESSION)
+    publisher.fork("case").set("local", 1)
+    assert sharing.fetch("token") == "t1" and sharing.fetch("local") is None
+    assert consumer.get("token") == "t1"
+    # 取到后缓存到本地，不再读取共享存储
+    assert consumer.layers[0].data["token"] == "t1"
+    # 不会由用例写入的变量不等待
+    start = time.monotonic()
+    assert consumer.get("other") is None
+    assert time.monotonic() - start < 0.5
+
+
+def test_abandoned_variables_not_awaited(sharing):
+    publisher, consumer = VariableStore(), VariableStore()
+    publisher.set("token", "t1", scope=SESSION)
+    # 已发布的变量不会被放弃；只有未发布的变量写入放弃标记
+    cache.abandon(["token", "user"])
+    assert sharing.fetch("token") == "t1"
+    start = time.monotonic()
+    thread = threading.Thread(target=lambda: consumer.get("user"))
+    thread.start()
+    thread.join(timeout=3)
+    assert not thread.is_alive() and time.monotonic() - start < 1
+
+
+SHARED = """
+tests:
+  test_producer:
+    method: post
+    route: {route}
+    Extract:
+      - token: $.data.token
+    Validate:
+      expectcode: 200
+  test_consumer:
+    method: get
+    route: /api/echo
+    RequestData:
+      params: {{t: "${{token}}"}}
+    Validate:
+      contains:
+        $.query.t[0]: "tok-"
+"""
+
+
+@pytest.fixture
+def shard(run_yaml, tmp_path):
+    """执行一个分片，返回(结果, 耗时)"""
+    def run(route, *args, run_id="run1"):
+        start = time.monotonic()
+        result = run_yaml(SHARED.format(route=route), "--shared-store", f"sqlite://{tmp_path / 'vars.db'}",
+                          "--shared-run-id", run_id, "--shared-timeout", "20", *args)
+        return result, time.monotonic() - start
+    return run
+
+
+def test_shards_share_extracted_variables(shard):
+    shard("/api/login", "-k", "producer")[0].assert_outcomes(passed=1)
+    # 生产者不在本分片中执行时，通过--shared-keys声明需要等待的变量
+    shard("/api/login", "-k", "consumer", "--shared-keys", "token")[0].assert_outcomes(passed=1)
+
+
+def test_failed_producer_releases_consumers(shard):
+    # 提取失败的生产者不等待自己未发布的变量
+    result, elapsed = shard("/api/status/500", "-k", "producer")
+    result.assert_outcomes(failed=1)
+    assert elapsed < 10
+    result, elapsed = shard("/api/status/500", "-k", "consumer", "--shared-keys", "token")
+    result.assert_outcomes(failed=1)
+    assert elapsed < 10
+
+
+def test_deselected_producer_not_awaited(shard):
+    result, elapsed = shard("/api/login", "-k", "consumer", run_id="run2")
+    result.assert_outcomes(failed=1)
+    assert elapsed < 10
@@ -0,0 +1,73 @@
+"""SQL参数绑定：${key}编译为绑定参数，列表展开，字面量拼接，注释中的变量不绑定"""
+import pytest
+from common.regular import resolve_var
+from common.sql import EMPTY_IN_LIST, SqlTemplate, bind_sql, compile_sql
+
+STORE = {"user_id": 7, "ids": [1, 2, 3], "name": "O'Brien", "date": "2024", "empty": [], "flag": True,
+         "info": {"a": 1}}
+
+
+def bind(sql):
+    return bind_sql(sql, lambda key: resolve_var(key, STORE))
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT * FROM ti_user WHERE id = ${user_id}", ("SELECT * FROM ti_user WHERE id = %s", (7,))),
+    ("SELECT * FROM ti_user WHERE id IN (${ids}) AND name = '${name}'",
+     ("SELECT * FROM ti_user WHERE id IN (%s, %s, %s) AND name = %s", (1, 2, 3, "O'Brien"))),
+    ("SELECT * FROM ti_order WHERE no LIKE 'T${date}%'",
+     ("SELECT * FROM ti_order WHERE no LIKE CONCAT('T', %s, '%')", ("2024",))),
+    ("UPDATE ti_user SET note = 'it''s ${name}' WHERE id = ${user_id}",
+     ("UPDATE ti_user SET note = CONCAT('it''s ', %s) WHERE id = %s", ("O'Brien", 7))),
+    ("UPDATE t SET flag = ${flag}, info = ${info}, x = ${missing}",
+     ("UPDATE t SET flag = %s, info = %s, x = %s", (1, '{"a": 1}', None))),
+    # 同一变量多次出现时各自绑定
+    ("SELECT ${user_id}, ${user_id}", ("SELECT %s, %s", (7, 7))),
+])
+def test_bind(sql, expected):
+    assert bind(sql) == expected
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT * FROM t WHERE id IN (${empty})", f"SELECT * FROM t WHERE id IN ({EMPTY_IN_LIST})"),
+    ("SELECT * FROM t WHERE id NOT IN ( ${empty} )", f"SELECT * FROM t WHERE id NOT IN ( {EMPTY_IN_LIST} )"),
+    ("DELETE FROM t WHERE id not in(${empty})", f"DELETE FROM t WHERE id not in({EMPTY_IN_LIST})"),
+    # 不是IN列表中唯一的元素时仍展开为NULL
+    ("SELECT * FROM t WHERE id IN (${empty}, 0)", "SELECT * FROM t WHERE id IN (NULL, 0)"),
+    ("INSERT INTO t (a) VALUES (${empty})", "INSERT INTO t (a) VALUES (NULL)"),
+    ("SELECT * FROM a JOIN (${empty})", "SELECT * FROM a JOIN (NULL)"),
+])
+def test_empty_list(sql, expected):
+    assert bind(sql) == (expected, ())
+
+
+def test_empty_in_list_semantics():
+    """空子查询与IN ()的语义一致：IN不成立，NOT IN成立（包括列值为NULL时）"""
+    import sqlite3
+    conn = sqlite3.connect(":memory:")
+    conn.executescript("CREATE TABLE t (id INTEGER); INSERT INTO t VALUES (1), (NULL);")
+    subquery = EMPTY_IN_LIST.replace(" FROM DUAL", "")
+    assert conn.execute(f"SELECT COUNT(*) FROM t WHERE id IN ({subquery})").fetchone() == (0,)
+    assert conn.execute(f"SELECT COUNT(*) FROM t WHERE id NOT IN ({subquery})").fetchone() == (2,)
+    assert conn.execute("SELECT COUNT(*) FROM t WHERE id NOT IN (NULL)").fetchone() == (0,)
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT * FROM t -- WHERE id = ${user_id}\nWHERE a = ${user_id}",
+     ("SELECT * FROM t -- WHERE id = ${user_id}\nWHERE a = %s", (7,))),
+    ("SELECT * FROM t /* id = '${user_id}' */ WHERE a = ${user_id}",
+     ("SELECT * FROM t /* id = '${user_id}' */ WHERE a = %s", (7,))),
+    ("SELECT * FROM t # don't bind ${user_id}", ("SELECT * FROM t # don't bind ${user_id}", ())),
+    # 字面量中的注释符号不是注释；--后没有空白不是注释
+    ("SELECT '-- ${name}', 1--${user_id}", ("SELECT CONCAT('-- ', %s), 1--%s", ("O'Brien", 7))),
+])
+def test_comments_not_bound(sql, expected):
+    assert bind(sql) == expected
+
+
+def test_keys_and_compile_cache():
+    template = SqlTemplate("SELECT * FROM t WHERE a = ${a} AND b LIKE '%${b}%' /* ${c} */")
+    assert template.keys == {"a", "b"}
+    assert compile_sql("SELECT ${a}") is compile_sql("SELECT ${a}")
+    # 相同模板在变量值变化时生成相同的语句
+    assert template.bind({"a": 1, "b": "x"}.get)[0] == template.bind({"a": 2, "b": "y"}.get)[0]
@@ -0,0 +1,81 @@
+"""用例模板：渲染结果与 dumps -> sub_var -> loads 一致，并保证请求体可以按JSON发送"""
+import datetime
+import json
+from decimal import Decimal
+import pytest
+from common.cache import CASE, cache
+from common.regular import sub_var
+from common.template import compile_template
+
+
+@pytest.fixture
+def store():
+    store = cache.fork(CASE, {
+        "n": 3,
+        "price": 9.5,
+        "flag": True,
+        "none": None,
+        "token": "abc",
+        "name": "张三",
+        "user": {"id": 7, "tags": ["a", "b"]},
+        "ids": [1, 2],
+        "nested": "${token}-x",
+    })
+    with cache.activate(store):
+        yield store
+
+
+# sub_var用str()拼接非字符串的值，布尔和字典的结果不是合法JSON，这两类单独比较
+SPECS = [
+    {"n": "${n}", "price": "${price}", "none": "${none}"},
+    {"auth": "Bearer ${token}", "greet": "hi ${name}!", "uid": "${user.id}", "tag": "${user.tags.1}"},
+    {"json": {"ids": "${ids}", "list": ["${n}", "x${n}y"]}},
+    {"unknown": "${not_defined}", "text": "a ${not_defined} b"},
+    {"nested": "${nested}", "in_text": "[${nested}]"},
+]
+
+
+@pytest.mark.parametrize("spec", SPECS)
+def test_render_matches_sub_var(store, spec):
+    expected = json.loads(sub_var(None, json.dumps(spec, ensure_ascii=False)))
+    assert compile_template(spec).render() == expected
+
+
+def test_native_types_kept(store):
+    rendered = compile_template({"flag": "${flag}", "user": "${user}", "text": "${flag}/${none}"}).render()
+    assert rendered == {"flag": True, "user": {"id": 7, "tags": ["a", "b"]}, "text": "True/null"}
+
+
+def test_keys_collected():
+    template = compile_template({"a": "${x}", "b": ["pre ${y.z} post", {"${k}": 1}], "c": "plain"})
+    assert template.keys == {"x", "y.z", "k"}
+
+
+def test_non_json_values_render_as_text(store):
+    store.set("birthdate", datetime.date(2001, 2, 3))
+    store.set("amount", Decimal("12.50"))
+    store.set("rows", [{"created": datetime.datetime(2024, 1, 2, 3, 4, 5), "id": 1}])
+    body = compile_template({"json": {"birthdate": "${birthdate}", "amount": "${amount}", "rows": "${rows}"}}).render()
+    assert body == {"json": {"birthdate": "2001-02-03", "amount": "12.50",
+                             "rows": [{"created": "2024-01-02 03:04:05", "id": 1}]}}
+    json.dumps(body)
+
+
+def test_faker_date_is_serializable(store):
+    body = compile_template({"json": {"birthdate": "${faker.birthdate}"}}).render()
+    assert isinstance(body["json"]["birthdate"], str)
+    json.dumps(body)
+
+
+def test_render_returns_new_containers(store):
+    template = compile_template({"ids": "${ids}", "user": "${user}"})
+    rendered = template.render()
+    rendered["ids"].append(3)
+    rendered["user"]["tags"].append("c")
+    assert store.get("ids") == [1, 2]
+    assert store.get("user") == {"id": 7, "tags": ["a", "b"]}
+
+
+def test_same_variable_resolved_once_per_render(store):
+    rendered = compile_template({"a": "${faker.random_str(12)}", "b": "${faker.random_str(12)}"}).render()
+    assert rendered["a"] == rendered["b"]
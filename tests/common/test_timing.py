@@ -0,0 +1,86 @@
+"""阶段耗时：嵌套阶段只统计自身耗时，各阶段之和加上other等于用例总耗时"""
+import json
+import time
+import pytest
+from common import timing
+from common.timing import CaseTimer, TimingReport
+
+
+def test_nested_phases_are_exclusive():
+    timer = CaseTimer()
+    with timer.phase("outer"):
+        time.sleep(0.02)
+        with timer.phase("inner"):
+            time.sleep(0.03)
+        timer.add("http.connect", 0.01)
+    timer.stop()
+    assert timer.phases["inner"] == pytest.approx(0.03, abs=0.015)
+    assert timer.phases["outer"] == pytest.approx(0.01, abs=0.015)
+    assert sum(timer.phases.values()) == pytest.approx(timer.total, abs=1e-6)
+
+
+def test_phase_after_stop_extends_total():
+    timer = CaseTimer()
+    timer.stop()
+    total = timer.total
+    with timer.phase("allure"):
+        time.sleep(0.01)
+    timer.add("log", 0.5)
+    assert timer.total == pytest.approx(total + timer.phases["allure"] + 0.5)
+
+
+def test_module_helpers_without_timer():
+    with timing.phase("validation"):
+        timing.add("log", 1.0)
+    with timing.http_phase() as http:
+        http.ttfb = 0.1
+
+
+def test_http_phase_splits_connect_ttfb_and_download():
+    timer = CaseTimer()
+    with timing.activate(timer):
+        with timing.http_phase() as http:
+            timing.add("http.connect", 0.01)
+            time.sleep(0.02)
+            http.ttfb = 0.05
+        with timing.http_phase():
+            pass
+    assert timer.phases["http.ttfb"] == pytest.approx(0.04)
+    assert set(timer.phases) == {"http.connect", "http.ttfb", "http.download", "http"}
+
+
+def test_report_aggregates_by_file_and_route():
+    report = TimingReport()
+    report.configure(enabled=True)
+    for route, seconds in [("/a", 0.1), ("/a", 0.3), ("/b", 0.2)]:
+        timer = report.new_timer()
+        timer.add("http", seconds)
+        timer.stop()
+        report.record(f"f.yaml::{route}", "f.yaml", route, timer)
+    routes = report.aggregate("route")
+    assert routes["/a"]["count"] == 2
+    assert routes["/a"]["phases"]["http"] == pytest.approx(0.4)
+    assert report.aggregate("file")["f.yaml"]["count"] == 3
+    lines = report.summary(top=1)
+    assert lines[0].startswith("用例数: 3")
+    assert lines[-1].startswith("  /a  2次")
+    report.configure(enabled=False)
+    assert report.new_timer() is None and report.cases == []
+
+
+def test_timing_json_export(run_yaml, tmp_path):
+    content = """
+    tests:
+      test_echo:
+        method: get
+        route: /api/echo
+        Validate:
+          expectcode: 200
+    """
+    run_yaml(content, "--timing-json", "timing.json").assert_outcomes(passed=1)
+    data = json.loads((tmp_path / "timing.json").read_text(encoding="utf-8"))
+    case, = data["cases"]
+    assert case["route"] == "GET /api/echo"
+    assert {"prepare", "validation", "logging", "other"} <= set(case["phases"])
+    assert any(name.startswith("http") for name in case["phases"])
+    assert sum(case["phases"].values()) == pytest.approx(case["total"], abs=1e-4)
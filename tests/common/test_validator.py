@@ -0,0 +1,99 @@
+"""响应校验：Validate块编译为检查项，常量预期值只转换一次，含变量的预期值取自渲染结果"""
+import re
+from datetime import timedelta
+import pytest
+from common.json import json
+from common.json_path import JsonPath
+from common.report import recording
+from common.response import ParsedResponse
+from common.validator import compile_validate
+
+BODY = {"code": 0, "msg": "发送成功", "data": {"id": 3, "price": "12.5", "tags": ["vip", "new"],
+                                          "user": {"name": "张三", "age": 20},
+                                          "list": [{"id": 1}, {"id": 2}]}}
+
+
+def response(body=BODY, status_code=200, ms=20):
+    content = body if isinstance(body, bytes) else json.dumps(body, ensure_ascii=False).encode("utf-8")
+    return ParsedResponse(status_code, {}, {}, content, timedelta(milliseconds=ms))
+
+
+def results(validate, r=None, rendered=None):
+    return [(result.check, result.target, result.passed) for result in compile_validate(validate).run(r or response(), rendered)]
+
+
+def test_constants_prepared_at_compile_time():
+    validator = compile_validate({"expectcode": "200", "regularcheck": r"id\": (\d+)",
+                                  "jsonpath_check": {"$.data.id": 3}, "resultcheck": "${msg}"})
+    entries = {key: (dynamic, prepared) for key, _, dynamic, _, prepared, _ in validator.entries}
+    assert entries["expectcode"] == (False, 200)
+    assert isinstance(entries["regularcheck"][1], re.Pattern)
+    assert isinstance(entries["jsonpath_check"][1][0][1], JsonPath)
+    # 含变量的预期值在执行时转换
+    assert entries["resultcheck"] == (True, None)
+
+
+def test_nothing_to_check():
+    assert compile_validate(None) is None and compile_validate({}) is None
+    assert compile_validate({"resultcheck": "", "jsonpath_check": None, "unknown": 1}) is None
+
+
+@pytest.mark.parametrize("validate, passed", [
+    ({"expectcode": 200}, True),
+    ({"expectcode": 201}, False),
+    ({"resultcheck": "张三"}, True),
+    ({"resultcheck": '"code": 0'}, True),
+    ({"resultcheck": "李四"}, False),
+    ({"regularcheck": r"\"id\": \d+"}, True),
+    ({"jsonpath_check": {"$.data.user.name": "张三"}}, True),
+    ({"jsonpath_check": {"$.data.list[*].id": [1, 2]}}, True),
+    ({"jsonpath_check": {"$.data.missing": 1}}, False),
+    ({"contains": {"$.data.tags": "vip"}}, True),
+    ({"contains": {"$.data.user": {"age": 20}}}, True),
+    ({"contains": {"$.msg": "成功"}}, True),
+    ({"contains": {"$.data.tags": ["vip", "old"]}}, False),
+    ({"range": {"$.data.price": [10, 20]}}, True),
+    ({"range": {"$.data.list[*].id": {"min": 2}}}, False),
+    ({"length": {"$.data.tags": 2}}, True),
+    ({"length": {"$.data.list[*]": {"max": 1}}}, False),
+    ({"length": {"$.data.id": 1}}, False),
+    ({"max_response_time": 100}, True),
+    ({"max_response_time": 10}, False),
+])
+def test_checks(validate, passed):
+    assert [result[2] for result in results(validate)] == [passed]
+
+
+def test_invalid_expected_value_fails_the_check():
+    validator = compile_validate({"expectcode": "abc", "regularcheck": "(", "range": {"$.code": "x"}})
+    failed = validator.run(response())
+    assert [(r.check, r.passed) for r in failed] == [("expectcode", False), ("regularcheck", False), ("range", False)]
+    assert "预期响应码无效" in failed[0].message
+
+
+def test_non_json_response():
+    r = response(b"<html>ok</html>")
+    assert results({"resultcheck": "ok", "jsonpath_check": {"$.a": 1}}, r) == [
+        ("resultcheck", "", True), ("jsonpath_check", "$.a", False)]
+
+
+def test_dynamic_expected_from_rendered_block():
+    validate = {"expectcode": "${code}", "jsonpath_check": {"$.data.id": "${id}"}}
+    assert results(validate, rendered={"expectcode": "200", "jsonpath_check": {"$.data.id": 3}}) == [
+        ("expectcode", "", True), ("jsonpath_check", "$.data.id", True)]
+    # 渲染为空的断言不执行
+    assert results(validate, rendered={"expectcode": "", "jsonpath_check": {"$.data.id": 4}}) == [
+        ("jsonpath_check", "$.data.id", False)]
+
+
+def test_fail_fast_and_cost():
+    validator = compile_validate({"expectcode": 500, "resultcheck": "张三"})
+    assert len(validator.run(response(), fail_fast=True)) == 1
+    assert all(result.cost >= 0 for result in validator.run(response()))
+
+
+def test_check_reports_every_failure():
+    validator = compile_validate({"expectcode": 500, "resultcheck": "张三", "jsonpath_check": {"$.code": 1}})
+    with recording() as recorder:
+        validator.check(response())
+    assert len(recorder.failures) == 2 and "响应码校验失败" in recorder.failures[0]
@@ -0,0 +1,73 @@
+"""
+测试公共fixture
+YAML用例的端到端测试在子进程中执行pytest：加载框架的conftest，并注册指向本地替身服务的stub环境；
+环境配置了redis时使用fakeredis代替Redis服务。
+"""
+import os
+import re
+import subprocess
+import sys
+import textwrap
+import typing as t
+from pathlib import Path
+import pytest
+from tests.stub_server import StubServer
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# 子进程中用fakeredis的内存服务代替Redis连接池
+FAKE_REDIS = """
+import fakeredis, redis
+_server = fakeredis.FakeServer()
+
+
+class _FakePool(redis.ConnectionPool):
+    def __init__(self, **kwargs):
+        kwargs.pop("health_check_interval", None)
+        connection_class = getattr(fakeredis, "FakeRedisConnection", None) or fakeredis.FakeConnection
+        super().__init__(connection_class=connection_class, server=_server, **kwargs)
+
+
+redis.BlockingConnectionPool = _FakePool
+"""
+
+
+@pytest.fixture(scope="session")
+def stub_server():
+    server = StubServer().start()
+    yield server
+    server.stop()
+
+
+class YamlRun:
+    """一次YAML用例执行的结果"""
+    def __init__(self, proc: subprocess.CompletedProcess):
+        self.proc = proc
+        self.output = proc.stdout + proc.stderr
+        self.outcomes: t.Dict[t.Text, int] = {}
+        for count, outcome in re.findall(r"(\d+) (passed|failed|errors?|skipped|deselected)", self.output):
+            self.outcomes[outcome.rstrip("s") if outcome.startswith("error") else outcome] = int(count)
+
+    def assert_outcomes(self, passed: int = 0, failed: int = 0, error: int = 0) -> None:
+        actual = {k: self.outcomes.get(k, 0) for k in ("passed", "failed", "error")}
+        assert actual == {"passed": passed, "failed": failed, "error": error}, self.output
+
+
+@pytest.fixture
+def run_yaml(tmp_path, stub_server):
+    """在子进程中执行YAML用例：run_yaml(yaml文本, *pytest参数, env=额外的环境配置)"""
+    def run(content: t.Text, *args: t.Text, env: t.Optional[t.Dict] = None, name: t.Text = "test_case.yaml") -> YamlRun:
+        (tmp_path / name).write_text(textwrap.dedent(content), encoding="utf-8")
+        config = {"baseurl": stub_server.url, **(env or {})}
+        plugin = f"from config.environments import ENVIRONMENTS\nENVIRONMENTS['stub'] = {config!r}\n"
+        if "redis" in config:
+            pytest.importorskip("fakeredis")
+            plugin += FAKE_REDIS
+        (tmp_path / "stub_env.py").write_text(plugin, encoding="utf-8")
+        environ = {**os.environ, "PYTHONPATH": os.pathsep.join([str(ROOT), str(tmp_path)])}
+        proc = subprocess.run(
+            [sys.executable, "-m", "pytest", "-p", "conftest", "-p", "stub_env", "-p", "no:faker",
+             "-p", "no:cacheprovider", "-q", "-rA", name, "--env", "stub", *args],
+            cwd=tmp_path, env=environ, capture_output=True, text=True, timeout=120)
+        return YamlRun(proc)
+    return run
@@ -0,0 +1,117 @@
+"""
+本地替身服务
+在后台线程中启动的HTTP服务，供引擎、会话隔离、压测和登录凭证缓存等测试使用，不依赖外部环境：
+    /api/login          登录，返回新的token并设置Cookie sessionid
+    /api/me             校验Authorization中的token或Cookie sessionid，未登录或token已吊销时返回401
+    /api/revoke         吊销全部已签发的token
+    /api/status/<code>  返回指定的状态码
+    其他路径             回显请求：方法、路径、查询参数（列表）、Cookie、请求头和请求体
+"""
+import itertools
+import json
+import re
+import threading
+import typing as t
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, code: int, obj: t.Any, headers: t.Optional[t.Dict] = None) -> None:
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.handle_any()
+
+    def do_POST(self):
+        self.handle_any()
+
+    def handle_any(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            body = json.loads(raw) if raw else None
+        except ValueError:
+            body = raw.decode("utf-8", errors="replace")
+        url = urlsplit(self.path)
+        server: StubServer = self.server.stub
+        server.requests.append((self.command, self.path, self.headers.get("Cookie")))
+        if url.path == "/api/login":
+            token = server.issue()
+            self._send(200, {"code": 0, "msg": "登录成功", "data": {"token": token}},
+                       {"Set-Cookie": f"sessionid=s{token.rsplit('-', 1)[1]}; Path=/"})
+        elif url.path == "/api/me":
+            token = (self.headers.get("Authorization") or "").replace("Bearer ", "")
+            # 登录设置的Cookie sessionid=s<N>对应token tok-<N>
+            session = re.search(r"sessionid=s(\d+)", self.headers.get("Cookie") or "")
+            if token in server.tokens or (session and f"tok-{session.group(1)}" in server.tokens):
+                self._send(200, {"code": 0, "data": {"token": token}})
+            else:
+                self._send(401, {"code": 401, "msg": "unauthorized"})
+        elif url.path == "/api/revoke":
+            server.tokens.clear()
+            self._send(200, {"code": 0})
+        elif url.path.startswith("/api/status/"):
+            code = int(url.path.rsplit("/", 1)[1])
+            self._send(code, {"code": code})
+        else:
+            self._send(200, {
+                "code": 0,
+                "method": self.command,
+                "path": url.path,
+                "query": parse_qs(url.query),
+                "cookie": self.headers.get("Cookie"),
+                "headers": dict(self.headers),
+                "data": body,
+            })
+
+
+class StubServer:
+    """替身服务，url形如 http://127.0.0.1:<随机端口>（IP地址的host，与环境配置一致）"""
+    def __init__(self):
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.stub = self
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        # 已签发且未吊销的token
+        self.tokens: t.Set[t.Text] = set()
+        # 收到的请求：(方法, 路径和查询参数, Cookie)
+        self.requests: t.List[t.Tuple[t.Text, t.Text, t.Optional[t.Text]]] = []
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="stub-server", daemon=True)
+
+    def issue(self) -> t.Text:
+        with self._lock:
+            token = f"tok-{next(self._counter)}"
+            self.tokens.add(token)
+            return token
+
+    def start(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+if __name__ == '__main__':
+    stub = StubServer().start()
+    print(f"替身服务：{stub.url}")
+    try:
+        stub._thread.join()
+    except KeyboardInterrupt:
+        stub.stop()
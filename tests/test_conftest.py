@@ -0,0 +1,44 @@
+"""YAML用例插件：参数化用例共享收集结果，执行后释放运行期状态"""
+import json
+
+PARAMETERIZED = """
+tests:
+  test_echo:
+    method: get
+    route: /api/echo
+    RequestData:
+      params: {id: "${id}"}
+    parameters:
+      - {id: 1}
+      - {id: 2}
+      - {id: 3}
+    Validate:
+      expectcode: 200
+"""
+
+# 会话结束时检查所有用例，结果写入items.json
+INSPECT_ITEMS = """
+import json
+
+
+def pytest_sessionfinish(session):
+    items = session.items
+    state = ("request", "db_client", "redis_client", "future", "timer")
+    result = {
+        "count": len(items),
+        "shared": all(i.spec is items[0].spec and i.template is items[0].template
+                      and i.validator is items[0].validator for i in items),
+        "params": [i.param for i in items],
+        "released": all(getattr(i, name) is None for i in items for name in state),
+    }
+    with open("items.json", "w") as f:
+        json.dump(result, f)
+"""
+
+
+def test_parameterized_items_are_light(run_yaml, tmp_path):
+    (tmp_path / "inspect_items.py").write_text(INSPECT_ITEMS, encoding="utf-8")
+    for args in [(), ("--workers", "2"), ("--timing",)]:
+        run_yaml(PARAMETERIZED, "-p", "inspect_items", *args).assert_outcomes(passed=3)
+        result = json.loads((tmp_path / "items.json").read_text())
+        assert result == {"count": 3, "shared": True, "params": [{"id": 1}, {"id": 2}, {"id": 3}], "released": True}
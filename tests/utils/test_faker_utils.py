@@ -0,0 +1,104 @@
+"""faker数据池：相同种子生成相同数据，唯一字段不重复，可能的取值用完时报错"""
+import threading
+import pytest
+from utils.faker_utils import FAKER_FUNCS, FakerPool, UniqueFilter, parse_faker_key
+
+pytest.importorskip("faker")
+
+
+def draw(pool, name, count, args=()):
+    return [pool.get(name, args) for _ in range(count)]
+
+
+def test_same_seed_same_values():
+    pool = FakerPool()
+    pool.configure(seed=42, batch_size=8)
+    first = draw(pool, "phone", 20) + draw(pool, "random_str", 5, (12,))
+    # 与批大小和其他生成器的取值顺序无关
+    pool.configure(seed=42, batch_size=64)
+    draw(pool, "name", 3)
+    assert draw(pool, "phone", 20) + draw(pool, "random_str", 5, (12,)) == first
+    pool.configure(seed=43)
+    assert draw(pool, "phone", 20) != first[:20]
+    # 多进程执行时各进程使用相同种子也生成不同的数据
+    pool.configure(seed=42, namespace="gw1")
+    assert draw(pool, "phone", 20) != first[:20]
+
+
+def test_random_seed_is_exposed():
+    pool = FakerPool()
+    seed = pool.seed
+    values = draw(pool, "email", 5)
+    pool.configure(seed=seed)
+    assert draw(pool, "email", 5) == values
+
+
+def test_unique_values():
+    pool = FakerPool()
+    pool.configure(seed=1, unique=("random_str",), batch_size=512, capacity=1000)
+    values = draw(pool, "random_str", 20000, (3,))
+    assert len(set(values)) == len(values)
+    stats = pool.stats()["random_str(3)"]
+    assert stats["generated"] >= 20000 and stats["duplicates"] > 0 and stats["filter_bytes"] > 0
+    # 不要求唯一的函数不经过过滤器
+    draw(pool, "phone", 1)
+    assert pool.stats()["phone"]["filter_bytes"] == 0
+
+
+def test_unique_values_across_threads():
+    pool = FakerPool()
+    pool.configure(seed=1, batch_size=16)
+    results = []
+
+    def worker():
+        results.extend(draw(pool, "phone", 500))
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 4000 and len(set(results)) == 4000
+
+
+def test_exhausted_unique_values():
+    pool = FakerPool()
+    pool.configure(seed=1, unique=("random_int",))
+    assert sorted(draw(pool, "random_int", 5, (1, 5))) == [1, 2, 3, 4, 5]
+    with pytest.raises(ValueError, match="可能的取值已用完"):
+        pool.get("random_int", (1, 5))
+
+
+def test_unique_filter_grows_without_passing_duplicates():
+    unique = UniqueFilter(capacity=100)
+    added = sum(unique.add(i) for i in range(2000))
+    assert len(unique.filters) > 1 and added > 1990
+    assert not any(unique.add(i) for i in range(2000))
+
+
+def test_invalid_names():
+    pool = FakerPool()
+    with pytest.raises(ValueError):
+        pool.configure(unique=("nope",))
+    with pytest.raises(KeyError):
+        pool.get("nope")
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ("phone", ("phone", ())),
+    ("random_str(12)", ("random_str", (12,))),
+    ("random_int(1, 10)", ("random_int", (1, 10))),
+    ("price(0, 99.5, 1)", ("price", (0, 99.5, 1))),
+])
+def test_parse_faker_key(spec, expected):
+    assert parse_faker_key(spec) == expected
+    assert expected[0] in FAKER_FUNCS
+
+
+def test_extra_arguments_ignored():
+    pool = FakerPool()
+    pool.configure(seed=5)
+    with_args = [pool.get("phone", (1,)), pool.get("random_str", (6, 9))]
+    pool.configure(seed=5)
+    # 与原有写法一致：多余的参数丢弃，与不带参数共用一个生成器
+    assert with_args == [pool.get("phone"), pool.get("random_str", (6,))]
+    assert len(with_args[1]) == 6 and list(pool.stats()) == ["phone", "random_str(6)"]
@@ -0,0 +1,24 @@
+"""启动耗时检查：导入conftest时不加载延迟导入的依赖"""
+from utils.import_budget import DEFERRED_MODULES, main, measure
+
+
+def test_conftest_defers_heavy_dependencies():
+    total, entries, loaded = measure("conftest")
+    assert loaded == []
+    assert any(name == "conftest" for _, _, name in entries)
+    # 框架自身的导入耗时应远低于1秒
+    assert 0 < total < 1.0
+
+
+def test_within_default_budget(capsys):
+    assert main([]) == 0, capsys.readouterr().err
+    # 超出预算时返回非0并输出原因
+    assert main(["--budget", "0"]) == 1
+    assert "超出启动耗时预算" in capsys.readouterr().err
+
+
+def test_eager_import_is_reported(tmp_path, monkeypatch):
+    (tmp_path / "eager_module.py").write_text("import json\nimport fractions\n", encoding="utf-8")
+    monkeypatch.setenv("PYTHONPATH", str(tmp_path))
+    monkeypatch.setattr("utils.import_budget.DEFERRED_MODULES", DEFERRED_MODULES + ("fractions",))
+    assert "fractions" in measure("eager_module")[2]
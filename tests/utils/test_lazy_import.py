@@ -0,0 +1,28 @@
+"""延迟导入：第一次访问属性时才导入，未安装时附加提示"""
+import sys
+import pytest
+from utils.lazy_import import lazy_import
+
+
+@pytest.fixture
+def slow_module(tmp_path, monkeypatch):
+    (tmp_path / "slow_dependency.py").write_text("VALUE = 42\n", encoding="utf-8")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield "slow_dependency"
+    sys.modules.pop("slow_dependency", None)
+
+
+def test_imported_on_first_attribute_access(slow_module):
+    module = lazy_import(slow_module)
+    assert not module.loaded and slow_module not in sys.modules
+    assert module.VALUE == 42
+    assert module.loaded and slow_module in sys.modules
+    assert "loaded" in repr(module)
+
+
+def test_missing_module_hint():
+    module = lazy_import("not_installed_module", "pip install not_installed_module")
+    with pytest.raises(ImportError, match="pip install not_installed_module"):
+        module.anything
+    with pytest.raises(ImportError):
+        lazy_import("not_installed_module").anything
@@ -0,0 +1,59 @@
+"""日志：调用线程只合并参数并入队，计时钩子由使用方注入，utils不依赖common"""
+import logging
+import queue
+import subprocess
+import sys
+from contextlib import contextmanager
+from tests.conftest import ROOT
+from utils.logger import CaseQueueHandler, lazy
+
+
+def record(msg, *args):
+    return logging.LogRecord("apitest", logging.INFO, __file__, 1, msg, args, None)
+
+
+def test_message_merged_in_calling_thread():
+    handler = CaseQueueHandler(queue.SimpleQueue())
+    data = {"a": 1}
+    handler.set_test_id("test_case.yaml::登录")
+    handler.handle(record("参数: %s", data))
+    data["a"] = 2
+    queued = handler.queue.get_nowait()
+    assert (queued.msg, queued.args, queued.test_id) == ("参数: {'a': 1}", None, "test_case.yaml::登录")
+
+
+def test_phase_hook_injected():
+    phases = []
+
+    @contextmanager
+    def hook(name):
+        phases.append(name)
+        yield
+    handler = CaseQueueHandler(queue.SimpleQueue())
+    handler.handle(record("a"))
+    handler.set_phase_hook(hook)
+    handler.handle(record("b"))
+    handler.set_phase_hook(None)
+    handler.handle(record("c"))
+    assert phases == ["logging"]
+
+
+def test_lazy_evaluated_only_when_enabled():
+    calls = []
+    logger = logging.getLogger("apitest.test_lazy")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    handler = CaseQueueHandler(queue.SimpleQueue())
+    logger.addHandler(handler)
+    try:
+        logger.debug("内容: %s", lazy(calls.append, "debug"))
+        logger.info("内容: %s", lazy(calls.append, "info"))
+    finally:
+        logger.removeHandler(handler)
+    assert calls == ["info"]
+
+
+def test_logger_does_not_import_common():
+    code = "import sys, utils.logger; print([m for m in sys.modules if m == 'common' or m.startswith('common.')])"
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert proc.stdout.strip() == "[]"
@@ -1,100 +1,372 @@
 """
 随机生成数据
+Faker导入和初始化所有provider较慢（约0.1s），在第一次生成数据时才创建。
+
+用例中的${faker.xxx}由全局数据池faker_pool生成：
+    - 每个生成函数（含参数）一个生成器，使用独立的Faker实例，按批预先生成，取值时只从缓冲中弹出；
+    - 生成器的随机种子由全局种子派生，相同种子、相同执行顺序下生成的数据相同，失败时可以用同一种子复现；
+    - 手机号、邮箱等有唯一约束的字段经过布隆过滤器去重，同一次执行中不会重复（避免创建用户时的409），
+      过滤器每个值约占2字节，百万级的数据也只占用几MB内存。
 """
-from faker import Faker
-from faker.providers import BaseProvider
+import hashlib
+import inspect
+import math
 import random
 import string
+import threading
+import typing as t
+from collections import deque
+from functools import lru_cache
+
+_fake = None
+_fake_lock = threading.Lock()
+
+# 每批预先生成的数量
+DEFAULT_BATCH_SIZE = 256
+# 默认保证唯一的生成函数
+DEFAULT_UNIQUE = ("phone", "email", "username", "ssn")
+# 唯一值过滤器的初始容量和误判率，写满后追加容量翻倍的过滤器
+DEFAULT_CAPACITY = 100_000
+DEFAULT_ERROR_RATE = 0.001
+# 连续生成重复值的上限，超过时认为可能的取值已用完
+MAX_DUPLICATES = 1000
+
+
+def new_fake(seed: t.Any = None):
+    """创建Faker实例，seed不为None时使用独立的随机种子"""
+    from faker import Faker
+    fake = Faker("zh_CN")
+    fake.add_provider(_custom_provider())
+    if seed is not None:
+        fake.seed_instance(seed)
+    return fake
+
+
+def get_fake():
+    """全局的Faker实例，第一次调用时创建"""
+    global _fake
+    if _fake is None:
+        with _fake_lock:
+            if _fake is None:
+                _fake = new_fake()
+    return _fake
+
+
+def __getattr__(name):
+    # 兼容 from utils.faker_utils import fake
+    if name == "fake":
+        return get_fake()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _custom_provider():
+    from faker.providers import BaseProvider
 
-fake = Faker("zh_CN")
+    class CustomProvider(BaseProvider):
+        # 使用Faker实例自己的随机数生成器，seed_instance后结果可复现
 
-class CustomProvider(BaseProvider):
-    def phone_number(self):
-        """生成大陆手机号"""
-        prefixes = ["130", "131", "132", "133", "134", "135", "136", "137", "138", "139",
-                    "150", "151", "152", "153", "155", "156", "157", "158", "159",
-                    "170", "171", "173", "176", "177", "178",
-                    "180", "181", "182", "183", "184", "185", "186", "187", "188", "189"]
-        return f"{random.choice(prefixes)}{''.join([str(random.randint(0, 9)) for _ in range(8)])}"
+        def phone_number(self):
+            """生成大陆手机号"""
+            prefixes = ["130", "131", "132", "133", "134", "135", "136", "137", "138", "139",
+                        "150", "151", "152", "153", "155", "156", "157", "158", "159",
+                        "170", "171", "173", "176", "177", "178",
+                        "180", "181", "182", "183", "184", "185", "186", "187", "188", "189"]
+            rng = self.generator.random
+            return f"{rng.choice(prefixes)}{rng.randrange(10 ** 8):08d}"
 
-    def random_int(self, min_val=0, max_val=1000, step=""):
-        """生成随机整数"""
-        return random.randint(min_val, max_val)
+        def random_int(self, min_val=0, max_val=1000, step=""):
+            """生成随机整数"""
+            return self.generator.random.randint(min_val, max_val)
 
-    def random_str(self, length: int = 8) -> str:
-        """生成随机字符串"""
-        return ''.join(random.choices(string.ascii_letters + string.digits, k=length))
+        def random_str(self, length: int = 8) -> str:
+            """生成随机字符串"""
+            return ''.join(self.generator.random.choices(string.ascii_letters + string.digits, k=length))
 
-    def price(self, min_val=0, max_val=1000, decimal_places=2):
-        return round(random.uniform(min_val, max_val), decimal_places)
+        def price(self, min_val=0, max_val=1000, decimal_places=2):
+            return round(self.generator.random.uniform(min_val, max_val), decimal_places)
 
-fake.add_provider(CustomProvider)
+    return CustomProvider
 
-def random_phone():
+
+def random_phone(fake=None):
     """生成随机电话号码"""
-    return fake.phone_number()
+    return (fake or get_fake()).phone_number()
 
-def random_name():
+def random_name(fake=None):
     """生成随机姓名"""
-    return fake.name()
+    return (fake or get_fake()).name()
 
-def random_email():
+def random_email(fake=None):
     """生成随机email"""
-    return fake.email()
+    return (fake or get_fake()).email()
 
-def random_int(min_val=0, max_val=1000):
+def random_int(min_val=0, max_val=1000, fake=None):
     """生成随机整数"""
-    return fake.random_int(min_val, max_val)
+    return (fake or get_fake()).random_int(min_val, max_val)
 
-def random_str(length: int = 8) -> str:
+def random_str(length: int = 8, fake=None) -> str:
     """生成随机字符串"""
-    return fake.random_str(length)
+    return (fake or get_fake()).random_str(length)
 
-def random_address():
+def random_address(fake=None):
     """生成随机地址"""
-    return fake.address()
+    return (fake or get_fake()).address()
 
-def random_ssn():
+def random_ssn(fake=None):
     """生成随机身份证号"""
-    return fake.ssn()
+    return (fake or get_fake()).ssn()
 
-def random_username():
+def random_username(fake=None):
     """生成随机用户名"""
-    return fake.user_name()
+    return (fake or get_fake()).user_name()
 
-def random_password():
+def random_password(fake=None):
     """生成随机密码"""
-    return fake.password()
+    return (fake or get_fake()).password()
 
-def random_birthdate():
+def random_birthdate(fake=None):
     """生成随机生日"""
-    return fake.date_of_birth()
+    return (fake or get_fake()).date_of_birth()
 
-def random_sex():
+def random_sex(fake=None):
     """生成随机性别"""
-    return fake.simple_profile()['sex']
+    return (fake or get_fake()).simple_profile()['sex']
 
-def random_ipv4():
+def random_ipv4(fake=None):
     """生成随机IPV4地址"""
-    return fake.ipv4()
+    return (fake or get_fake()).ipv4()
 
-def random_domain():
+def random_domain(fake=None):
     """生成随机域名"""
-    return fake.domain_name()
+    return (fake or get_fake()).domain_name()
 
-def random_company():
+def random_company(fake=None):
     """生成随机公司名"""
-    return fake.company()
+    return (fake or get_fake()).company()
 
-def random_price(min_val=0, max_val=1000, decimal_places=2):
+def random_price(min_val=0, max_val=1000, decimal_places=2, fake=None):
     """生成随机价格"""
-    return fake.price(min_val=min_val, max_val=max_val, decimal_places=decimal_places)
+    return (fake or get_fake()).price(min_val=min_val, max_val=max_val, decimal_places=decimal_places)
+
+
+# ${faker.xxx}可用的生成函数，参数写法如${faker.random_str(12)}
+FAKER_FUNCS: t.Dict[t.Text, t.Callable] = {
+    "phone": random_phone,
+    "name": random_name,
+    "email": random_email,
+    "random_int": random_int,
+    "random_str": random_str,
+    "address": random_address,
+    "ssn": random_ssn,
+    "username": random_username,
+    "password": random_password,
+    "birthdate": random_birthdate,
+    "sex": random_sex,
+    "ip": random_ipv4,
+    "domain": random_domain,
+    "company": random_company,
+    "price": random_price,
+}
+
+
+def _parse_arg(arg: t.Text) -> t.Any:
+    for convert in (int, float):
+        try:
+            return convert(arg)
+        except ValueError:
+            pass
+    return arg.strip("'\"")
+
+
+@lru_cache(maxsize=None)
+def _arity(name: t.Text) -> int:
+    """生成函数可接受的位置参数个数（不含fake）"""
+    return sum(1 for p in inspect.signature(FAKER_FUNCS[name]).parameters.values()
+               if p.name != "fake" and p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD))
+
+
+@lru_cache(maxsize=256)
+def parse_faker_key(spec: t.Text) -> t.Tuple[t.Text, t.Tuple]:
+    """解析faker变量，如 random_int(1, 10) -> ("random_int", (1, 10))"""
+    name, _, rest = spec.partition("(")
+    args = tuple(_parse_arg(arg.strip()) for arg in rest.rstrip(")").split(",") if arg.strip())
+    return name.strip(), args
+
+
+class _BloomFilter:
+    """布隆过滤器：判断为不存在时一定不存在，判断为存在时有error_rate的概率误判"""
+    __slots__ = ("capacity", "error_rate", "count", "size", "hashes", "bits")
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.count = 0
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, digest: bytes) -> range:
+        # 双重哈希：第i个位置为 h1 + i * h2
+        h1 = int.from_bytes(digest[:8], "little") % self.size
+        h2 = int.from_bytes(digest[8:], "little") % self.size | 1
+        return range(h1, h1 + self.hashes * h2, h2)
+
+    def __contains__(self, digest: bytes) -> bool:
+        bits, size = self.bits, self.size
+        for p in self._positions(digest):
+            p %= size
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+    def add(self, digest: bytes) -> bool:
+        """记录值，判断为已存在时返回False（检查和写入在一次遍历中完成）"""
+        bits, size = self.bits, self.size
+        added = False
+        for p in self._positions(digest):
+            p %= size
+            mask = 1 << (p & 7)
+            if not bits[p >> 3] & mask:
+                bits[p >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+
+class UniqueFilter:
+    """可扩展的唯一值过滤器
+    当前的布隆过滤器写满后追加一个容量翻倍、误判率减半的过滤器，整体误判率不超过初始误判率的2倍。
+    误判只会让少量没出现过的值被当作重复丢弃，不会放过重复值。
+    """
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, error_rate: float = DEFAULT_ERROR_RATE):
+        self.filters = [_BloomFilter(capacity, error_rate)]
+
+    def add(self, value: t.Any) -> bool:
+        """记录值，值已经出现过时返回False"""
+        digest = hashlib.blake2b(repr(value).encode(), digest_size=16).digest()
+        *full, current = self.filters
+        if any(digest in f for f in full):
+            return False
+        if current.count >= current.capacity:
+            if digest in current:
+                return False
+            current = _BloomFilter(current.capacity * 2, current.error_rate / 2)
+            self.filters.append(current)
+        return current.add(digest)
+
+    @property
+    def memory(self) -> int:
+        """占用的字节数"""
+        return sum(len(f.bits) for f in self.filters)
+
+
+class _Generator:
+    """一个生成函数（含参数）的数据生成器"""
+    def __init__(self, name: t.Text, args: t.Tuple, seed: t.Any, batch_size: int,
+                 unique: t.Optional[UniqueFilter]):
+        self.name = name
+        self.func = FAKER_FUNCS[name]
+        self.args = args
+        self.fake = new_fake(seed)
+        self.batch_size = batch_size
+        self.unique = unique
+        self.buffer: t.Deque = deque()
+        self.lock = threading.Lock()
+        self.generated = 0
+        self.duplicates = 0
+
+    def _fill(self) -> None:
+        """预先生成一批数据"""
+        duplicates = 0
+        while len(self.buffer) < self.batch_size:
+            value = self.func(*self.args, fake=self.fake)
+            if self.unique is not None and not self.unique.add(value):
+                self.duplicates += 1
+                duplicates += 1
+                if duplicates > MAX_DUPLICATES:
+                    if self.buffer:
+                        return
+                    raise ValueError(f"faker.{self.name}连续{MAX_DUPLICATES}次生成重复的值，可能的取值已用完")
+                continue
+            duplicates = 0
+            self.buffer.append(value)
+            self.generated += 1
+
+    def next(self) -> t.Any:
+        with self.lock:
+            if not self.buffer:
+                self._fill()
+            return self.buffer.popleft()
+
+
+class FakerPool:
+    """全局faker数据池"""
+    def __init__(self):
+        self._generators: t.Dict[t.Tuple[t.Text, t.Tuple], _Generator] = {}
+        self._lock = threading.Lock()
+        self.configure()
+
+    def configure(self, seed: t.Any = None, unique: t.Iterable[t.Text] = DEFAULT_UNIQUE,
+                  batch_size: int = DEFAULT_BATCH_SIZE, capacity: int = DEFAULT_CAPACITY,
+                  namespace: t.Text = "") -> None:
+        """配置数据池，已生成的数据全部丢弃
+        :param seed: 随机种子，None时随机生成（通过seed属性读取，用于复现）
+        :param unique: 保证唯一的生成函数
+        :param batch_size: 每批预先生成的数量
+        :param capacity: 唯一值过滤器的初始容量
+        :param namespace: 多进程执行时的进程标识（如xdist的gw0），相同种子下各进程生成不同的数据
+        """
+        unknown = set(unique) - set(FAKER_FUNCS)
+        if unknown:
+            raise ValueError(f"未知的faker函数：{sorted(unknown)}，可选：{list(FAKER_FUNCS)}")
+        self.seed = seed if seed is not None else random.SystemRandom().randrange(2 ** 32)
+        self.unique = set(unique)
+        self.batch_size = batch_size
+        self.capacity = capacity
+        self.namespace = namespace
+        with self._lock:
+            self._generators = {}
+
+    def _seed_for(self, name: t.Text, args: t.Tuple) -> int:
+        """由全局种子派生生成器的种子，与其他生成器的取值顺序无关"""
+        key = f"{self.seed}:{self.namespace}:{name}:{args!r}".encode()
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+    def _generator(self, name: t.Text, args: t.Tuple) -> _Generator:
+        generator = self._generators.get((name, args))
+        if generator is None:
+            with self._lock:
+                generator = self._generators.get((name, args))
+                if generator is None:
+                    # 同一函数不同参数（如random_str(8)和random_str(12)）各自去重
+                    unique = UniqueFilter(self.capacity) if name in self.unique else None
+                    generator = _Generator(name, args, self._seed_for(name, args), self.batch_size, unique)
+                    self._generators[(name, args)] = generator
+        return generator
+
+    def get(self, name: t.Text, args: t.Tuple = ()) -> t.Any:
+        """取一个值，name不是faker函数时抛出KeyError
+        多出的参数丢弃（与原有写法一致，如${faker.phone(1)}等同于${faker.phone}）
+        """
+        if name not in FAKER_FUNCS:
+            raise KeyError(name)
+        return self._generator(name, args[:_arity(name)]).next()
+
+    def stats(self) -> t.Dict[t.Text, t.Dict[t.Text, int]]:
+        """每个生成器已生成的数量、丢弃的重复值数量和去重占用的内存"""
+        result = {}
+        for (name, args), g in list(self._generators.items()):
+            label = f"{name}({', '.join(map(str, args))})" if args else name
+            result[label] = {"generated": g.generated, "duplicates": g.duplicates,
+                             "filter_bytes": g.unique.memory if g.unique else 0}
+        return result
+
+
+# 全局faker数据池
+faker_pool = FakerPool()
+
 
 if __name__ == '__main__':
-    # print(random_phone())
-    # print(random_name())
-    # print(random_email())
-    # print(random_str(10))
-    # print(random_domain())
-    print(random_price(0, 2000000, 2))
-    # print(random_ipv4())
\ No newline at end of file
+    faker_pool.configure(seed=42)
+    print([faker_pool.get("phone") for _ in range(3)], faker_pool.get(*parse_faker_key("random_str(12)")))
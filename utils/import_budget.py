@@ -0,0 +1,76 @@
+"""
+启动耗时检查
+在新的解释器中用 -X importtime 导入conftest，统计框架自身的导入耗时（pytest和allure插件本来就会加载，不计入），
+并检查数据库、Redis、faker等延迟导入的依赖没有在启动时被加载。超出预算或依赖被提前加载时返回非0，可以放在CI中执行：
+    python -m utils.import_budget                  默认预算0.25秒
+    python -m utils.import_budget --budget 0.4 --top 20
+"""
+import argparse
+import os
+import subprocess
+import sys
+import typing as t
+
+# 应该在第一次使用时才导入的依赖
+DEFERRED_MODULES = ("faker", "mysql.connector", "redis", "openpyxl", "jsonpath", "aiohttp")
+# 执行conftest之前pytest已经加载的模块，不计入预算
+PRELOADED_MODULES = ("pytest", "allure")
+DEFAULT_BUDGET = 0.25
+
+_BASEDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(module: t.Text = "conftest") -> t.Tuple[float, t.List[t.Tuple[int, int, t.Text]], t.List[t.Text]]:
+    """在子进程中导入模块
+    :return: (模块的导入耗时（秒）, [(自身耗时us, 累计耗时us, 模块名)], 被提前加载的延迟依赖)
+    """
+    code = (f"import {', '.join(PRELOADED_MODULES)}, sys\n"
+            f"import {module}\n"
+            f"print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=_BASEDIR,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"导入{module}失败：\n{proc.stderr}")
+    entries = []
+    pending = []
+    total = 0
+    for line in proc.stderr.splitlines():
+        # import time:       self |  cumulative | imported package，子模块先于父模块输出，缩进表示层级
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        pending.append((int(self_us), int(cumulative_us), name.strip()))
+        if name.startswith("  "):
+            continue
+        # 顶层导入结束，只保留检查的模块导入的部分
+        if name.strip() == module:
+            total = int(cumulative_us)
+            entries = pending
+        pending = []
+    loaded = [m for m in proc.stdout.strip().split(",") if m]
+    return total / 1e6, entries, loaded
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m utils.import_budget", description="检查框架的启动导入耗时")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help=f"导入耗时预算（秒），默认{DEFAULT_BUDGET}")
+    parser.add_argument("--module", default="conftest", help="检查的模块，默认conftest")
+    parser.add_argument("--top", type=int, default=10, help="输出累计耗时最长的模块数量")
+    args = parser.parse_args(argv)
+
+    total, entries, loaded = measure(args.module)
+    print(f"{args.module} 导入耗时：{total:.3f}s（预算{args.budget:.3f}s）")
+    for self_us, cumulative_us, name in sorted(entries, key=lambda e: e[1], reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f}ms  {self_us / 1000:8.1f}ms  {name}")
+    failed = False
+    if total > args.budget:
+        print(f"超出启动耗时预算：{total:.3f}s > {args.budget:.3f}s", file=sys.stderr)
+        failed = True
+    if loaded:
+        print(f"以下依赖应在使用时才导入，但在启动时被加载：{', '.join(loaded)}", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
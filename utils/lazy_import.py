@@ -0,0 +1,63 @@
+"""
+延迟导入
+mysql.connector、redis等依赖导入较慢，而大部分执行（如只调试一个YAML文件）用不到数据库或Redis。
+lazy_import返回模块的代理，第一次访问模块属性时才真正导入，调用方按原有方式使用即可：
+    mysql = lazy_import("mysql.connector")
+    conn = mysql.connect(...)       # 此时才导入mysql.connector
+    except mysql.Error: ...
+依赖未安装时在第一次使用时抛出ImportError，不影响不使用该依赖的用例。
+"""
+import importlib
+import typing as t
+from types import ModuleType
+
+
+class LazyModule:
+    """模块代理，第一次访问属性时导入模块"""
+    __slots__ = ("_name", "_hint", "_module")
+
+    def __init__(self, name: t.Text, hint: t.Optional[t.Text] = None):
+        self._name = name
+        # 未安装时的提示，如 pip install redis
+        self._hint = hint
+        self._module: t.Optional[ModuleType] = None
+
+    def _load(self) -> ModuleType:
+        # 导入系统本身有模块级的锁，多个线程同时首次访问时只会执行一次
+        if self._module is None:
+            try:
+                self._module = importlib.import_module(self._name)
+            except ImportError as e:
+                if self._hint is None:
+                    raise
+                raise ImportError(f"{e}，{self._hint}") from e
+        return self._module
+
+    def __getattr__(self, attr: t.Text) -> t.Any:
+        return getattr(self._load(), attr)
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __repr__(self):
+        return f"<LazyModule {self._name!r} {'loaded' if self.loaded else 'not loaded'}>"
+
+
+def lazy_import(name: t.Text, hint: t.Optional[t.Text] = None) -> t.Any:
+    """延迟导入模块
+    :param name: 模块名，可以是子模块，如mysql.connector
+    :param hint: 模块未安装时附加到ImportError中的提示
+    """
+    return LazyModule(name, hint)
+
+
+if __name__ == '__main__':
+    import sys
+    fractions = lazy_import("fractions")
+    print(fractions, "fractions" in sys.modules)
+    print(fractions.Fraction(1, 3), fractions, "fractions" in sys.modules)
+    try:
+        lazy_import("not_installed_module", "pip install not_installed_module").anything
+    except ImportError as e:
+        print(e)
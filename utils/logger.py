@@ -1,60 +1,136 @@
 """
 日志类
-该模块用于初始化和配置日志记录器，提供按时间轮转的日志文件功能。
+该模块用于初始化和配置日志记录器。
+日志先放入队列，由后台线程序列化并写入一个JSON Lines文件（每次执行一个文件），每行记录所属的用例，
+执行结束时写出按用例的偏移量索引，可以用命令行快速取出某条用例的日志：
+    python -m utils.logger list                              列出最近一次执行的用例
+    python -m utils.logger show "test_login.yaml::登录"        输出某条用例的日志（用例ID或其中一部分）
+    python -m utils.logger show 登录 --file logs/testcase_20240101_120000_123.jsonl
+调用线程只做参数合并，消息使用%s占位符或lazy()延迟计算，日志级别关闭时不产生任何开销。
 """
-import os
+import argparse
+import atexit
+import glob
+import json
 import logging
-import re
+import os
+import queue
 import sys
-from logging.handlers import BaseRotatingHandler
+from contextvars import ContextVar
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+# 当前上下文（线程/协程）正在执行的用例
+_test_id: ContextVar = ContextVar("log_test_id", default=None)
+
+
+class lazy:
+    """延迟计算的日志参数，只在日志级别开启、合并消息时才调用
+    logger.debug("响应内容: %s", lazy(json.dumps, data, ensure_ascii=False))
+    """
+    __slots__ = ("func", "args", "kwargs")
+
+    def __init__(self, func, *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self):
+        return str(self.func(*self.args, **self.kwargs))
+
 
-class CustomTestCaseRotatingHandler(BaseRotatingHandler):
-    """自定义按时间命名的日志处理器
-    继承自BaseRotatingHandler，实现按时间轮转日志文件的功能。
+class CaseQueueHandler(QueueHandler):
+    """把日志放入队列的处理器
+    在调用线程中合并消息参数并记录所属用例（参数对象之后被修改不影响日志），格式化和写文件在后台线程完成。
     """
-    def __init__(self, log_dir, base_filename, encoding=None):
-        # 日志目录
-        self.log_dir = log_dir
-        # 日志基础文件名
-        self.base_filename = base_filename
-        # 日志文件编码
-        self.encoding = encoding
-        # 用例名称
-        self.current_test_name = None
-
-        # 确保日志目录存在
-        os.makedirs(log_dir, exist_ok=True)
-
-        # 生成当前时间的日志文件名
-        current_time = datetime.now().strftime('%Y%m%d_%H%M%S')
-        log_file = os.path.join(log_dir, f"{base_filename}_{current_time}.log")
-
-        # 调用父类的构造函数
-        super().__init__(log_file, 'a', encoding, delay=False)
-
-    def set_test_name(self, test_name):
-        """设置当前测试用例名称，用于生成新的日志文件"""
-        if self.current_test_name != test_name:
-            self.current_test_name = test_name
-            # 生成包含用例名称和时间戳的新日志文件名
-            current_time = datetime.now().strftime('%Y%m%d_%H%M%S')
-            # 清理用例名称中的特殊字符，避免文件命名问题
-            safe_test_name = re.sub(r'[\\/*?:"<>|]', '_', test_name)
-            new_log_file = os.path.join(
-                self.log_dir,
-                f"{safe_test_name}_{current_time}.log"
-            )
-            # 切换到新的日志文件
+    def __init__(self, queue):
+        super().__init__(queue)
+        # 阶段计时钩子：phase_hook("logging")返回上下文管理器，由使用方注入（如conftest在开启--timing时注入）
+        self.phase_hook = None
+
+    def set_phase_hook(self, hook):
+        """设置记录入队耗时的计时钩子，None时不计时"""
+        self.phase_hook = hook
+
+    def set_test_id(self, test_id):
+        """设置当前上下文正在执行的用例，之后的日志都归属于该用例"""
+        _test_id.set(test_id)
+
+    # 兼容原有的调用方式
+    set_test_name = set_test_id
+
+    def prepare(self, record):
+        record.test_id = _test_id.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def handle(self, record):
+        if self.phase_hook is None:
+            return super().handle(record)
+        # 入队的耗时记入当前用例的logging阶段
+        with self.phase_hook("logging"):
+            return super().handle(record)
+
+
+class JsonLinesHandler(logging.Handler):
+    """JSON Lines日志文件，记录每条用例的日志在文件中的偏移量范围"""
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.stream = open(path, "ab")
+        self.offset = self.stream.tell()
+        # 用例ID -> [[起始偏移, 结束偏移], ...]，相邻的记录合并为一个范围
+        self.index = {}
+
+    def emit(self, record):
+        try:
+            entry = {
+                "ts": datetime.fromtimestamp(record.created).strftime('%Y-%m-%d %H:%M:%S,') + f"{int(record.msecs):03d}",
+                "level": record.levelname,
+                "test": getattr(record, "test_id", None),
+                "file": record.filename,
+                "line": record.lineno,
+                "thread": record.thread,
+                "msg": record.getMessage(),
+            }
+            if record.exc_text:
+                entry["exc"] = record.exc_text
+            line = (json.dumps(entry, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+            start = self.offset
+            self.stream.write(line)
+            self.offset += len(line)
+            if entry["test"] is not None:
+                ranges = self.index.setdefault(entry["test"], [])
+                if ranges and ranges[-1][1] == start:
+                    ranges[-1][1] = self.offset
+                else:
+                    ranges.append([start, self.offset])
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        if self.stream and not self.stream.closed:
+            self.stream.flush()
+
+    def close(self):
+        if self.stream and not self.stream.closed:
             self.stream.close()
-            self.baseFilename = new_log_file
-            self.stream = self._open()
+            if self.offset == 0:
+                # 没有写入任何日志（如只查看日志的命令行进程），不保留空文件
+                os.remove(self.path)
+            else:
+                with open(index_path(self.path), "w", encoding="utf-8") as f:
+                    json.dump(self.index, f, ensure_ascii=False)
+        super().close()
 
-    def shouldRollover(self, record):
-        return False
 
-    def doRollover(self):
-        pass
+def index_path(path):
+    return f"{path}.idx"
+
 
 def init_logger():
     """初始化日志"""
@@ -62,43 +138,105 @@ def init_logger():
     basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     # 日志目录
     log_dir = os.path.join(basedir, 'logs')
-
-    # 日志格式化器
-    logger_formatter = logging.Formatter(
-        '%(levelname)s %(asctime)s [%(filename)s:%(lineno)s] %(thread)d %(message)s')
+    os.makedirs(log_dir, exist_ok=True)
+    # 每次执行（每个进程）一个日志文件
+    current_time = datetime.now().strftime('%Y%m%d_%H%M%S')
+    log_file = os.path.join(log_dir, f"testcase_{current_time}_{os.getpid()}.jsonl")
 
     # 创建日志记录器
     logger_debug = logging.getLogger('apitest')
     logger_debug.handlers.clear()  # 清除已存在的处理器
-
-    # 使用自定义处理器
-    handler_debug = CustomTestCaseRotatingHandler(
-        log_dir=log_dir,
-        base_filename='testcase',
-        encoding='utf-8'
-    )
-
-    # 设置处理器的格式化器
-    handler_debug.setFormatter(logger_formatter)
     # 设置日志记录器的级别为DEBUG
     logger_debug.setLevel(logging.DEBUG)
-    # 添加处理器到日志记录器
+
+    # 调用线程只入队，后台线程写文件
+    log_queue = queue.SimpleQueue()
+    handler_debug = CaseQueueHandler(log_queue)
     logger_debug.addHandler(handler_debug)
+    writer = JsonLinesHandler(log_file)
+    listener = QueueListener(log_queue, writer)
+    listener.start()
 
-    # 添加控制台输出
-    # console_handler = logging.StreamHandler()
-    # console_handler.setFormatter(logger_formatter)
-    # logger_debug.addHandler(console_handler)
+    def shutdown():
+        # 写完队列中剩余的日志并写出索引
+        listener.stop()
+        writer.close()
 
+    atexit.register(shutdown)
     return logger_debug, handler_debug
 
+
 # 初始化日志记录器和处理器
 logger, log_handler = init_logger()
 
+
+def _latest_log(log_dir):
+    # 排除当前进程自己的日志文件
+    files = [f for f in glob.glob(os.path.join(log_dir, "testcase_*.jsonl"))
+             if not f.endswith(f"_{os.getpid()}.jsonl")]
+    if not files:
+        raise SystemExit(f"没有找到日志文件：{log_dir}")
+    return max(files, key=os.path.getmtime)
+
+
+def _read_ranges(path, ranges):
+    with open(path, "rb") as f:
+        for start, end in ranges:
+            f.seek(start)
+            yield from f.read(end - start).splitlines()
+
+
+def read_case_log(path, test):
+    """读取一条用例的日志，test为用例ID或其中一部分；有索引时按偏移量读取，否则扫描整个文件"""
+    if os.path.exists(index_path(path)):
+        with open(index_path(path), encoding="utf-8") as f:
+            index = json.load(f)
+        matched = [test] if test in index else [key for key in index if test in key]
+        ranges = sorted(r for key in matched for r in index[key])
+        lines = _read_ranges(path, ranges)
+    else:
+        with open(path, "rb") as f:
+            lines = list(f)
+    for line in lines:
+        entry = json.loads(line)
+        if entry["test"] and (entry["test"] == test or test in entry["test"]):
+            yield entry
+
+
+def format_entry(entry):
+    """按原有的文本日志格式输出"""
+    text = f"{entry['level']} {entry['ts']} [{entry['file']}:{entry['line']}] {entry['thread']} {entry['msg']}"
+    return f"{text}\n{entry['exc']}" if entry.get("exc") else text
+
+
+def main(argv=None):
+    log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
+    parser = argparse.ArgumentParser(prog="python -m utils.logger", description="查看用例日志")
+    sub = parser.add_subparsers(dest="command", required=True)
+    show = sub.add_parser("show", help="输出某条用例的日志")
+    show.add_argument("test", help="用例ID或其中一部分")
+    show.add_argument("--file", default=None, help="日志文件，默认最近一次执行的日志")
+    show.add_argument("--json", action="store_true", help="按JSON Lines原样输出")
+    lst = sub.add_parser("list", help="列出日志中的用例")
+    lst.add_argument("--file", default=None, help="日志文件，默认最近一次执行的日志")
+    args = parser.parse_args(argv)
+    path = args.file or _latest_log(log_dir)
+    if args.command == "list":
+        if os.path.exists(index_path(path)):
+            with open(index_path(path), encoding="utf-8") as f:
+                tests = list(json.load(f))
+        else:
+            with open(path, "rb") as f:
+                tests = list(dict.fromkeys(e["test"] for e in map(json.loads, f) if e["test"]))
+        print("\n".join(tests))
+        return
+    count = 0
+    for entry in read_case_log(path, args.test):
+        print(json.dumps(entry, ensure_ascii=False) if args.json else format_entry(entry))
+        count += 1
+    if not count:
+        print(f"日志中没有找到用例：{args.test}（{path}）", file=sys.stderr)
+
+
 if __name__ == '__main__':
-    # 测试日志记录功能
-    logger.debug("debug")
-    logger.info("info")
-    logger.warning('warning')
-    logger.error("error")
-    logger.critical('critical')
\ No newline at end of file
+    main()